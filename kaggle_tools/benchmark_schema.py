@@ -0,0 +1,123 @@
+import sqlite3
+import os
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from load_ecommerce_to_sqlite import load_csv_to_sqlite, bulk_load_csv_to_sqlite, FACTS_SUFFIX
+
+TABLE_NAME = 'events'
+
+def time_query(conn, sql, params=(), repeats=5):
+    """Return the median wall time of a query in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def db_size(db_path):
+    """Size of a database file after checkpointing its WAL"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return os.path.getsize(db_path)
+
+def run_benchmark(csv_path, rows):
+    """Load the same CSV sample into both schemas and compare size and query time"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        # Take the first N rows so both loaders see identical input
+        sample_path = tmp / 'sample.csv'
+        with open(csv_path) as src, open(sample_path, 'w') as dst:
+            for i, line in enumerate(src):
+                if i > rows:
+                    break
+                dst.write(line)
+
+        raw_db = tmp / 'raw.db'
+        normalized_db = tmp / 'normalized.db'
+
+        start = time.perf_counter()
+        load_csv_to_sqlite(sample_path, db_path=raw_db, table_name=TABLE_NAME)
+        raw_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_load_csv_to_sqlite(sample_path, db_path=normalized_db, table_name=TABLE_NAME)
+        normalized_load = time.perf_counter() - start
+
+        raw = sqlite3.connect(raw_db)
+        normalized = sqlite3.connect(normalized_db)
+        facts = f"{TABLE_NAME}{FACTS_SUFFIX}"
+
+        # Query a window covering the middle tenth of the loaded time range
+        lo, hi = normalized.execute(f'SELECT MIN(event_time), MAX(event_time) FROM "{facts}"').fetchone()
+        start_epoch = lo + (hi - lo) * 45 // 100
+        end_epoch = lo + (hi - lo) * 55 // 100
+        start_text, end_text = normalized.execute(
+            "SELECT strftime('%Y-%m-%d %H:%M:%S', ?, 'unixepoch') || ' UTC', "
+            "strftime('%Y-%m-%d %H:%M:%S', ?, 'unixepoch') || ' UTC'",
+            (start_epoch, end_epoch)
+        ).fetchone()
+
+        queries = [
+            (
+                "time-range count",
+                (f'SELECT COUNT(*) FROM "{TABLE_NAME}" WHERE event_time >= ? AND event_time < ?', (start_text, end_text)),
+                (f'SELECT COUNT(*) FROM "{facts}" WHERE event_time >= ? AND event_time < ?', (start_epoch, end_epoch))
+            ),
+            (
+                "events by type",
+                (f'SELECT event_type, COUNT(*) FROM "{TABLE_NAME}" GROUP BY event_type', ()),
+                (f'SELECT event_type_id, COUNT(*) FROM "{facts}" GROUP BY event_type_id', ())
+            ),
+            (
+                "purchase revenue by brand",
+                (f'''SELECT brand, SUM(price) FROM "{TABLE_NAME}" WHERE event_type = 'purchase'
+                     GROUP BY brand ORDER BY 2 DESC LIMIT 10''', ()),
+                (f'''SELECT b.name, SUM(f.price) FROM "{facts}" f LEFT JOIN brands b ON b.id = f.brand_id
+                     WHERE f.event_type_id = 4 GROUP BY f.brand_id ORDER BY 2 DESC LIMIT 10''', ())
+            ),
+            (
+                "events per day",
+                (f'SELECT substr(event_time, 1, 10), COUNT(*) FROM "{TABLE_NAME}" GROUP BY 1', ()),
+                (f'SELECT event_time / 86400, COUNT(*) FROM "{facts}" GROUP BY 1', ())
+            ),
+            (
+                "compat view: time-range count",
+                (f'SELECT COUNT(*) FROM "{TABLE_NAME}" WHERE event_time >= ? AND event_time < ?', (start_text, end_text)),
+                (f'SELECT COUNT(*) FROM "{TABLE_NAME}" WHERE event_time >= ? AND event_time < ?', (start_text, end_text))
+            )
+        ]
+
+        raw_size = db_size(raw_db)
+        normalized_size = db_size(normalized_db)
+
+        print(f"\n{'='*72}")
+        print(f"SCHEMA BENCHMARK ({rows:,} rows)")
+        print(f"{'='*72}")
+        print(f"{'':36}{'raw (before)':>18}{'normalized (after)':>22}")
+        print(f"{'file size (MB)':36}{raw_size / 1e6:>18.1f}{normalized_size / 1e6:>22.1f}")
+        print(f"{'load time (s)':36}{raw_load:>18.2f}{normalized_load:>22.2f}")
+        for name, (raw_sql, raw_params), (norm_sql, norm_params) in queries:
+            raw_ms = time_query(raw, raw_sql, raw_params)
+            norm_ms = time_query(normalized, norm_sql, norm_params)
+            print(f"{name + ' (ms)':36}{raw_ms:>18.1f}{norm_ms:>22.1f}")
+
+        raw.close()
+        normalized.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the raw and normalized SQLite event schemas")
+    parser.add_argument('csv_path', help="Kaggle monthly CSV (e.g. 2019-Oct.csv)")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="rows to sample from the CSV")
+    args = parser.parse_args()
+
+    run_benchmark(args.csv_path, args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import sqlite3
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime
+
+from load_ecommerce_to_sqlite import keyset_select_sql, list_event_tables
+from upload_sample_to_supabase import transform_rows, encode_records, orjson
+
+# Columns of keyset_select_sql rows after the leading rowid
+RECORD_COLUMNS = [
+    'event_time', 'event_type', 'product_id', 'category_id', 'category_code',
+    'brand', 'price', 'user_id', 'user_session'
+]
+
+def legacy_rows_to_records(rows):
+    """The original per-row conversion loop from upload_all_data, kept for comparison"""
+    json_data = []
+    for row in rows:
+        row = dict(zip(['event_rowid'] + RECORD_COLUMNS, row))
+        try:
+            if row['event_time']:
+                event_time = row['event_time'].replace(' UTC', '')
+                dt = datetime.strptime(event_time, '%Y-%m-%d %H:%M:%S')
+                event_time_iso = dt.isoformat()
+            else:
+                event_time_iso = None
+        except:
+            event_time_iso = None
+
+        json_data.append({
+            "event_time": event_time_iso,
+            "event_type": row['event_type'],
+            "product_id": row['product_id'],
+            "category_id": row['category_id'],
+            "category_code": row['category_code'],
+            "brand": row['brand'],
+            "price": float(row['price']) if row['price'] else None,
+            "user_id": row['user_id'],
+            "user_session": row['user_session']
+        })
+    return json_data
+
+def synthetic_rows(count):
+    """Generate rows shaped like keyset_select_sql output"""
+    random.seed(42)
+    event_types = ['view', 'view', 'view', 'cart', 'remove_from_cart', 'purchase']
+    brands = ['apple', 'samsung', 'xiaomi', 'huawei', None]
+    categories = ['electronics.smartphone', 'computers.notebook', 'appliances.kitchen.washer', None]
+    start = 1569888000
+    rows = []
+    for i in range(count):
+        ts = datetime.utcfromtimestamp(start + i * 7).strftime('%Y-%m-%d %H:%M:%S UTC')
+        rows.append((
+            i + 1, ts, random.choice(event_types), random.randint(1000000, 1005000),
+            2053013555631882655, random.choice(categories), random.choice(brands),
+            round(random.uniform(1, 2000), 2), random.randint(500000000, 560000000),
+            f"{random.getrandbits(128):032x}"
+        ))
+    return rows
+
+def time_it(fn, repeats):
+    """Median wall time of fn() in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the upload row transformation")
+    parser.add_argument('--rows', type=int, default=100000, help="rows per chunk")
+    parser.add_argument('--batch-size', type=int, default=1000, help="rows per request body")
+    parser.add_argument('--db', help="read the chunk from this SQLite database instead of synthetic rows")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        table_name = list_event_tables(conn)[0]
+        rows = conn.execute(keyset_select_sql(conn, table_name), (0, args.rows)).fetchall()
+        conn.close()
+    else:
+        rows = synthetic_rows(args.rows)
+
+    def legacy():
+        for i in range(0, len(rows), args.batch_size):
+            json.dumps(legacy_rows_to_records(rows[i:i + args.batch_size])).encode()
+
+    def vectorized():
+        records = transform_rows(rows)
+        for i in range(0, len(records), args.batch_size):
+            encode_records(records[i:i + args.batch_size])
+
+    # Both paths must produce the same payload (modulo zero prices, which the
+    # legacy loop turned into null)
+    legacy_records = legacy_rows_to_records(rows[:1000])
+    vector_records = transform_rows(rows[:1000])
+    for old, new in zip(legacy_records, vector_records):
+        if old['price'] is None and new['price'] == 0:
+            new = {**new, 'price': None}
+        assert old == new, (old, new)
+
+    encoder = 'orjson' if orjson is not None else 'json'
+    legacy_ms = time_it(legacy, args.repeats)
+    vectorized_ms = time_it(vectorized, args.repeats)
+
+    print(f"Transform + serialize {len(rows):,} rows in {args.batch_size}-row bodies")
+    print(f"  per-row loop + json:     {legacy_ms:8.1f} ms")
+    print(f"  column-wise + {encoder}:{' ' * (10 - len(encoder))}{vectorized_ms:8.1f} ms")
+    print(f"  speedup:                 {legacy_ms / vectorized_ms:8.1f}x")
+
+if __name__ == "__main__":
+    main()
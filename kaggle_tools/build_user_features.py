@@ -0,0 +1,218 @@
+import sqlite3
+import time
+import argparse
+
+from load_ecommerce_to_sqlite import list_event_tables, EVENT_TYPE_CODES, FACTS_SUFFIX
+
+# Rows folded into user_features per transaction
+FEATURE_STEP = 1000000
+JOB_NAME = 'user_features'
+
+def create_feature_tables(conn):
+    """Create the user_features table, its helper tables and the watermark table"""
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS user_features (
+            user_id INTEGER PRIMARY KEY,
+            view_count INTEGER NOT NULL DEFAULT 0,
+            cart_count INTEGER NOT NULL DEFAULT 0,
+            purchase_count INTEGER NOT NULL DEFAULT 0,
+            total_spend REAL NOT NULL DEFAULT 0,
+            first_event_time INTEGER,
+            last_event_time INTEGER,
+            last_cart_time INTEGER,
+            last_purchase_time INTEGER,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            top_category TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_features_view_count ON user_features(view_count);
+        CREATE INDEX IF NOT EXISTS idx_user_features_cart_count ON user_features(cart_count);
+        CREATE INDEX IF NOT EXISTS idx_user_features_purchase_count ON user_features(purchase_count);
+        CREATE INDEX IF NOT EXISTS idx_user_features_total_spend ON user_features(total_spend);
+        CREATE INDEX IF NOT EXISTS idx_user_features_last_event_time ON user_features(last_event_time);
+        CREATE INDEX IF NOT EXISTS idx_user_features_top_category ON user_features(top_category);
+
+        -- Distinct sessions and per-category activity, so session_count and
+        -- top_category can be maintained exactly without rescanning events
+        CREATE TABLE IF NOT EXISTS user_feature_sessions (
+            user_id INTEGER NOT NULL,
+            session_key NOT NULL,
+            PRIMARY KEY (user_id, session_key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS user_feature_categories (
+            user_id INTEGER NOT NULL,
+            category_code TEXT NOT NULL,
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, category_code)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            job TEXT NOT NULL,
+            source_table TEXT NOT NULL,
+            last_rowid INTEGER NOT NULL,
+            updated_at INTEGER,
+            PRIMARY KEY (job, source_table)
+        );
+    ''')
+
+def get_watermark(conn, job, source_table):
+    """Last source rowid already folded in by a job"""
+    row = conn.execute('SELECT last_rowid FROM ingest_watermarks WHERE job = ? AND source_table = ?',
+                       (job, source_table)).fetchone()
+    return row[0] if row else 0
+
+def set_watermark(conn, job, source_table, last_rowid):
+    conn.execute('''
+        INSERT INTO ingest_watermarks (job, source_table, last_rowid, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(job, source_table) DO UPDATE SET last_rowid = excluded.last_rowid,
+                                                     updated_at = excluded.updated_at
+    ''', (job, source_table, last_rowid, int(time.time())))
+
+def event_source(conn, table_name):
+    """SQL fragments reading an event table, for normalized facts tables and raw tables
+
+    Returns (table, expressions) where table is the physical table whose rowid
+    the watermark tracks and expressions map feature inputs to SQL over alias e.
+    """
+    facts_table = f"{table_name}{FACTS_SUFFIX}"
+    has_facts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (facts_table,)
+    ).fetchone()
+    if has_facts:
+        return facts_table, {
+            'time': 'e.event_time',
+            'is_view': f"e.event_type_id = {EVENT_TYPE_CODES['view']}",
+            'is_cart': f"e.event_type_id = {EVENT_TYPE_CODES['cart']}",
+            'is_purchase': f"e.event_type_id = {EVENT_TYPE_CODES['purchase']}",
+            'session': 'e.session_id',
+            'category': '(SELECT name FROM category_codes WHERE id = e.category_code_id)'
+        }
+    return table_name, {
+        'time': "CAST(strftime('%s', substr(e.event_time, 1, 19)) AS INTEGER)",
+        'is_view': "e.event_type = 'view'",
+        'is_cart': "e.event_type = 'cart'",
+        'is_purchase': "e.event_type = 'purchase'",
+        'session': 'e.user_session',
+        'category': 'e.category_code'
+    }
+
+def _fold_range(conn, table, x, lo, hi):
+    """Fold events with lo < rowid <= hi into the feature tables"""
+    where = f'FROM "{table}" e WHERE e.rowid > {lo} AND e.rowid <= {hi}'
+
+    conn.execute(f'''
+        INSERT INTO user_features (user_id, view_count, cart_count, purchase_count, total_spend,
+                                   first_event_time, last_event_time, last_cart_time, last_purchase_time)
+        SELECT e.user_id,
+               SUM({x['is_view']}),
+               SUM({x['is_cart']}),
+               SUM({x['is_purchase']}),
+               TOTAL(CASE WHEN {x['is_purchase']} THEN e.price END),
+               MIN({x['time']}),
+               MAX({x['time']}),
+               MAX(CASE WHEN {x['is_cart']} THEN {x['time']} END),
+               MAX(CASE WHEN {x['is_purchase']} THEN {x['time']} END)
+        {where} AND e.user_id IS NOT NULL
+        GROUP BY e.user_id
+        ON CONFLICT(user_id) DO UPDATE SET
+            view_count = view_count + excluded.view_count,
+            cart_count = cart_count + excluded.cart_count,
+            purchase_count = purchase_count + excluded.purchase_count,
+            total_spend = total_spend + excluded.total_spend,
+            first_event_time = COALESCE(MIN(first_event_time, excluded.first_event_time),
+                                        first_event_time, excluded.first_event_time),
+            last_event_time = COALESCE(MAX(last_event_time, excluded.last_event_time),
+                                       last_event_time, excluded.last_event_time),
+            last_cart_time = COALESCE(MAX(last_cart_time, excluded.last_cart_time),
+                                      last_cart_time, excluded.last_cart_time),
+            last_purchase_time = COALESCE(MAX(last_purchase_time, excluded.last_purchase_time),
+                                          last_purchase_time, excluded.last_purchase_time)
+    ''')
+
+    conn.execute('DELETE FROM temp.touched_users')
+    conn.execute(f'INSERT OR IGNORE INTO temp.touched_users SELECT DISTINCT e.user_id {where} AND e.user_id IS NOT NULL')
+
+    conn.execute(f'''
+        INSERT OR IGNORE INTO user_feature_sessions (user_id, session_key)
+        SELECT DISTINCT e.user_id, {x['session']} {where}
+          AND e.user_id IS NOT NULL AND {x['session']} IS NOT NULL
+    ''')
+    conn.execute(f'''
+        INSERT INTO user_feature_categories (user_id, category_code, event_count)
+        SELECT e.user_id, {x['category']} AS category, COUNT(*) {where}
+          AND e.user_id IS NOT NULL AND category IS NOT NULL
+        GROUP BY e.user_id, category
+        ON CONFLICT(user_id, category_code) DO UPDATE SET event_count = event_count + excluded.event_count
+    ''')
+
+    # Only users seen in this range need their derived columns refreshed
+    conn.execute('''
+        UPDATE user_features SET
+            session_count = (SELECT COUNT(*) FROM user_feature_sessions s
+                             WHERE s.user_id = user_features.user_id),
+            top_category = (SELECT c.category_code FROM user_feature_categories c
+                            WHERE c.user_id = user_features.user_id
+                            ORDER BY c.event_count DESC, c.category_code LIMIT 1)
+        WHERE user_id IN (SELECT user_id FROM temp.touched_users)
+    ''')
+
+def update_user_features(conn, step=FEATURE_STEP):
+    """Fold every event added since the last run into user_features
+
+    Each event table is processed in rowid ranges; a range and its watermark
+    are committed in the same transaction, so an interrupted run simply
+    continues from the last committed range.
+    """
+    create_feature_tables(conn)
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS touched_users (user_id INTEGER PRIMARY KEY)')
+
+    total = 0
+    for table_name in list_event_tables(conn):
+        table, expressions = event_source(conn, table_name)
+        last_rowid = get_watermark(conn, JOB_NAME, table)
+        max_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+
+        if max_rowid <= last_rowid:
+            print(f"{table_name}: up to date")
+            continue
+
+        print(f"{table_name}: folding rowids {last_rowid + 1:,}..{max_rowid:,}")
+        while last_rowid < max_rowid:
+            hi = min(last_rowid + step, max_rowid)
+            with conn:
+                _fold_range(conn, table, expressions, last_rowid, hi)
+                set_watermark(conn, JOB_NAME, table, hi)
+            total += hi - last_rowid
+            last_rowid = hi
+            print(f"  {table_name}: through rowid {hi:,}", end='\r')
+        print()
+
+    users = conn.execute('SELECT COUNT(*) FROM user_features').fetchone()[0]
+    print(f"✓ user_features covers {users:,} users ({total:,} new events folded in)")
+    return total
+
+def rebuild_user_features(conn):
+    """Drop all feature state so the next update recomputes from scratch"""
+    with conn:
+        conn.execute('DROP TABLE IF EXISTS user_features')
+        conn.execute('DROP TABLE IF EXISTS user_feature_sessions')
+        conn.execute('DROP TABLE IF EXISTS user_feature_categories')
+        conn.execute('DELETE FROM ingest_watermarks WHERE job = ?', (JOB_NAME,))
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally maintain the user_features table")
+    parser.add_argument('--db', default='ecommerce.db', help="SQLite database path")
+    parser.add_argument('--step', type=int, default=FEATURE_STEP, help="events per transaction")
+    parser.add_argument('--rebuild', action='store_true', help="discard existing features first")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            create_feature_tables(conn)
+            rebuild_user_features(conn)
+        update_user_features(conn, step=args.step)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import requests
+import sqlite3
+import argparse
+import numpy as np
 import pandas as pd
+from collections import Counter
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import json
 
+from load_ecommerce_to_sqlite import keyset_select_sql, list_event_tables
+
 # Load environment variables
 load_dotenv()
 
@@ -28,188 +34,286 @@ def fetch_data(query_params):
         return response.json()
     return []
 
-def get_messaging_insights():
-    """Extract insights relevant for a Twilio-like messaging platform"""
+# Columns the aggregation engine consumes from every source
+EVENT_COLUMNS = ['event_time', 'event_type', 'user_id', 'category_code', 'brand', 'price']
+
+def iter_sqlite_events(db_path='ecommerce.db', batch_size=100000):
+    """Stream all event tables from the local SQLite database in rowid order"""
+    conn = sqlite3.connect(db_path)
+    try:
+        for table_name in list_event_tables(conn):
+            select_sql = keyset_select_sql(conn, table_name)
+            last_rowid = 0
+            while True:
+                rows = conn.execute(select_sql, (last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                batch = pd.DataFrame.from_records(rows, columns=[
+                    'event_rowid', 'event_time', 'event_type', 'product_id', 'category_id',
+                    'category_code', 'brand', 'price', 'user_id', 'user_session'
+                ])
+                yield batch[EVENT_COLUMNS]
+    finally:
+        conn.close()
+
+def iter_rest_events(batch_size=10000, key_column='id'):
+    """Stream the ecommerce_events table from the Supabase REST API page by page
+
+    Pages are keyset-paginated on the table's unique, increasing key: each
+    request asks for rows after the last key seen, so rows inserted meanwhile
+    or ties in other columns can't shift rows between pages the way OFFSET does.
+    """
+    last_key = None
+    while True:
+        params = {
+            "select": ",".join([key_column] + EVENT_COLUMNS),
+            "order": f"{key_column}.asc",
+            "limit": str(batch_size)
+        }
+        if last_key is not None:
+            params[key_column] = f"gt.{last_key}"
+        page = fetch_data(params)
+        if not page:
+            break
+        last_key = page[-1][key_column]
+        yield pd.DataFrame(page, columns=EVENT_COLUMNS)
+        if len(page) < batch_size:
+            break
+
+class MessagingInsightsAggregator:
+    """Single-pass aggregation of every messaging insight over an event stream
+
+    Each batch updates the metrics incrementally and is then discarded, so
+    memory is bounded by the number of distinct users (a few compact NumPy
+    columns per user) rather than by the number of events.
+    """
+
+    def __init__(self):
+        self.total_events = 0
+        self.hourly = np.zeros(24, dtype=np.int64)
+        self.weekday = np.zeros(7, dtype=np.int64)
+        self.event_types = Counter()
+        self.categories = Counter()
+        self.brands = Counter()
+        self.cart_value_sum = 0.0
+        self.cart_value_count = 0
+
+        # Per-user state, indexed by a dense ordinal assigned on first sight
+        self.user_index = {}
+        self.views = np.zeros(0, dtype=np.int32)
+        self.carts = np.zeros(0, dtype=np.int32)
+        self.purchases = np.zeros(0, dtype=np.int32)
+        self.events = np.zeros(0, dtype=np.int32)
+        self.first_seen = np.zeros(0, dtype=np.int64)
+        self.last_seen = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size):
+        capacity = len(self.views)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for name, fill in (('views', 0), ('carts', 0), ('purchases', 0), ('events', 0),
+                           ('first_seen', np.iinfo(np.int64).max), ('last_seen', np.iinfo(np.int64).min)):
+            column = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def update(self, batch):
+        """Fold one batch of events into the running metrics"""
+        if batch.empty:
+            return
+        event_time = pd.to_datetime(batch['event_time'].astype(str).str.slice(0, 19),
+                                    format='ISO8601', errors='coerce')
+        valid_time = event_time.notna().to_numpy()
+        epoch = ((event_time - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)).to_numpy(
+            dtype=np.float64, na_value=np.nan)
+        event_type = batch['event_type'].to_numpy()
+        is_view = event_type == 'view'
+        is_cart = event_type == 'cart'
+        is_purchase = event_type == 'purchase'
+
+        self.total_events += len(batch)
+        self.hourly += np.bincount(event_time.dt.hour[valid_time].astype(int), minlength=24)
+        self.weekday += np.bincount(event_time.dt.dayofweek[valid_time].astype(int), minlength=7)
+        self.event_types.update(batch['event_type'].value_counts().to_dict())
+        self.categories.update(batch['category_code'].value_counts().to_dict())
+        self.brands.update(batch['brand'].value_counts().to_dict())
+
+        cart_prices = pd.to_numeric(batch['price'][is_cart], errors='coerce').dropna()
+        self.cart_value_sum += float(cart_prices.sum())
+        self.cart_value_count += len(cart_prices)
+
+        # Map this batch's users to global ordinals, then aggregate per ordinal
+        codes, uniques = pd.factorize(batch['user_id'])
+        index = self.user_index
+        ordinals = np.fromiter((index.setdefault(u, len(index)) for u in uniques.tolist()),
+                               dtype=np.int64, count=len(uniques))
+        self._grow(len(index))
+        row_ordinals = ordinals[codes]
+        size = len(self.views)
+        self.views += np.bincount(row_ordinals, weights=is_view, minlength=size).astype(np.int32)
+        self.carts += np.bincount(row_ordinals, weights=is_cart, minlength=size).astype(np.int32)
+        self.purchases += np.bincount(row_ordinals, weights=is_purchase, minlength=size).astype(np.int32)
+        self.events += np.bincount(row_ordinals, minlength=size).astype(np.int32)
+
+        timed = pd.Series(epoch[valid_time]).groupby(codes[valid_time])
+        if len(timed):
+            batch_first = timed.min()
+            batch_last = timed.max()
+            first_ordinals = ordinals[batch_first.index.to_numpy()]
+            self.first_seen[first_ordinals] = np.minimum(self.first_seen[first_ordinals],
+                                                         batch_first.to_numpy(dtype=np.int64))
+            self.last_seen[first_ordinals] = np.maximum(self.last_seen[first_ordinals],
+                                                        batch_last.to_numpy(dtype=np.int64))
+
+    def consume(self, batches):
+        """Aggregate a whole stream of batches"""
+        for i, batch in enumerate(batches, 1):
+            self.update(batch)
+            print(f"Aggregated {self.total_events:,} events from {i} batches", end='\r')
+        print()
+        return self
+
+    @property
+    def unique_users(self):
+        return len(self.user_index)
+
+    def user_columns(self):
+        """Per-user counters trimmed to the users seen so far"""
+        n = self.unique_users
+        return self.views[:n], self.carts[:n], self.purchases[:n], self.events[:n]
+
+def get_messaging_insights(source='sqlite', db_path='ecommerce.db', batch_size=100000):
+    """Extract insights relevant for a Twilio-like messaging platform
+
+    All metrics come from one streaming pass over the full events table,
+    read locally from SQLite or page by page from the REST API.
+    """
 
     print("=" * 80)
     print("CUSTOMER INSIGHTS FOR MESSAGING PLATFORM")
     print("=" * 80)
 
+    if source == 'rest':
+        batches = iter_rest_events(batch_size=min(batch_size, 10000))
+    else:
+        batches = iter_sqlite_events(db_path, batch_size=batch_size)
+    insights = MessagingInsightsAggregator().consume(batches)
+
+    if insights.total_events == 0:
+        print("No events found.")
+        return
+
     # 1. USER ENGAGEMENT PATTERNS
     print("\n1. USER ENGAGEMENT PATTERNS (for optimal message timing)")
     print("-" * 60)
 
-    # Get hourly activity patterns
-    sample_data = fetch_data({
-        "select": "event_time,user_id,event_type",
-        "limit": "10000"
-    })
-
-    if sample_data:
-        df = pd.DataFrame(sample_data)
-        df['event_time'] = pd.to_datetime(df['event_time'])
-        df['hour'] = df['event_time'].dt.hour
-        df['day_of_week'] = df['event_time'].dt.dayofweek
-
+    timed_events = insights.hourly.sum()
+    if timed_events:
         # Peak hours analysis
-        hourly_activity = df.groupby('hour').size()
-        peak_hours = hourly_activity.nlargest(5)
+        peak_hours = np.argsort(insights.hourly)[::-1][:5]
 
         print("\n📊 Peak Activity Hours (Best time to send messages):")
-        for hour, count in peak_hours.items():
-            print(f"   {hour:02d}:00 - {(count/len(df)*100):.1f}% of activity")
+        for hour in peak_hours:
+            print(f"   {hour:02d}:00 - {(insights.hourly[hour]/timed_events*100):.1f}% of activity")
 
         # Day of week patterns
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        daily_activity = df.groupby('day_of_week').size()
 
         print("\n📅 Activity by Day of Week:")
-        for day_idx, count in daily_activity.items():
-            print(f"   {days[day_idx]}: {(count/len(df)*100):.1f}% of activity")
+        for day_idx, count in enumerate(insights.weekday):
+            if count:
+                print(f"   {days[day_idx]}: {(count/timed_events*100):.1f}% of activity")
 
     # 2. USER SEGMENTATION FOR TARGETED MESSAGING
     print("\n\n2. USER SEGMENTATION (for targeted campaigns)")
     print("-" * 60)
 
-    # Get user behavior patterns
-    user_data = fetch_data({
-        "select": "user_id,event_type",
-        "limit": "50000"
-    })
+    views, carts, purchases, events = insights.user_columns()
+    total_users = insights.unique_users
 
-    if user_data:
-        df_users = pd.DataFrame(user_data)
-        user_segments = df_users.groupby('user_id')['event_type'].value_counts().unstack(fill_value=0)
+    # Calculate conversion rates
+    conversion_rate = purchases / (views + 1)
 
-        # Calculate conversion rates
-        if 'view' in user_segments.columns and 'purchase' in user_segments.columns:
-            user_segments['conversion_rate'] = user_segments['purchase'] / (user_segments['view'] + 1)
+    # Segment users
+    high_converters = int((conversion_rate > 0.1).sum())
+    window_shoppers = int(((views > 10) & (purchases == 0)).sum())
+    cart_abandoners = int(((carts > 0) & (purchases == 0)).sum())
 
-            # Segment users
-            high_converters = (user_segments['conversion_rate'] > 0.1).sum()
-            window_shoppers = ((user_segments['view'] > 10) & (user_segments['purchase'] == 0)).sum()
-            cart_abandoners = ((user_segments['cart'] > 0) & (user_segments['purchase'] == 0)).sum()
-
-            total_users = len(user_segments)
-
-            print("\n👥 User Segments for Messaging Campaigns:")
-            print(f"   🎯 High Converters (>10% conversion): {high_converters} ({high_converters/total_users*100:.1f}%)")
-            print(f"   👀 Window Shoppers (views, no purchase): {window_shoppers} ({window_shoppers/total_users*100:.1f}%)")
-            print(f"   🛒 Cart Abandoners: {cart_abandoners} ({cart_abandoners/total_users*100:.1f}%)")
+    print("\n👥 User Segments for Messaging Campaigns:")
+    print(f"   🎯 High Converters (>10% conversion): {high_converters:,} ({high_converters/total_users*100:.1f}%)")
+    print(f"   👀 Window Shoppers (views, no purchase): {window_shoppers:,} ({window_shoppers/total_users*100:.1f}%)")
+    print(f"   🛒 Cart Abandoners: {cart_abandoners:,} ({cart_abandoners/total_users*100:.1f}%)")
 
     # 3. COMMUNICATION TRIGGERS
     print("\n\n3. AUTOMATED MESSAGING TRIGGERS")
     print("-" * 60)
 
-    # Analyze cart abandonment patterns
-    cart_data = fetch_data({
-        "select": "user_id,event_type,event_time,product_id,price",
-        "event_type": "in.(cart,purchase)",
-        "limit": "10000"
-    })
-
-    if cart_data:
-        df_cart = pd.DataFrame(cart_data)
+    # Find cart abandonment rate
+    cart_events = insights.event_types.get('cart', 0)
+    purchase_events = insights.event_types.get('purchase', 0)
 
-        # Find cart abandonment rate
-        cart_events = len(df_cart[df_cart['event_type'] == 'cart'])
-        purchase_events = len(df_cart[df_cart['event_type'] == 'purchase'])
+    if cart_events > 0:
+        abandonment_rate = max(0.0, 1 - (purchase_events / cart_events))
 
-        if cart_events > 0:
-            abandonment_rate = 1 - (purchase_events / cart_events)
+        print("\n🛒 Cart Abandonment Insights:")
+        print(f"   Cart → Purchase Funnel: {int((carts > 0).sum()):,} users carted, {int((purchases > 0).sum()):,} purchased")
+        print(f"   Abandonment Rate: {abandonment_rate*100:.1f}%")
+        print(f"   → SMS Reminder Opportunity: {cart_events * abandonment_rate:,.0f} messages/period")
 
-            print("\n🛒 Cart Abandonment Insights:")
-            print(f"   Abandonment Rate: {abandonment_rate*100:.1f}%")
-            print(f"   → SMS Reminder Opportunity: {cart_events * abandonment_rate:.0f} messages/period")
-
-            # Average cart value
-            avg_cart_value = df_cart[df_cart['event_type'] == 'cart']['price'].mean()
-            print(f"   Average Abandoned Cart Value: ${avg_cart_value:.2f}")
-            print(f"   → Revenue Recovery Potential: ${avg_cart_value * cart_events * abandonment_rate:.2f}")
+        # Average cart value
+        avg_cart_value = insights.cart_value_sum / insights.cart_value_count if insights.cart_value_count else 0.0
+        print(f"   Average Abandoned Cart Value: ${avg_cart_value:.2f}")
+        print(f"   → Revenue Recovery Potential: ${avg_cart_value * cart_events * abandonment_rate:,.2f}")
 
     # 4. PRODUCT INTEREST FOR NOTIFICATIONS
     print("\n\n4. PRODUCT CATEGORIES FOR PUSH NOTIFICATIONS")
     print("-" * 60)
 
-    product_data = fetch_data({
-        "select": "category_code,brand,event_type",
-        "limit": "20000"
-    })
-
-    if product_data:
-        df_products = pd.DataFrame(product_data)
+    print("\n📱 Top Product Categories (for promotional messages):")
+    for idx, (category, count) in enumerate(insights.categories.most_common(10), 1):
+        print(f"   {idx}. {category}: {count:,} interactions")
 
-        # Top categories
-        top_categories = df_products['category_code'].value_counts().head(10)
-
-        print("\n📱 Top Product Categories (for promotional messages):")
-        for idx, (category, count) in enumerate(top_categories.items(), 1):
-            if category:
-                print(f"   {idx}. {category}: {count} interactions")
-
-        # Top brands
-        top_brands = df_products['brand'].value_counts().head(5)
-
-        print("\n🏷️ Top Brands (for brand alerts):")
-        for brand, count in top_brands.items():
-            if brand:
-                print(f"   • {brand}: {count} interactions")
+    print("\n🏷️ Top Brands (for brand alerts):")
+    for brand, count in insights.brands.most_common(5):
+        print(f"   • {brand}: {count:,} interactions")
 
     # 5. MESSAGING VOLUME ESTIMATES
     print("\n\n5. MESSAGING VOLUME PROJECTIONS")
     print("-" * 60)
 
-    # Calculate potential message volumes
-    total_users_sample = fetch_data({
-        "select": "user_id",
-        "limit": "50000"
-    })
+    unique_users = total_users
 
-    if total_users_sample:
-        df_volume = pd.DataFrame(total_users_sample)
-        unique_users = df_volume['user_id'].nunique()
+    print("\n📈 Estimated Message Volumes (per campaign type):")
+    print(f"   Welcome Messages: {unique_users:,} (one-time)")
+    print(f"   Cart Reminders: ~{int(unique_users * 0.3):,}/day")
+    print(f"   Promotional: ~{int(unique_users * 0.7):,}/campaign")
+    print(f"   Transactional: ~{int(unique_users * 1.5):,}/day")
+    print(f"   Re-engagement: ~{int(unique_users * 0.15):,}/week")
 
-        print("\n📈 Estimated Message Volumes (per campaign type):")
-        print(f"   Welcome Messages: {unique_users:,} (one-time)")
-        print(f"   Cart Reminders: ~{int(unique_users * 0.3):,}/day")
-        print(f"   Promotional: ~{int(unique_users * 0.7):,}/campaign")
-        print(f"   Transactional: ~{int(unique_users * 1.5):,}/day")
-        print(f"   Re-engagement: ~{int(unique_users * 0.15):,}/week")
+    # Calculate API calls for Twilio-like service
+    daily_messages = int(unique_users * 2.5)  # Average messages per user per day
+    monthly_messages = daily_messages * 30
 
-        # Calculate API calls for Twilio-like service
-        daily_messages = int(unique_users * 2.5)  # Average messages per user per day
-        monthly_messages = daily_messages * 30
-
-        print(f"\n💬 Total Estimated Monthly Messages: {monthly_messages:,}")
-        print(f"   → Revenue at $0.0075/SMS: ${monthly_messages * 0.0075:,.2f}")
-        print(f"   → Revenue at $0.01/WhatsApp: ${monthly_messages * 0.01:,.2f}")
+    print(f"\n💬 Total Estimated Monthly Messages: {monthly_messages:,}")
+    print(f"   → Revenue at $0.0075/SMS: ${monthly_messages * 0.0075:,.2f}")
+    print(f"   → Revenue at $0.01/WhatsApp: ${monthly_messages * 0.01:,.2f}")
 
     # 6. CUSTOMER LIFECYCLE INSIGHTS
     print("\n\n6. CUSTOMER LIFECYCLE MESSAGING")
     print("-" * 60)
 
-    lifecycle_data = fetch_data({
-        "select": "user_id,event_type,event_time",
-        "order": "event_time.asc",
-        "limit": "30000"
-    })
-
-    if lifecycle_data:
-        df_lifecycle = pd.DataFrame(lifecycle_data)
-        df_lifecycle['event_time'] = pd.to_datetime(df_lifecycle['event_time'])
-
-        # User journey analysis
-        user_journeys = df_lifecycle.groupby('user_id').agg({
-            'event_time': ['min', 'max'],
-            'event_type': 'count'
-        })
-
-        user_journeys.columns = ['first_seen', 'last_seen', 'total_events']
-        user_journeys['lifetime_days'] = (user_journeys['last_seen'] - user_journeys['first_seen']).dt.days
+    first_seen = insights.first_seen[:total_users]
+    last_seen = insights.last_seen[:total_users]
+    seen = first_seen <= last_seen
+    if seen.any():
+        lifetime_days = (last_seen[seen] - first_seen[seen]) // 86400
 
         print("\n🔄 Customer Journey Metrics:")
-        print(f"   Average Customer Lifetime: {user_journeys['lifetime_days'].mean():.1f} days")
-        print(f"   Average Events per User: {user_journeys['total_events'].mean():.1f}")
+        print(f"   Average Customer Lifetime: {lifetime_days.mean():.1f} days")
+        print(f"   Average Events per User: {events.mean():.1f}")
 
         # Identify messaging opportunities
         print("\n📬 Automated Message Opportunities:")
@@ -242,5 +346,15 @@ def get_messaging_insights():
     print("   GET /analytics/engagement - Performance metrics")
     print("   POST /segments/create - Dynamic user groups")
 
+def main():
+    parser = argparse.ArgumentParser(description="Customer insights for a messaging platform")
+    parser.add_argument('--source', choices=['sqlite', 'rest'], default='sqlite',
+                        help="stream events from the local SQLite database or the Supabase REST API")
+    parser.add_argument('--db', default='ecommerce.db', help="SQLite database path")
+    parser.add_argument('--batch-size', type=int, default=100000, help="events per streamed batch")
+    args = parser.parse_args()
+
+    get_messaging_insights(source=args.source, db_path=args.db, batch_size=args.batch_size)
+
 if __name__ == "__main__":
-    get_messaging_insights()
\ No newline at end of file
+    main()
\ No newline at end of file
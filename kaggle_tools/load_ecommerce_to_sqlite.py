@@ -1,8 +1,31 @@
 import sqlite3
 import pandas as pd
 import os
+import io
+import json
+import argparse
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
+# Bulk-load tuning: rows per parsed chunk and chunks per explicit transaction
+BULK_CHUNK_SIZE = 100000
+BULK_COMMIT_EVERY = 10
+
+# Normalized schema: fixed codes for the known event types, and dictionary tables
+# that replace the repeated brand / category_code / user_session strings
+EVENT_TYPE_CODES = {'view': 1, 'cart': 2, 'remove_from_cart': 3, 'purchase': 4}
+DICTIONARY_TABLES = {
+    'event_type': 'event_types',
+    'brand': 'brands',
+    'category_code': 'category_codes',
+    'user_session': 'sessions'
+}
+FACTS_SUFFIX = '_facts'
+EVENT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S UTC'
+
 def load_csv_to_sqlite(csv_path, db_path='ecommerce.db', table_name='events'):
     """Load CSV file into SQLite database"""
 
@@ -20,6 +43,12 @@ def load_csv_to_sqlite(csv_path, db_path='ecommerce.db', table_name='events'):
         columns = first_chunk.columns.tolist()
         print(f"Columns found: {columns}")
 
+        # A bulk load leaves a view over "<table>_facts" under this name, which
+        # to_sql's replace can't drop; remove both so the raw table takes over
+        if _relation_type(conn, table_name) == 'view':
+            conn.execute(f'DROP VIEW "{table_name}"')
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}{FACTS_SUFFIX}"')
+
         # Process file in chunks
         for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_size)):
             # Write to SQLite (replace on first chunk, append on subsequent)
@@ -32,14 +61,10 @@ def load_csv_to_sqlite(csv_path, db_path='ecommerce.db', table_name='events'):
 
         # Create indexes for better query performance
         print("Creating indexes...")
-        cursor = conn.cursor()
-        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_event_time ON "{table_name}"(event_time)')
-        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_user_id ON "{table_name}"(user_id)')
-        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_product_id ON "{table_name}"(product_id)')
-        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_event_type ON "{table_name}"(event_type)')
-        conn.commit()
+        _create_indexes(conn, table_name)
 
         # Get row count
+        cursor = conn.cursor()
         cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
         row_count = cursor.fetchone()[0]
         print(f"\nSuccessfully loaded {row_count:,} rows into '{table_name}' table")
@@ -47,7 +72,361 @@ def load_csv_to_sqlite(csv_path, db_path='ecommerce.db', table_name='events'):
     finally:
         conn.close()
 
+def _create_indexes(conn, table_name):
+    """Create the lookup indexes used by the query and upload tools"""
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_event_time ON "{table_name}"(event_time)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_user_id ON "{table_name}"(user_id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_product_id ON "{table_name}"(product_id)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_event_type ON "{table_name}"(event_type)')
+    conn.commit()
+
+def _relation_type(conn, name):
+    """'table', 'view' or None for whatever currently holds a name"""
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')", (name,)
+    ).fetchone()
+    return row[0] if row else None
+
+def _create_normalized_schema(conn, table_name):
+    """Create the dictionary tables, the typed facts table and the compatibility view"""
+    for table in DICTIONARY_TABLES.values():
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    conn.executemany('INSERT OR IGNORE INTO event_types (id, name) VALUES (?, ?)',
+                     [(code, name) for name, code in EVENT_TYPE_CODES.items()])
+
+    facts_table = f"{table_name}{FACTS_SUFFIX}"
+    existing = _relation_type(conn, table_name)
+    if existing == 'table':
+        # Raw events from an earlier non-bulk load; this load replaces them
+        print(f"Dropping legacy raw table '{table_name}' in favour of the normalized schema")
+        conn.execute(f'DROP TABLE "{table_name}"')
+    elif existing == 'view':
+        conn.execute(f'DROP VIEW "{table_name}"')
+    conn.execute(f'DROP TABLE IF EXISTS "{facts_table}"')
+    conn.execute(f'''
+        CREATE TABLE "{facts_table}" (
+            event_time INTEGER,
+            event_type_id INTEGER,
+            product_id INTEGER,
+            category_id INTEGER,
+            category_code_id INTEGER,
+            brand_id INTEGER,
+            price REAL,
+            user_id INTEGER,
+            session_id INTEGER
+        )
+    ''')
+
+    # The view keeps the original column names and text timestamps, so queries
+    # written against the old pandas-inferred tables keep working unchanged
+    conn.execute(f'CREATE VIEW "{table_name}" AS {_normalized_select_sql(table_name)}')
+
+def _normalized_select_sql(table_name, with_rowid=False):
+    """SELECT decoding a facts table back to the original event columns"""
+    rowid = "f.rowid AS event_rowid,\n               " if with_rowid else ""
+    return f'''
+        SELECT {rowid}strftime('%Y-%m-%d %H:%M:%S', f.event_time, 'unixepoch') || ' UTC' AS event_time,
+               et.name AS event_type,
+               f.product_id AS product_id,
+               f.category_id AS category_id,
+               cc.name AS category_code,
+               b.name AS brand,
+               f.price AS price,
+               f.user_id AS user_id,
+               s.name AS user_session
+        FROM "{table_name}{FACTS_SUFFIX}" f
+        LEFT JOIN event_types et ON et.id = f.event_type_id
+        LEFT JOIN category_codes cc ON cc.id = f.category_code_id
+        LEFT JOIN brands b ON b.id = f.brand_id
+        LEFT JOIN sessions s ON s.id = f.session_id
+    '''
+
+def keyset_select_sql(conn, table_name):
+    """SQL reading an event table in rowid order, one page after a given rowid
+
+    The statement takes (last_rowid, limit) parameters and returns the rowid
+    followed by the original event columns, for raw tables and normalized views alike.
+    """
+    facts_table = f"{table_name}{FACTS_SUFFIX}"
+    has_facts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (facts_table,)
+    ).fetchone()
+    if has_facts:
+        return f"{_normalized_select_sql(table_name, with_rowid=True)} WHERE f.rowid > ? ORDER BY f.rowid LIMIT ?"
+    return f'''
+        SELECT rowid AS event_rowid, event_time, event_type, product_id, category_id,
+               category_code, brand, price, user_id, user_session
+        FROM "{table_name}"
+        WHERE rowid > ? ORDER BY rowid LIMIT ?
+    '''
+
+def _create_facts_indexes(conn, table_name):
+    """Create the lookup indexes on a normalized facts table"""
+    facts_table = f"{table_name}{FACTS_SUFFIX}"
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{facts_table}_event_time" ON "{facts_table}"(event_time)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{facts_table}_user_id" ON "{facts_table}"(user_id)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{facts_table}_product_id" ON "{facts_table}"(product_id)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{facts_table}_event_type_id" ON "{facts_table}"(event_type_id)')
+
+def list_event_tables(conn):
+    """Return the names of all event tables (raw pandas tables and normalized views)"""
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name"
+    )
+    skip = set(DICTIONARY_TABLES.values())
+    names = []
+    for (name,) in cursor.fetchall():
+        if name in skip or name.endswith(FACTS_SUFFIX) or name.startswith('sqlite_'):
+            continue
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{name}")')]
+        if 'event_time' in columns and 'user_id' in columns:
+            names.append(name)
+    return names
+
+class _Dictionary:
+    """Maps dictionary-encoded strings to integer ids, inserting unseen values
+
+    The cache is bounded: high-cardinality columns (user_session) fall back to
+    the table's unique index once the cache is full instead of growing forever.
+    """
+
+    def __init__(self, conn, table, max_cache=2_000_000):
+        self.conn = conn
+        self.table = table
+        self.max_cache = max_cache
+        self.cache = {}
+
+    def ids_for(self, values):
+        missing = [v for v in values if v not in self.cache]
+        if missing and len(self.cache) + len(missing) > self.max_cache:
+            # Evict before resolving, so every value of this batch is looked up and cached
+            self.cache.clear()
+            missing = list(values)
+        if missing:
+            self.conn.executemany(f'INSERT OR IGNORE INTO "{self.table}" (name) VALUES (?)',
+                                  [(v,) for v in missing])
+            for i in range(0, len(missing), 500):
+                part = missing[i:i + 500]
+                placeholders = ', '.join('?' for _ in part)
+                rows = self.conn.execute(
+                    f'SELECT name, id FROM "{self.table}" WHERE name IN ({placeholders})', part
+                )
+                self.cache.update(rows.fetchall())
+        return [self.cache[v] for v in values]
+
+def _parse_chunk(data, columns):
+    """Parse a block of raw CSV lines into typed columns (runs in a worker process)
+
+    Timestamps become epoch seconds and the string columns are factorized per
+    chunk, so the main process only has to map each chunk's unique values to ids.
+    """
+    chunk = pd.read_csv(io.BytesIO(data), header=None, names=columns,
+                        dtype={'brand': 'object', 'category_code': 'object',
+                               'event_type': 'object', 'user_session': 'object'})
+
+    event_time = pd.to_datetime(chunk['event_time'], format=EVENT_TIME_FORMAT, errors='coerce')
+    epoch = (event_time - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)
+
+    parsed = {
+        'event_time': epoch.astype('Int64'),
+        'product_id': chunk['product_id'].astype('Int64'),
+        'category_id': chunk['category_id'].astype('Int64'),
+        'price': chunk['price'].astype('float64'),
+        'user_id': chunk['user_id'].astype('Int64')
+    }
+    factorized = {}
+    for column in DICTIONARY_TABLES:
+        codes, uniques = pd.factorize(chunk[column])
+        factorized[column] = (codes, uniques.tolist())
+    return len(chunk), parsed, factorized
+
+def _encode_rows(parsed, factorized, dictionaries):
+    """Build facts-table row tuples from a parsed chunk"""
+    encoded = {}
+    for column, (codes, uniques) in factorized.items():
+        # Code -1 marks a missing value; it indexes the trailing None
+        lookup = np.array(dictionaries[column].ids_for(uniques) + [None], dtype=object)
+        encoded[column] = lookup[codes]
+
+    def values(series):
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    price = parsed['price']
+    return list(zip(
+        values(parsed['event_time']),
+        encoded['event_type'].tolist(),
+        values(parsed['product_id']),
+        values(parsed['category_id']),
+        encoded['category_code'].tolist(),
+        encoded['brand'].tolist(),
+        [None if p != p else p for p in price.tolist()],
+        values(parsed['user_id']),
+        encoded['user_session'].tolist()
+    ))
+
+def _read_chunks(csv_file, chunk_size):
+    """Yield (raw_bytes, end_offset) blocks of whole CSV lines from an open binary file"""
+    while True:
+        lines = list(islice(csv_file, chunk_size))
+        if not lines:
+            return
+        yield b''.join(lines), csv_file.tell()
+
+def _load_checkpoint(checkpoint_path, csv_path, table_name, conn):
+    """Return the last committed load position, or None to start from scratch"""
+    if not checkpoint_path.exists():
+        return None
+
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+
+    if (checkpoint.get('csv_path') != str(csv_path)
+            or checkpoint.get('csv_size') != os.path.getsize(csv_path)
+            or checkpoint.get('table') != table_name):
+        print(f"Ignoring stale checkpoint {checkpoint_path}")
+        return None
+
+    # A crash between COMMIT and the checkpoint rewrite leaves a pending entry;
+    # the table's max rowid tells us whether that transaction made it to disk.
+    pending = checkpoint.pop('pending', None)
+    if pending:
+        try:
+            facts_table = f"{table_name}{FACTS_SUFFIX}"
+            max_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{facts_table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return None
+        if max_rowid == pending['rows']:
+            checkpoint.update(pending)
+
+    return checkpoint
+
+def _write_checkpoint(checkpoint_path, checkpoint):
+    """Atomically replace the checkpoint file"""
+    tmp_path = checkpoint_path.with_suffix(checkpoint_path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def bulk_load_csv_to_sqlite(csv_path, db_path='ecommerce.db', table_name='events',
+                            workers=None, chunk_size=BULK_CHUNK_SIZE,
+                            commit_every=BULK_COMMIT_EVERY, checkpoint_path=None):
+    """Load a CSV file into SQLite with parallel parsing and resumable batched commits
+
+    CSV blocks are parsed in a process pool while the main process inserts them
+    with executemany inside large explicit transactions. After every commit the
+    byte offset reached in the CSV is recorded in a checkpoint file, so a crashed
+    load resumes from the last committed chunk instead of starting over.
+
+    Rows are written to a normalized schema: a "<table>_facts" table with epoch
+    timestamps and integer ids for event_type, brand, category_code and
+    user_session, plus a "<table>" view exposing the original columns.
+    """
+    csv_path = Path(csv_path)
+    checkpoint_path = Path(checkpoint_path or f"{db_path}.{table_name}.checkpoint.json")
+    workers = workers or os.cpu_count() or 1
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+
+    try:
+        # Relaxed durability while loading; the checkpoint covers crash recovery
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-262144')
+
+        columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+        print(f"Bulk loading {csv_path} into SQLite database ({workers} workers)...")
+        print(f"Columns found: {columns}")
+
+        checkpoint = _load_checkpoint(checkpoint_path, csv_path, table_name, conn)
+        if checkpoint:
+            print(f"Resuming from checkpoint: {checkpoint['rows']:,} rows already committed")
+        else:
+            _create_normalized_schema(conn, table_name)
+            checkpoint = {
+                'csv_path': str(csv_path),
+                'csv_size': os.path.getsize(csv_path),
+                'table': table_name,
+                'offset': 0,
+                'rows': 0,
+                'chunks': 0
+            }
+            _write_checkpoint(checkpoint_path, checkpoint)
+
+        insert_sql = f'INSERT INTO "{table_name}{FACTS_SUFFIX}" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+        dictionaries = {
+            column: _Dictionary(conn, table, max_cache=200_000 if column == 'user_session' else 2_000_000)
+            for column, table in DICTIONARY_TABLES.items()
+        }
+
+        with open(csv_path, 'rb') as csv_file, ProcessPoolExecutor(max_workers=workers) as pool:
+            csv_file.readline()  # header
+            if checkpoint['offset']:
+                csv_file.seek(checkpoint['offset'])
+
+            # Keep a bounded window of chunks in flight and consume them in file order
+            in_flight = deque()
+            chunks = _read_chunks(csv_file, chunk_size)
+            rows = checkpoint['rows']
+            chunks_done = checkpoint['chunks']
+            uncommitted = 0
+
+            def submit_next():
+                block = next(chunks, None)
+                if block is not None:
+                    data, end_offset = block
+                    in_flight.append((pool.submit(_parse_chunk, data, columns), end_offset))
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            if in_flight:
+                conn.execute('BEGIN')
+            while in_flight:
+                future, end_offset = in_flight.popleft()
+                submit_next()
+
+                row_count, parsed, factorized = future.result()
+                conn.executemany(insert_sql, _encode_rows(parsed, factorized, dictionaries))
+                rows += row_count
+                chunks_done += 1
+                uncommitted += 1
+                print(f"Inserted chunk {chunks_done} ({row_count} rows, {rows:,} total)")
+
+                if uncommitted >= commit_every or not in_flight:
+                    position = {'offset': end_offset, 'rows': rows, 'chunks': chunks_done}
+                    _write_checkpoint(checkpoint_path, {**checkpoint, 'pending': position})
+                    conn.execute('COMMIT')
+                    checkpoint.update(position)
+                    _write_checkpoint(checkpoint_path, checkpoint)
+                    uncommitted = 0
+                    if in_flight:
+                        conn.execute('BEGIN')
+
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        # Create indexes once the table is fully populated
+        print("Creating indexes...")
+        _create_facts_indexes(conn, table_name)
+
+        row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}{FACTS_SUFFIX}"').fetchone()[0]
+        print(f"\nSuccessfully loaded {row_count:,} rows into '{table_name}' table")
+
+        checkpoint_path.unlink(missing_ok=True)
+
+    finally:
+        conn.close()
+
 def main():
+    parser = argparse.ArgumentParser(description="Load Kaggle e-commerce CSVs into SQLite")
+    parser.add_argument('--bulk', action='store_true',
+                        help="parallel, resumable bulk load (process pool + batched transactions)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="parser processes for --bulk (default: CPU count)")
+    parser.add_argument('--db', default='ecommerce.db', help="SQLite database path")
+    args = parser.parse_args()
+
     # Path to Kaggle dataset cache
     kaggle_cache = Path.home() / '.cache' / 'kagglehub' / 'datasets' / 'mkechinov' / 'ecommerce-behavior-data-from-multi-category-store' / 'versions' / '8'
 
@@ -74,10 +453,13 @@ def main():
 
         # Use different table names for different months
         table_name = csv_file.stem.replace('-', '_').lower()
-        load_csv_to_sqlite(csv_file, table_name=table_name)
+        if args.bulk:
+            bulk_load_csv_to_sqlite(csv_file, db_path=args.db, table_name=table_name, workers=args.workers)
+        else:
+            load_csv_to_sqlite(csv_file, db_path=args.db, table_name=table_name)
 
     print("\n✓ All files loaded successfully!")
-    print(f"Database created: ecommerce.db")
+    print(f"Database created: {args.db}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Local stand-in for the Supabase (PostgREST) insert endpoint
+
+Accepts POST /rest/v1/<table> with JSON or gzip-compressed JSON bodies and
+keeps the inserted rows in memory, each given an increasing `id` like an
+identity column, so uploads and keyset reads (select, `<column>=gt.<value>`,
+`order=<column>.asc`, limit, offset) can be exercised without a Supabase project.
+Failures can be injected: a list of status codes answered to the next POSTs
+(to exercise retries), and a row limit after which every POST is rejected
+(to interrupt an upload and exercise resuming).
+
+    python stub_postgrest.py --port 54321 --fail 503,429 --accept-rows 5000
+    SUPABASE_URL=http://localhost:54321 SUPABASE_ANON_KEY=x python upload_sample_to_supabase.py
+"""
+
+import argparse
+import gzip
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubPostgREST:
+    def __init__(self, port=0, fail=(), accept_rows=None, retry_after=None):
+        self.rows = defaultdict(list)
+        self.next_id = defaultdict(lambda: 1)
+        self.requests = []
+        self.fail = list(fail)
+        self.accept_rows = accept_rows
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def total_rows(self):
+        with self.lock:
+            return sum(len(rows) for rows in self.rows.values())
+
+    def insert(self, table, records):
+        """Store records, assigning ids; the caller holds the lock"""
+        for record in records:
+            self.rows[table].append({'id': self.next_id[table], **record})
+            self.next_id[table] += 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload=None, headers=None):
+                body = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                table = urlparse(self.path).path.rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                encoding = self.headers.get('Content-Encoding')
+                if encoding == 'gzip':
+                    body = gzip.decompress(body)
+                records = json.loads(body)
+
+                with stub.lock:
+                    stub.requests.append({'table': table, 'encoding': encoding, 'rows': len(records)})
+                    if stub.fail:
+                        status = stub.fail.pop(0)
+                    elif stub.accept_rows is not None and \
+                            sum(len(rows) for rows in stub.rows.values()) + len(records) > stub.accept_rows:
+                        status = 400
+                    else:
+                        stub.insert(table, records)
+                        status = 201
+
+                if status == 201:
+                    self._reply(201)
+                elif status == 429 and stub.retry_after is not None:
+                    self._reply(429, {'message': 'rate limited'}, {'Retry-After': str(stub.retry_after)})
+                else:
+                    self._reply(status, {'message': f'stub answered {status}'})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                table = url.path.rsplit('/', 1)[-1]
+                params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                select = params.pop('select', '*')
+                order = params.pop('order', None)
+                limit = int(params.pop('limit', 0)) or None
+                offset = int(params.pop('offset', 0))
+                with stub.lock:
+                    rows = list(stub.rows[table])
+                if select == 'count':
+                    self._reply(200, [{'count': len(rows)}])
+                    return
+
+                for column, condition in params.items():
+                    op, _, value = condition.partition('.')
+                    if op == 'gt':
+                        rows = [row for row in rows if row.get(column) is not None and row[column] > int(value)]
+                if order:
+                    column, _, direction = order.split(',')[0].partition('.')
+                    rows.sort(key=lambda row: row.get(column), reverse=direction == 'desc')
+                rows = rows[offset:offset + limit if limit else None]
+                if select != '*':
+                    columns = select.split(',')
+                    rows = [{column: row.get(column) for column in columns} for row in rows]
+                self._reply(200, rows)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Supabase REST insert endpoint")
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--fail', default='', help="comma-separated statuses answered to the first POSTs")
+    parser.add_argument('--accept-rows', type=int, default=None, help="reject POSTs once this many rows are stored")
+    parser.add_argument('--retry-after', type=int, default=None, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    fail = [int(status) for status in args.fail.split(',') if status]
+    stub = StubPostgREST(args.port, fail=fail, accept_rows=args.accept_rows, retry_after=args.retry_after)
+    print(f"Stub PostgREST on {stub.url}/rest/v1/<table>")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
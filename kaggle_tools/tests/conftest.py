@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tools are standalone scripts, imported by module name from their directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CSV_HEADER = "event_time,event_type,product_id,category_id,category_code,brand,price,user_id,user_session\n"
+
+
+@pytest.fixture
+def events_csv(tmp_path):
+    """Write a small events CSV in the Kaggle format and return its path"""
+    def write(rows=20, name="2019-Oct.csv"):
+        path = tmp_path / name
+        event_types = ["view", "cart", "remove_from_cart", "purchase"]
+        with open(path, "w") as f:
+            f.write(CSV_HEADER)
+            for i in range(rows):
+                brand = "" if i % 5 == 0 else f"brand{i % 3}"
+                f.write(f"2019-10-01 00:00:{i % 60:02d} UTC,{event_types[i % 4]},{1000 + i},{2000 + i % 4},"
+                        f"electronics.smartphone,{brand},{9.99 + i},{500 + i % 7},session-{i % 6}\n")
+        return path
+    return write
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+import build_user_features as features
+import load_ecommerce_to_sqlite as loader
+
+FEATURE_SQL = "SELECT * FROM user_features ORDER BY user_id"
+
+
+def _load(kind, csv_path, db_path, table_name):
+    if kind == "normalized":
+        loader.bulk_load_csv_to_sqlite(csv_path, db_path=db_path, table_name=table_name, workers=1, chunk_size=8)
+    else:
+        loader.load_csv_to_sqlite(csv_path, db_path=db_path, table_name=table_name)
+
+
+@pytest.mark.parametrize("kind", ["normalized", "raw"])
+def test_incremental_update_matches_full_rebuild(tmp_path, events_csv, kind):
+    db_path = tmp_path / "ecommerce.db"
+    _load(kind, events_csv(rows=30, name="2019-Oct.csv"), db_path, "2019_oct")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert features.update_user_features(conn, step=7) == 30
+        assert features.update_user_features(conn) == 0
+
+        _load(kind, events_csv(rows=45, name="2019-Nov.csv"), db_path, "2019_nov")
+
+        # Only the new month is folded in
+        assert features.update_user_features(conn, step=7) == 45
+        incremental = conn.execute(FEATURE_SQL).fetchall()
+
+        features.rebuild_user_features(conn)
+        assert features.update_user_features(conn) == 75
+        assert conn.execute(FEATURE_SQL).fetchall() == incremental
+    finally:
+        conn.close()
+
+    # users 500..506; every user has events in both months
+    assert [row[0] for row in incremental] == list(range(500, 507))
+    assert sum(row[1] + row[2] for row in incremental) == sum(
+        1 for rows in (30, 45) for i in range(rows) if i % 4 in (0, 1))
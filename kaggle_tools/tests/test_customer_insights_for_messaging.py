@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import customer_insights_for_messaging as insights
+from stub_postgrest import StubPostgREST
+
+
+def _events(user_ids, event_time):
+    return [{"event_time": event_time, "event_type": "view", "user_id": user_id,
+             "category_code": "electronics", "brand": "acme", "price": 1.0} for user_id in user_ids]
+
+
+def test_rest_pages_neither_skip_nor_repeat_rows_inserted_meanwhile(monkeypatch):
+    server = StubPostgREST().start()
+    try:
+        monkeypatch.setattr(insights, "SUPABASE_URL", server.url)
+        with server.lock:
+            server.insert("ecommerce_events", _events(range(25), "2019-10-01T00:00:00"))
+
+        pages = []
+        for page in insights.iter_rest_events(batch_size=10):
+            pages.append(page)
+            if len(pages) == 1:
+                # Rows with earlier timestamps arriving mid-scan would shift time-ordered OFFSET pages
+                with server.lock:
+                    server.insert("ecommerce_events", _events(range(100, 105), "2019-09-30T00:00:00"))
+
+        events = pd.concat(pages)
+        assert list(events.columns) == insights.EVENT_COLUMNS
+        assert sorted(events["user_id"]) == list(range(25)) + list(range(100, 105))
+    finally:
+        server.stop()
+
+
+def _fixture_events(rows=60):
+    event_types = ["view", "view", "cart", "purchase", "remove_from_cart"]
+    return pd.DataFrame({
+        "event_time": [f"2019-10-{1 + (i * 5) % 20:02d} {(i * 7) % 24:02d}:{i % 60:02d}:00 UTC" for i in range(rows)],
+        "event_type": [event_types[(i * 3) % 5] for i in range(rows)],
+        "user_id": [500 + (i * 11) % 9 for i in range(rows)],
+        "category_code": [None if i % 6 == 0 else f"cat{i % 4}" for i in range(rows)],
+        "brand": [None if i % 5 == 0 else f"brand{i % 3}" for i in range(rows)],
+        "price": [9.99 + i for i in range(rows)],
+    })
+
+
+def test_streamed_metrics_match_the_pandas_computation():
+    df = _fixture_events()
+    # Small batches split every user's events across several updates
+    aggregator = insights.MessagingInsightsAggregator().consume(
+        df.iloc[start:start + 7] for start in range(0, len(df), 7))
+
+    # The per-metric pandas computations the script ran before it streamed
+    times = pd.to_datetime(df["event_time"])
+    assert aggregator.total_events == len(df)
+    assert dict(enumerate(aggregator.hourly)) == times.dt.hour.value_counts().reindex(range(24), fill_value=0).to_dict()
+    assert dict(enumerate(aggregator.weekday)) == times.dt.dayofweek.value_counts().reindex(range(7), fill_value=0).to_dict()
+    assert dict(aggregator.event_types) == df["event_type"].value_counts().to_dict()
+    assert dict(aggregator.categories) == df["category_code"].value_counts().to_dict()
+    assert dict(aggregator.brands) == df["brand"].value_counts().to_dict()
+    assert aggregator.cart_value_sum / aggregator.cart_value_count == \
+        pytest.approx(df[df["event_type"] == "cart"]["price"].mean())
+
+    user_segments = df.groupby("user_id")["event_type"].value_counts().unstack(fill_value=0)
+    assert aggregator.unique_users == df["user_id"].nunique() == len(user_segments)
+    views, carts, purchases, events = aggregator.user_columns()
+    users = list(aggregator.user_index)
+    assert dict(zip(users, views.tolist())) == user_segments["view"].to_dict()
+    assert dict(zip(users, carts.tolist())) == user_segments["cart"].to_dict()
+    assert dict(zip(users, purchases.tolist())) == user_segments["purchase"].to_dict()
+
+    user_journeys = df.assign(event_time=times).groupby("user_id").agg(
+        {"event_time": ["min", "max"], "event_type": "count"})
+    user_journeys.columns = ["first_seen", "last_seen", "total_events"]
+    lifetime_days = (user_journeys["last_seen"] - user_journeys["first_seen"]).dt.days
+    n = aggregator.unique_users
+    streamed_days = (aggregator.last_seen[:n] - aggregator.first_seen[:n]) // 86400
+    assert dict(zip(users, events.tolist())) == user_journeys["total_events"].to_dict()
+    assert dict(zip(users, streamed_days.tolist())) == lifetime_days.to_dict()
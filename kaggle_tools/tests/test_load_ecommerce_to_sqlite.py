@@ -0,0 +1,53 @@
+import sqlite3
+
+import load_ecommerce_to_sqlite as loader
+
+
+def _relation(db_path, name):
+    with sqlite3.connect(db_path) as conn:
+        return loader._relation_type(conn, name)
+
+
+def _rows(db_path, table_name):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+
+def test_bulk_load_replaces_legacy_raw_table(tmp_path, events_csv):
+    csv_path = events_csv(rows=30)
+    db_path = tmp_path / "ecommerce.db"
+
+    loader.load_csv_to_sqlite(csv_path, db_path=db_path, table_name="2019_oct")
+    assert _relation(db_path, "2019_oct") == "table"
+
+    loader.bulk_load_csv_to_sqlite(csv_path, db_path=db_path, table_name="2019_oct", workers=1, chunk_size=8)
+    assert _relation(db_path, "2019_oct") == "view"
+    assert _rows(db_path, "2019_oct") == 30
+
+
+def test_raw_load_replaces_normalized_view(tmp_path, events_csv):
+    csv_path = events_csv(rows=12)
+    db_path = tmp_path / "ecommerce.db"
+
+    loader.bulk_load_csv_to_sqlite(csv_path, db_path=db_path, table_name="2019_oct", workers=1)
+    loader.load_csv_to_sqlite(csv_path, db_path=db_path, table_name="2019_oct")
+
+    assert _relation(db_path, "2019_oct") == "table"
+    assert _relation(db_path, "2019_oct_facts") is None
+    assert _rows(db_path, "2019_oct") == 12
+
+
+def test_dictionary_eviction_keeps_previously_cached_values():
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE sessions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    sessions = loader._Dictionary(conn, "sessions", max_cache=4)
+
+    first = sessions.ids_for(["a", "b", "c"])
+    # Two cached values plus three new ones crosses max_cache and clears the cache mid-batch
+    second = sessions.ids_for(["a", "b", "d", "e", "f"])
+
+    assert second[:2] == first[:2]
+    assert len(set(second)) == 5
+    stored = dict(conn.execute("SELECT name, id FROM sessions"))
+    assert second == [stored[v] for v in ["a", "b", "d", "e", "f"]]
+    assert sessions.ids_for(["c"]) == [first[2]]
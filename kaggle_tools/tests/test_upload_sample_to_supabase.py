@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import load_ecommerce_to_sqlite as loader
+import upload_sample_to_supabase as uploader
+from benchmark_transform import legacy_rows_to_records, synthetic_rows
+from stub_postgrest import StubPostgREST
+
+
+@pytest.fixture
+def events_db(tmp_path, events_csv):
+    db_path = tmp_path / "ecommerce.db"
+    loader.load_csv_to_sqlite(events_csv(rows=250), db_path=db_path, table_name="2019_oct")
+    return db_path
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server = StubPostgREST(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _upload(db_path, server, state_path, **kwargs):
+    uploader.upload_all_data(db_path=db_path, base_url=server.url, api_key="test",
+                             state_path=state_path, chunk_size=100, batch_size=25, **kwargs)
+
+
+def _product_ids(server):
+    return [row["product_id"] for row in server.rows["ecommerce_events"]]
+
+
+def test_uploads_gzip_bodies(tmp_path, events_db, stub):
+    server = stub()
+    _upload(events_db, server, tmp_path / "state.json", concurrency=4)
+
+    assert sorted(_product_ids(server)) == list(range(1000, 1250))
+    assert {request["encoding"] for request in server.requests} == {"gzip"}
+    assert json.loads((tmp_path / "state.json").read_text()) == {"2019_oct": 250}
+
+
+def test_uploads_plain_bodies_without_gzip(tmp_path, events_db, stub):
+    server = stub()
+    _upload(events_db, server, tmp_path / "state.json", use_gzip=False)
+
+    assert server.total_rows() == 250
+    assert {request["encoding"] for request in server.requests} == {None}
+
+
+def test_retries_rate_limits_and_server_errors(tmp_path, events_db, stub):
+    server = stub(fail=[429, 503, 429], retry_after=0)
+    _upload(events_db, server, tmp_path / "state.json", concurrency=1)
+
+    assert sorted(_product_ids(server)) == list(range(1000, 1250))
+    # Every batch is sent once, plus one attempt per injected failure
+    assert len(server.requests) == 10 + 3
+
+
+def test_resumes_from_high_water_mark(tmp_path, events_db, stub):
+    state_path = tmp_path / "state.json"
+
+    # The first run is cut off after 100 rows (four batches) are stored
+    interrupted = stub(accept_rows=100)
+    _upload(events_db, interrupted, state_path, concurrency=1)
+    assert sorted(_product_ids(interrupted)) == list(range(1000, 1100))
+    assert json.loads(state_path.read_text()) == {"2019_oct": 100}
+
+    resumed = stub()
+    _upload(events_db, resumed, state_path, concurrency=1)
+    assert sorted(_product_ids(resumed)) == list(range(1100, 1250))
+    assert json.loads(state_path.read_text()) == {"2019_oct": 250}
+
+
+def test_post_batch_gives_up_after_max_retries(stub):
+    server = stub(fail=[503] * 3)
+    session = uploader.create_session("test", 1)
+
+    with pytest.raises(uploader.UploadError):
+        uploader.post_batch(session, f"{server.url}/rest/v1/ecommerce_events", b"[]",
+                            max_retries=2, backoff_base=0.001)
+    assert len(server.requests) == 3
+
+
+def test_transform_rows_matches_legacy_per_row_loop():
+    rows = synthetic_rows(500) + [
+        (501, None, "view", 1, 2, None, None, None, 3, "s"),
+        (502, "not a time", "cart", 1, 2, "", "", "12.50", 3, None),
+        (503, "2019-10-31 23:59:59 UTC", "purchase", 1, 2, "a.b", "x", 7, 3, "s"),
+    ]
+
+    records = uploader.transform_rows(rows)
+
+    assert records == legacy_rows_to_records(rows)
+    assert json.loads(uploader.encode_records(records)) == records
+
+
+def test_transform_rows_keeps_zero_prices():
+    # The per-row loop dropped a price of 0 as falsy; the vectorized one keeps it
+    [record] = uploader.transform_rows([(1, "2019-10-01 00:00:00 UTC", "view", 1, 2, None, None, 0.0, 3, "s")])
+
+    assert record["price"] == 0.0
+    assert record["event_time"] == "2019-10-01T00:00:00"
@@ -1,9 +1,25 @@
 import sqlite3
 import requests
 import json
-from datetime import datetime
+import gzip
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
 import os
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from load_ecommerce_to_sqlite import list_event_tables, keyset_select_sql
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +34,7 @@ def create_table_via_api():
     # For now, we'll assume the table exists or create it via dashboard
     print("Please ensure the 'ecommerce_events' table exists in your Supabase dashboard")
     print("Table schema should include:")
+    print("  - id (bigint identity primary key; readers page on it)")
     print("  - event_time (timestamp)")
     print("  - event_type (text)")
     print("  - product_id (bigint)")
@@ -28,125 +45,233 @@ def create_table_via_api():
     print("  - user_id (bigint)")
     print("  - user_session (text)")
 
-def upload_all_data():
-    """Upload ALL data to Supabase using REST API"""
+class UploadError(Exception):
+    """Raised when a batch is rejected or runs out of retries"""
+
+class HighWaterMark:
+    """Tracks the highest rowid below which every batch has been uploaded
+
+    Batches complete out of order when several are in flight, so the mark only
+    advances past a batch once every earlier batch of the table has succeeded.
+    The mark is persisted to a JSON state file so an interrupted upload resumes
+    from it instead of re-sending the whole table.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = Path(state_path)
+        self.lock = threading.Lock()
+        self.marks = {}
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                self.marks = json.load(f)
+        self.pending = {}
+
+    def get(self, table_name):
+        return self.marks.get(table_name, 0)
+
+    def start(self, table_name, first_rowid, last_rowid):
+        with self.lock:
+            self.pending.setdefault(table_name, {})[first_rowid] = [last_rowid, False]
+
+    def finish(self, table_name, first_rowid):
+        with self.lock:
+            pending = self.pending[table_name]
+            pending[first_rowid][1] = True
+            advanced = False
+            for first in sorted(pending):
+                last, done = pending[first]
+                if not done:
+                    break
+                self.marks[table_name] = last
+                del pending[first]
+                advanced = True
+            if advanced:
+                self._save()
+
+    def _save(self):
+        tmp_path = self.state_path.with_suffix(self.state_path.suffix + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.marks, f)
+        os.replace(tmp_path, self.state_path)
+
+def create_session(api_key, concurrency):
+    """Create a pooled HTTP session sized for the number of in-flight batches"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        "apikey": api_key,
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal"  # Don't return inserted rows to save bandwidth
+    })
+    return session
+
+def transform_rows(rows):
+    """Convert a page of SQLite rows to JSON-serializable records, column by column
+
+    `rows` are (event_rowid, event_time, ..., user_session) tuples as returned by
+    keyset_select_sql. Timestamps and prices are parsed in one vectorized pass
+    per page instead of a strptime/float call per row.
+    """
+    if not rows:
+        return []
+
+    # "2019-10-01 00:00:00 UTC" -> "2019-10-01T00:00:00"; unparseable -> null
+    event_time = pd.to_datetime(pd.Series([row[1] for row in rows], dtype=object).str.slice(0, 19),
+                                format='ISO8601', errors='coerce')
+    event_times = np.datetime_as_string(event_time.to_numpy(dtype='datetime64[s]'), unit='s').astype(object)
+    event_times[event_time.isna().to_numpy()] = None
+
+    prices = pd.to_numeric(pd.Series([row[7] for row in rows], dtype=object), errors='coerce').to_numpy()
+    prices = prices.astype(object)
+    prices[pd.isna(prices)] = None
+
+    # A dict display per row is much cheaper than dict(zip(names, values))
+    return [
+        {
+            "event_time": event_time,
+            "event_type": event_type,
+            "product_id": product_id,
+            "category_id": category_id,
+            "category_code": category_code,
+            "brand": brand,
+            "price": price,
+            "user_id": user_id,
+            "user_session": user_session
+        }
+        for (_, _, event_type, product_id, category_id, category_code, brand, _, user_id, user_session),
+            event_time, price in zip(rows, event_times.tolist(), prices.tolist())
+    ]
+
+def encode_records(records):
+    """Serialize records to a JSON request body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(records)
+    return json.dumps(records, separators=(',', ':')).encode()
+
+def post_batch(session, url, body, use_gzip=True, max_retries=6, backoff_base=0.5, backoff_cap=30.0):
+    """POST one batch, retrying with exponential backoff on 429, 5xx and connection errors"""
+    headers = {}
+    if use_gzip:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=60)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response = None
+            error = str(e)
+        else:
+            if response.status_code in (200, 201, 204):
+                return
+            if response.status_code != 429 and response.status_code < 500:
+                raise UploadError(f"Batch rejected: {response.status_code} {response.text[:500]}")
+            error = f"{response.status_code} {response.text[:200]}"
+
+        if attempt == max_retries:
+            raise UploadError(f"Batch failed after {max_retries} retries: {error}")
+
+        # Honour Retry-After when the server sends one, otherwise full-jitter backoff
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt))
+        time.sleep(delay)
+
+def upload_all_data(db_path='ecommerce.db', base_url=None, api_key=None,
+                    target_table='ecommerce_events', chunk_size=100000, batch_size=1000,
+                    concurrency=8, use_gzip=True, state_path='upload_state.json'):
+    """Upload ALL data to Supabase using REST API
+
+    Reads each event table by rowid keyset pages (no OFFSET scans), splits pages
+    into batches and keeps up to `concurrency` batches in flight on a pooled
+    session. Progress is recorded as a per-table high-water mark in `state_path`,
+    so re-running after an interruption skips everything already uploaded.
+    """
+    base_url = base_url or SUPABASE_URL
+    api_key = api_key or SUPABASE_ANON_KEY
+    url = f"{base_url}/rest/v1/{target_table}"
 
     # Connect to SQLite
-    conn = sqlite3.connect('ecommerce.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    conn = sqlite3.connect(db_path)
 
-    # Get table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [row[0] for row in cursor.fetchall()]
+    # Get event table names (raw tables or normalized-schema views)
+    tables = list_event_tables(conn)
 
     if not tables:
         print("No tables found in SQLite database")
         return
 
+    session = create_session(api_key, concurrency)
+    high_water = HighWaterMark(state_path)
     total_rows_uploaded = 0
+    counter_lock = threading.Lock()
+
+    def upload_batch(table_name, first_rowid, records):
+        nonlocal total_rows_uploaded
+        post_batch(session, url, encode_records(records), use_gzip=use_gzip)
+        high_water.finish(table_name, first_rowid)
+        with counter_lock:
+            total_rows_uploaded += len(records)
 
-    # Upload data from ALL tables
-    for table_name in tables:
-        print(f"\n{'='*60}")
-        print(f"Uploading from table: {table_name}")
-        print('='*60)
-
-        # Get total count for this table
-        cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-        table_total = cursor.fetchone()[0]
-        print(f"Total rows in {table_name}: {table_total:,}")
-
-        # Process in chunks to manage memory
-        chunk_size = 100000  # Process 100k rows at a time
-        offset = 0
-
-        while True:
-            # Get chunk of data
-            cursor.execute(f'''
-                SELECT event_time, event_type, product_id, category_id,
-                       category_code, brand, price, user_id, user_session
-                FROM "{table_name}"
-                LIMIT {chunk_size} OFFSET {offset}
-            ''')
-
-            rows = cursor.fetchall()
-            if not rows:
-                break
-
-            print(f"\nProcessing rows {offset:,} to {offset + len(rows):,} from {table_name}")
-
-            # Prepare data for upload
-            batch_size = 1000
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        # Upload data from ALL tables
+        for table_name in tables:
+            print(f"\n{'='*60}")
+            print(f"Uploading from table: {table_name}")
+            print('='*60)
+
+            last_rowid = high_water.get(table_name)
+            if last_rowid:
+                print(f"Resuming {table_name} after rowid {last_rowid:,}")
+
+            select_sql = keyset_select_sql(conn, table_name)
+            in_flight = set()
             table_uploaded = 0
 
-            headers = {
-                "apikey": SUPABASE_ANON_KEY,
-                "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
-                "Content-Type": "application/json",
-                "Prefer": "return=minimal"  # Don't return inserted rows to save bandwidth
-            }
-
-            for i in range(0, len(rows), batch_size):
-                batch = rows[i:i+batch_size]
-
-                # Convert to JSON-serializable format
-                json_data = []
-                for row in batch:
-                    # Parse event_time
-                    try:
-                        if row['event_time']:
-                            # Handle the UTC format from the CSV
-                            event_time = row['event_time'].replace(' UTC', '')
-                            # Convert to ISO format for Supabase
-                            dt = datetime.strptime(event_time, '%Y-%m-%d %H:%M:%S')
-                            event_time_iso = dt.isoformat()
-                        else:
-                            event_time_iso = None
-                    except:
-                        event_time_iso = None
-
-                    json_data.append({
-                        "event_time": event_time_iso,
-                        "event_type": row['event_type'],
-                        "product_id": row['product_id'],
-                        "category_id": row['category_id'],
-                        "category_code": row['category_code'],
-                        "brand": row['brand'],
-                        "price": float(row['price']) if row['price'] else None,
-                        "user_id": row['user_id'],
-                        "user_session": row['user_session']
-                    })
-
-                # Upload batch via REST API
-                try:
-                    response = requests.post(
-                        f"{SUPABASE_URL}/rest/v1/ecommerce_events",
-                        headers=headers,
-                        json=json_data
-                    )
-
-                    if response.status_code == 201:
-                        table_uploaded += len(batch)
-                        chunk_progress = (table_uploaded / len(rows)) * 100
-                        overall_progress = ((offset + table_uploaded) / table_total) * 100
-                        print(f"Chunk: {table_uploaded:,}/{len(rows):,} ({chunk_progress:.1f}%) | Overall: {offset + table_uploaded:,}/{table_total:,} ({overall_progress:.1f}%)", end='\r')
-                    else:
-                        print(f"\nError uploading batch: {response.status_code}")
-                        print(f"Response: {response.text}")
-                        break
-
-                except Exception as e:
-                    print(f"\nError: {e}")
+            while True:
+                # Keyset pagination: seek past the last rowid instead of OFFSET
+                rows = conn.execute(select_sql, (last_rowid, chunk_size)).fetchall()
+                if not rows:
                     break
+                last_rowid = rows[-1][0]
+                records = transform_rows(rows)
+
+                for i in range(0, len(rows), batch_size):
+                    first_rowid = rows[i][0]
+                    high_water.start(table_name, first_rowid, rows[min(i + batch_size, len(rows)) - 1][0])
+                    in_flight.add(pool.submit(upload_batch, table_name, first_rowid, records[i:i+batch_size]))
+
+                    # Bound the number of batches in flight (and rows held in memory)
+                    while len(in_flight) >= concurrency * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+
+                table_uploaded += len(rows)
+                print(f"Read {table_uploaded:,} rows from {table_name} (uploaded so far: {total_rows_uploaded:,})", end='\r')
+
+            for future in in_flight:
+                future.result()
+
+            print(f"\n{'='*60}")
+            print(f"✓ Finished uploading table {table_name}")
+            print(f"{'='*60}")
+
+    except UploadError as e:
+        # Drop queued batches; the high-water mark stops before the failed one
+        pool.shutdown(cancel_futures=True)
+        print(f"\nError: {e}")
+        print(f"Progress saved to {state_path}; re-run to resume.")
+        conn.close()
+        return
 
-            offset += chunk_size
-            total_rows_uploaded += table_uploaded
-            print(f"\n✓ Completed chunk: {table_uploaded:,} rows uploaded")
-
-        print(f"\n{'='*60}")
-        print(f"✓ Finished uploading table {table_name}")
-        print(f"{'='*60}")
+    pool.shutdown()
 
     # Final summary
     print(f"\n{'='*80}")
@@ -156,13 +281,7 @@ def upload_all_data():
 
     # Verify upload
     try:
-        response = requests.get(
-            f"{SUPABASE_URL}/rest/v1/ecommerce_events?select=count",
-            headers={
-                "apikey": SUPABASE_ANON_KEY,
-                "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
-            }
-        )
+        response = session.get(f"{url}?select=count")
 
         if response.status_code == 200:
             data = response.json()
@@ -174,6 +293,14 @@ def upload_all_data():
     conn.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Upload SQLite event tables to Supabase")
+    parser.add_argument('--db', default='ecommerce.db', help="SQLite database path")
+    parser.add_argument('--batch-size', type=int, default=1000, help="rows per POST")
+    parser.add_argument('--concurrency', type=int, default=8, help="batches in flight")
+    parser.add_argument('--no-gzip', action='store_true', help="send uncompressed request bodies")
+    parser.add_argument('--state', default='upload_state.json', help="high-water mark file")
+    args = parser.parse_args()
+
     print("=" * 80)
     print("Supabase FULL Data Upload (100GB Plan)")
     print("=" * 80)
@@ -228,7 +355,8 @@ def main():
     print("With ~67.5M rows, this may take several hours.")
     print("\n" + "=" * 80)
 
-    upload_all_data()
+    upload_all_data(db_path=args.db, batch_size=args.batch_size, concurrency=args.concurrency,
+                    use_gzip=not args.no_gzip, state_path=args.state)
 
     print("\n" + "=" * 80)
     print("✓ Upload completed!")
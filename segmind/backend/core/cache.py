@@ -0,0 +1,216 @@
+"""Response cache for read-heavy routes.
+
+Two tiers: an in-process LRU with TTL, and an optional Redis tier shared
+between workers. Entries are served fresh for `ttl` seconds, then served
+stale for up to `stale_ttl` more while one background refresh recomputes
+them, so dashboard requests only block when nothing is cached at all.
+Refreshes run on the shared io worker pool, and concurrent misses on a key
+are serialized by a fixed set of striped locks, so neither threads nor
+locks grow with the number of distinct keys.
+
+Set CACHE_REDIS_ENABLED=true to use `settings.redis_url`; a `fakeredis://`
+URL uses the in-memory fakeredis server for tests.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from core.executors import worker_pools
+from core.utils.config import settings
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Misses on keys hashing to the same stripe wait for each other; plenty for a handful of routes
+KEY_LOCK_STRIPES = 64
+
+
+def create_redis_client(url: str):
+    """Redis client for url, or None when Redis support is not installed"""
+    if url.startswith("fakeredis://"):
+        import fakeredis
+        return fakeredis.FakeRedis()
+    if redis is None:
+        logger.warning("redis package not installed; response cache stays in-process")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+
+class ResponseCache:
+    """LRU + TTL cache with stale-while-revalidate and an optional Redis tier"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60, stale_ttl: float = 300,
+                 redis_client=None, prefix: str = "segmind:cache:", executor=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.redis = redis_client
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self.executor = executor
+        self._refreshing = set()
+        self.hits = self.stale_hits = self.misses = 0
+
+    # Local tier
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Redis tier; any Redis failure degrades to a local miss
+
+    def _get_remote(self, key):
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        fresh_until, stale_until, value = json.loads(raw)
+        return fresh_until, stale_until, value
+
+    def _set_remote(self, key, entry):
+        if self.redis is None:
+            return
+        expires_in = max(1, int(entry[1] - time.time()))
+        try:
+            self.redis.set(self.prefix + key, json.dumps(entry, default=str), ex=expires_in)
+        except Exception as e:
+            logger.warning(f"Redis cache write failed: {e}")
+
+    def _lookup(self, key):
+        entry = self._get_local(key)
+        if entry is None:
+            entry = self._get_remote(key)
+            if entry is not None:
+                self._set_local(key, entry)
+        return entry
+
+    def _store(self, key, value, ttl):
+        now = time.time()
+        entry = (now + ttl, now + ttl + self.stale_ttl, value)
+        self._set_local(key, entry)
+        self._set_remote(key, entry)
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _refresh_in_background(self, key, compute, ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._store(key, compute(), ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        try:
+            (self.executor or worker_pools.io).submit(refresh)
+        except RuntimeError:
+            # Pool shutting down: keep serving the stale entry
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None):
+        """Cached value for key, computing it (once per key at a time) when absent"""
+        ttl = self.ttl if ttl is None else ttl
+        entry = self._lookup(key)
+        if entry is not None:
+            fresh_until, _, value = entry
+            if fresh_until > time.time():
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh_in_background(key, compute, ttl)
+            return value
+
+        # Nothing usable cached: only one caller computes, the rest wait for it
+        with self._key_lock(key):
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            value = compute()
+            self._store(key, value, ttl)
+            return value
+
+    def invalidate(self, prefix: str = ""):
+        """Drop local entries (and Redis entries) whose key starts with prefix"""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        if self.redis is not None:
+            try:
+                keys = list(self.redis.scan_iter(match=f"{self.prefix}{prefix}*"))
+                if keys:
+                    self.redis.delete(*keys)
+            except Exception as e:
+                logger.warning(f"Redis cache invalidation failed: {e}")
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "redis": self.redis is not None
+        }
+
+    def cached(self, ttl: Optional[float] = None):
+        """Decorator caching a route handler by route name and its parameters"""
+        def decorator(func):
+            name = f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                params = json.dumps([args, kwargs], sort_keys=True, default=str)
+                key = f"{name}:{params}"
+                return self.get_or_compute(key, lambda: func(*args, **kwargs), ttl)
+
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache(
+    max_entries=settings.cache_max_entries,
+    ttl=settings.cache_ttl,
+    stale_ttl=settings.cache_stale_ttl,
+    redis_client=create_redis_client(settings.redis_url) if settings.cache_redis_enabled else None
+)
+cached = response_cache.cached
@@ -0,0 +1,94 @@
+"""Campaign repository for the /api/campaigns and /api/messaging routes.
+
+Campaigns live in the message store's database (the dispatcher and receipt
+ingestion update their counters there); this module owns how they are
+created and queried. Listings are newest first and page by an opaque cursor
+(the insertion sequence). Calendar lookups are a range scan over the
+scheduled_at index, and due-campaign lookups use (status, scheduled_at).
+
+Timestamps are stored as naive local ISO strings, so string order is time
+order; timezone-aware inputs are converted on the way in.
+"""
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from core.message_store import message_store, MessageStore, CAMPAIGN_COLUMNS, campaign_from_row
+from core.utils.schemas import Campaign
+
+_SELECT = f"SELECT seq, {', '.join(CAMPAIGN_COLUMNS)} FROM campaigns"
+
+
+def local_time(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive local time, the form timestamps are stored and compared in"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def new_campaign_id() -> str:
+    return f"camp_{uuid.uuid4().hex[:12]}"
+
+
+class CampaignRepository:
+    def __init__(self, store: MessageStore = message_store):
+        self.store = store
+
+    def create(self, **fields: Any) -> Campaign:
+        """Insert a campaign with a new id; status defaults to scheduled/draft by scheduled_at"""
+        now = datetime.now()
+        fields["scheduled_at"] = local_time(fields.get("scheduled_at"))
+        fields.setdefault("status", "scheduled" if fields["scheduled_at"] else "draft")
+        campaign = Campaign(id=new_campaign_id(), created_at=now, updated_at=now, **fields)
+        return self.store.add_campaign(campaign)
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        return self.store.get_campaign(campaign_id)
+
+    def update(self, campaign_id: str, **fields: Any) -> Optional[Campaign]:
+        if "scheduled_at" in fields:
+            fields["scheduled_at"] = local_time(fields["scheduled_at"])
+        return self.store.update_campaign(campaign_id, updated_at=datetime.now(), **fields)
+
+    def delete(self, campaign_id: str) -> bool:
+        with self.store.transaction() as conn:
+            return conn.execute("DELETE FROM campaigns WHERE id = ?", (campaign_id,)).rowcount > 0
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None,
+             status: Optional[str] = None) -> Tuple[List[Campaign], Optional[str]]:
+        """Newest-first page of campaigns and the cursor for the next page (None at the end)"""
+        where, params = [], []
+        if cursor:
+            where.append("seq < ?")
+            params.append(int(cursor))
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = _SELECT
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        rows = self.store.read(sql, params + [limit + 1])
+
+        next_cursor = str(rows[limit - 1]["seq"]) if len(rows) > limit else None
+        return [campaign_from_row(row) for row in rows[:limit]], next_cursor
+
+    def scheduled_between(self, start: datetime, end: datetime) -> List[Campaign]:
+        """Campaigns with start <= scheduled_at < end, in schedule order"""
+        rows = self.store.read(
+            f"{_SELECT} WHERE scheduled_at >= ? AND scheduled_at < ? ORDER BY scheduled_at",
+            (local_time(start).isoformat(), local_time(end).isoformat())
+        )
+        return [campaign_from_row(row) for row in rows]
+
+    def with_status(self, status: str, before: Optional[datetime] = None) -> List[Campaign]:
+        """Campaigns in a status (optionally scheduled before a time), in schedule order"""
+        sql, params = f"{_SELECT} WHERE status = ?", [status]
+        if before is not None:
+            sql += " AND scheduled_at < ?"
+            params.append(local_time(before).isoformat())
+        rows = self.store.read(sql + " ORDER BY scheduled_at", params)
+        return [campaign_from_row(row) for row in rows]
+
+
+campaign_repository = CampaignRepository()
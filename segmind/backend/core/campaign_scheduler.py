@@ -0,0 +1,174 @@
+"""Fires scheduled campaigns at their scheduled_at.
+
+Campaigns due within the next `scheduler_horizon` seconds are kept in a heap
+ordered by fire time; one task sleeps until the head is due (or until an
+earlier job is added). The heap is refilled from the repository every
+`scheduler_reload_interval` seconds with an index range scan, so memory and
+startup cost depend on the campaigns due soon, not on how many are scheduled
+overall, and jobs survive restarts because the repository is the source of
+truth. Campaigns whose time passed while the process was down fire on load.
+
+Rescheduled or cancelled campaigns leave stale heap entries behind; they are
+skipped when popped. Before firing, the campaign is claimed with a
+conditional UPDATE, so a campaign changed in the meantime (or claimed by
+another process) is not sent.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.campaign_repository import campaign_repository, CampaignRepository
+from core.utils.config import settings
+from core.utils.schemas import Campaign
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED = "scheduled"
+
+
+class CampaignScheduler:
+    def __init__(self, repository: CampaignRepository = campaign_repository, horizon: float = None,
+                 reload_interval: float = None):
+        self.repository = repository
+        self.horizon = horizon or settings.scheduler_horizon
+        self.reload_interval = reload_interval or settings.scheduler_reload_interval
+        self._heap: List[Tuple[float, int, str]] = []
+        self._jobs: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._fire: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Fire tasks in flight; the loop only keeps weak references to tasks
+        self._firing: Set[asyncio.Task] = set()
+        self._running = False
+        self._next_reload = 0.0
+        self.fired = 0
+        self.skipped = 0
+        self.last_lateness_ms = 0.0
+
+    def _push(self, campaign_id: str, when: datetime):
+        at = when.timestamp()
+        if at > time.time() + self.horizon:
+            # Picked up by a later reload
+            self._jobs.pop(campaign_id, None)
+            return
+        if self._jobs.get(campaign_id) == at:
+            return
+        self._jobs[campaign_id] = at
+        heapq.heappush(self._heap, (at, next(self._counter), campaign_id))
+        if self._heap[0][2] == campaign_id and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _sync(self, campaign_id: str, status: Optional[str], when: Optional[datetime]):
+        if status == SCHEDULED and when is not None:
+            self._push(campaign_id, when)
+        else:
+            self._jobs.pop(campaign_id, None)
+
+    def sync(self, campaign: Optional[Campaign], campaign_id: Optional[str] = None):
+        """Reflect a created/updated/deleted campaign; safe to call from any thread"""
+        if self._loop is None:
+            return
+        if campaign is None:
+            args = (campaign_id, None, None)
+        else:
+            args = (campaign.id, campaign.status, campaign.scheduled_at)
+        self._loop.call_soon_threadsafe(self._sync, *args)
+
+    async def reload(self):
+        """Load every scheduled campaign due within the horizon"""
+        until = datetime.fromtimestamp(time.time() + self.horizon)
+        campaigns = await asyncio.to_thread(self.repository.with_status, SCHEDULED, until)
+        for campaign in campaigns:
+            self._push(campaign.id, campaign.scheduled_at)
+        self._next_reload = time.monotonic() + self.reload_interval
+
+    def _claim(self, campaign_id: str, at: float) -> bool:
+        with self.repository.store.transaction() as conn:
+            row = conn.execute("SELECT scheduled_at FROM campaigns WHERE id = ? AND status = ?",
+                               (campaign_id, SCHEDULED)).fetchone()
+            if row is None or row[0] is None or datetime.fromisoformat(row[0]).timestamp() != at:
+                return False
+            conn.execute("UPDATE campaigns SET status = 'sending', updated_at = ? WHERE id = ?",
+                         (datetime.now().isoformat(), campaign_id))
+            return True
+
+    async def _fire_job(self, campaign_id: str, at: float):
+        if not await asyncio.to_thread(self._claim, campaign_id, at):
+            self.skipped += 1
+            return
+        self.fired += 1
+        self.last_lateness_ms = round((time.time() - at) * 1000, 1)
+        try:
+            await self._fire(campaign_id)
+        except Exception as e:
+            logger.error(f"Scheduled send of {campaign_id} failed: {getattr(e, 'detail', e)}")
+            await asyncio.to_thread(self.repository.update, campaign_id, status="failed")
+
+    async def _run(self):
+        while self._running:
+            if time.monotonic() >= self._next_reload:
+                try:
+                    await self.reload()
+                except Exception as e:
+                    logger.error(f"Scheduler reload failed: {e}")
+                    self._next_reload = time.monotonic() + self.reload_interval
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                at, _, campaign_id = heapq.heappop(self._heap)
+                if self._jobs.get(campaign_id) != at:
+                    continue
+                del self._jobs[campaign_id]
+                task = asyncio.create_task(self._fire_job(campaign_id, at))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+            delay = self._next_reload - time.monotonic()
+            if self._heap:
+                delay = min(delay, self._heap[0][0] - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, fire: Callable[[str], Awaitable[Any]]):
+        """Start firing; `fire(campaign_id)` starts the send of a claimed campaign"""
+        self._fire = fire
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        self._loop = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        firing = list(self._firing)
+        for task in firing:
+            task.cancel()
+        await asyncio.gather(*firing, return_exceptions=True)
+        self._heap.clear()
+        self._jobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        upcoming = min(self._jobs.values()) if self._jobs else None
+        return {
+            "pending": len(self._jobs),
+            "next_fire_at": datetime.fromtimestamp(upcoming).isoformat() if upcoming else None,
+            "fired": self.fired,
+            "skipped": self.skipped,
+            "last_lateness_ms": self.last_lateness_ms
+        }
+
+
+campaign_scheduler = CampaignScheduler()
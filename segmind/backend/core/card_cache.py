@@ -0,0 +1,191 @@
+"""Content-addressed cache for generated campaign cards.
+
+Keys are a SHA-256 of the normalized prompt inputs (product, strategy,
+schedule) plus the model parameters, so re-submitting the same payload maps
+to the same entry no matter how the JSON was ordered or spaced. Values are
+kept as JSON in two tiers: an in-process LRU and a SQLite file that survives
+restarts, both bounded by `card_cache_ttl`.
+
+Concurrent misses for one key share a single upstream call. The call runs
+in its own task; it is cancelled only when every request waiting on it has
+been abandoned, so one impatient client can't fail the others.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.utils.config import settings
+
+# Bump when the card format or prompts change, to stop serving old entries
+CACHE_VERSION = 1
+
+HIT_MEMORY = "hit-memory"
+HIT_DISK = "hit-disk"
+MISS = "miss"
+SHARED = "shared"
+BYPASS = "bypass"
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None and v != ""}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def card_cache_key(**inputs: Any) -> str:
+    """Stable hash of prompt inputs and model parameters"""
+    canonical = json.dumps({"v": CACHE_VERSION, **_normalize(inputs)}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class CardCache:
+    def __init__(self, db_path: str = None, ttl: float = None, max_entries: int = None):
+        self.db_path = db_path or settings.card_cache_path
+        self.ttl = ttl or settings.card_cache_ttl
+        self.max_entries = max_entries or settings.card_cache_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = self.disk_hits = self.misses = self.shared = 0
+
+    # Disk tier
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS card_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+        return self._conn
+
+    def _get_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._db().execute("SELECT expires_at, value FROM card_cache WHERE key = ? AND expires_at > ?",
+                                     (key, time.time())).fetchone()
+        return tuple(row) if row else None
+
+    def _set_disk(self, key: str, expires_at: float, value: str):
+        with self._lock:
+            conn = self._db()
+            conn.execute("INSERT OR REPLACE INTO card_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, value, expires_at))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM card_cache WHERE expires_at <= ?", (time.time(),))
+
+    # Memory tier
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _set_memory(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Tuple[Optional[List[Any]], Optional[str]]:
+        """(cards, cache_status) from either tier, or (None, None) when not cached"""
+        value = self._get_memory(key)
+        if value is not None:
+            self.memory_hits += 1
+            return json.loads(value), HIT_MEMORY
+        entry = await asyncio.to_thread(self._get_disk, key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._set_memory(key, *entry)
+            return json.loads(entry[1]), HIT_DISK
+        return None, None
+
+    async def put(self, key: str, cards: List[Any]):
+        value = json.dumps(cards)
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, expires_at, value)
+        await asyncio.to_thread(self._set_disk, key, expires_at, value)
+
+    async def _produce(self, key: str, producer: Callable[[], Awaitable[Tuple[List[Any], bool]]]):
+        cards, cacheable = await producer()
+        if cacheable:
+            await self.put(key, cards)
+        return cards
+
+    async def get_or_generate(self, key: str,
+                              producer: Callable[[], Awaitable[Tuple[List[Any], bool]]]) -> Tuple[List[Any], str]:
+        """(cards, cache_status); `producer` returns (cards, whether they may be cached)"""
+        flight = self._flights.get(key)
+        status = SHARED
+        if flight is None:
+            cards, cached_status = await self.get(key)
+            if cards is not None:
+                return cards, cached_status
+            flight = self._flights.get(key)
+            if flight is None:
+                status = MISS
+                flight = self._flights[key] = _Flight(asyncio.create_task(self._produce(key, producer)))
+                flight.task.add_done_callback(lambda _, key=key: self._flights.pop(key, None))
+        if status == SHARED:
+            self.shared += 1
+        else:
+            self.misses += 1
+
+        flight.waiters += 1
+        try:
+            cards = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        # Each caller gets its own copy
+        return (json.loads(json.dumps(cards)) if status == SHARED else cards), status
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "in_flight": len(self._flights)
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+card_cache = CardCache()
@@ -0,0 +1,250 @@
+"""Campaign fan-out dispatcher.
+
+Recipients arrive in batches from a (blocking) iterator, are rendered a batch
+at a time from the campaign's compiled template and pushed through a bounded
+asyncio queue to a pool of send workers. Per-recipient placeholders
+(RECIPIENT_VARIABLES) are filled from the batch; every other placeholder comes
+from the campaign's shared `variables`, and campaigns that leave one unfilled
+are rejected before they are sent (see `unresolved_variables`).
+Each channel has a process-wide concurrency limit shared by all running
+campaigns, and every send is paced by the token-bucket scheduler. Memory is bounded by the batch size, the queue and the flush
+interval, not by the number of recipients.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from core.executors import worker_pools
+from core.message_store import message_store
+from core.providers import MessageProvider, ProviderResult, create_provider
+from core.rate_limiter import SendScheduler, send_scheduler, DEFAULT_SENDER
+from core.templating import PLACEHOLDER_RE, template_cache
+from core.utils.config import settings
+from core.utils.schemas import Campaign, Message
+
+logger = logging.getLogger(__name__)
+
+# Flush progress counters and sent message rows after this many sends or seconds
+FLUSH_EVERY = 500
+FLUSH_INTERVAL = 1.0
+
+# Placeholders filled per recipient from the recipient batch
+RECIPIENT_VARIABLES = frozenset({"customer_id"})
+
+
+def unresolved_variables(content: str, subject: Optional[str], variables: Mapping[str, Any]) -> List[str]:
+    """Placeholders in a campaign's content or subject that neither its variables nor the recipient fill"""
+    names = set(PLACEHOLDER_RE.findall(content)) | set(PLACEHOLDER_RE.findall(subject or ""))
+    return sorted(names - set(variables) - RECIPIENT_VARIABLES)
+
+
+@dataclass
+class DispatchProgress:
+    campaign_id: str
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        done = self.sent + self.failed
+        return {
+            "campaign_id": self.campaign_id,
+            "total_recipients": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "running": self.finished_at is None,
+            "elapsed_seconds": round(elapsed, 2),
+            "sends_per_second": round(done / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+class CampaignDispatcher:
+    def __init__(self, provider_factory: Callable[[], MessageProvider] = create_provider,
+                 channel_concurrency: Optional[Dict[str, int]] = None, store=message_store,
+                 scheduler: SendScheduler = send_scheduler):
+        self.provider_factory = provider_factory
+        self.channel_concurrency = channel_concurrency or settings.channel_concurrency
+        self.store = store
+        self.scheduler = scheduler
+        self._provider: Optional[MessageProvider] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.progress: Dict[str, DispatchProgress] = {}
+
+    @property
+    def provider(self) -> MessageProvider:
+        if self._provider is None:
+            self._provider = self.provider_factory()
+        return self._provider
+
+    def _limit(self, channel: str) -> int:
+        return self.channel_concurrency.get(channel, 10)
+
+    def _semaphore(self, channel: str) -> asyncio.Semaphore:
+        if channel not in self._semaphores:
+            self._semaphores[channel] = asyncio.Semaphore(self._limit(channel))
+        return self._semaphores[channel]
+
+    async def deliver(self, payload: Dict[str, Any], sender: str, flow: str) -> Optional[ProviderResult]:
+        """Send one payload once the scheduler and the channel limit allow it"""
+        channel = payload["channel"]
+        await self.scheduler.acquire(channel, sender, flow)
+        async with self._semaphore(channel):
+            try:
+                result = await self.provider.send(payload)
+            except Exception as e:
+                logger.warning(f"Provider error for {flow}/{payload.get('to')}: {e}")
+                return None
+        if result.status_code == 429:
+            self.scheduler.pause(channel, sender)
+        return result
+
+    def is_running(self, campaign_id: str) -> bool:
+        task = self._tasks.get(campaign_id)
+        return task is not None and not task.done()
+
+    def start(self, campaign: Campaign, recipient_batches: Iterator[List[Any]]) -> asyncio.Task:
+        """Start sending campaign in the background of the running event loop"""
+        if self.is_running(campaign.id):
+            raise RuntimeError(f"Campaign {campaign.id} is already sending")
+        task = asyncio.create_task(self.run(campaign, recipient_batches))
+        self._tasks[campaign.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(campaign.id, None))
+        return task
+
+    async def run(self, campaign: Campaign, recipient_batches: Iterator[List[Any]]) -> DispatchProgress:
+        """Send campaign to every recipient and return the final counters"""
+        channel = campaign.channel.value if hasattr(campaign.channel, "value") else campaign.channel
+        progress = DispatchProgress(campaign.id)
+        self.progress[campaign.id] = progress
+        workers = self._limit(channel)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        pending: List[Message] = []
+        last_flush = time.monotonic()
+        sender = campaign.sender or DEFAULT_SENDER
+        template = template_cache.get(campaign.id, campaign.content)
+        subject_template = template_cache.get(f"{campaign.id}:subject", campaign.subject) if campaign.subject else None
+        shared = campaign.variables
+
+        async def flush(status: str = "sending"):
+            nonlocal pending, last_flush
+            batch, pending = pending, []
+            last_flush = time.monotonic()
+            await asyncio.to_thread(self._persist, campaign.id, batch, progress, status)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                customer_id, content, subject = item
+                message_id = f"msg_{uuid.uuid4().hex[:12]}"
+                result = await self.deliver({
+                    "message_id": message_id,
+                    "channel": channel,
+                    "from": sender,
+                    "to": customer_id,
+                    "subject": subject,
+                    "content": content,
+                    "campaign_id": campaign.id
+                }, sender, campaign.id)
+                accepted = result is not None and result.accepted
+                if accepted:
+                    progress.sent += 1
+                else:
+                    progress.failed += 1
+                pending.append(Message(
+                    id=message_id,
+                    customer_id=customer_id,
+                    channel=channel,
+                    content=content,
+                    subject=subject,
+                    status="sent" if accepted else "failed",
+                    sent_at=datetime.now(),
+                    campaign_id=campaign.id
+                ))
+                if len(pending) >= FLUSH_EVERY or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    await flush()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        status = "completed"
+        fetching = None
+        try:
+            while True:
+                # Kept so the iterator is only closed once a fetch cancelled mid-way has returned
+                fetching = worker_pools.io.submit(next, recipient_batches, None)
+                batch = await asyncio.wrap_future(fetching)
+                if batch is None:
+                    break
+                progress.total += len(batch)
+                customer_ids = [str(recipient) for recipient in batch]
+                columns = {"customer_id": customer_ids}
+                contents = template.render_columns(columns, shared)
+                subjects = subject_template.render_columns(columns, shared) if subject_template \
+                    else [campaign.subject] * len(customer_ids)
+                for item in zip(customer_ids, contents, subjects):
+                    await queue.put(item)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Dispatch of {campaign.id} failed: {e}")
+            status = "failed"
+        finally:
+            for task in tasks:
+                task.cancel()
+            if fetching is not None and not fetching.done():
+                fetching.add_done_callback(lambda _: self._close_batches(campaign.id, recipient_batches))
+            else:
+                self._close_batches(campaign.id, recipient_batches)
+            progress.finished_at = time.time()
+            if status == "completed" and progress.failed and not progress.sent:
+                status = "failed"
+            try:
+                await asyncio.shield(flush(status))
+            finally:
+                # The store has the final counters from here on
+                if self.progress.get(campaign.id) is progress:
+                    del self.progress[campaign.id]
+        return progress
+
+    @staticmethod
+    def _close_batches(campaign_id: str, recipient_batches: Iterator[List[Any]]):
+        close = getattr(recipient_batches, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Closing the recipients of {campaign_id} failed: {e}")
+
+    def _persist(self, campaign_id: str, messages: List[Message], progress: DispatchProgress, status: str):
+        self.store.add_messages(messages)
+        self.store.update_campaign(
+            campaign_id,
+            status=status,
+            total_recipients=progress.total,
+            sent_count=progress.sent,
+            failed_count=progress.failed
+        )
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await self.scheduler.close()
+        if self._provider is not None:
+            await self._provider.close()
+            self._provider = None
+
+
+dispatcher = CampaignDispatcher()
@@ -0,0 +1,250 @@
+"""Block templates to email HTML and plain text.
+
+Each block (header, text, image, button, spacer, product) becomes a table row
+with inline styles, which is what email clients render reliably. A template
+is compiled once into a sequence of parts: blocks without {{placeholders}}
+are rendered a single time and merged into static strings, and only the
+blocks that reference per-recipient variables stay as compiled templates.
+Rendering a recipient then fills just those fragments and joins the parts.
+
+Rendered blocks are also memoized by their content, so a header or footer
+shared by several templates (or template versions) is only rendered once.
+"""
+import html
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from core.templating import CompiledTemplate, PLACEHOLDER_RE, source_version
+from core.utils.config import settings
+
+EMAIL_WIDTH = 600
+FONT = "Arial, Helvetica, sans-serif"
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BREAK_RE = re.compile(r"<\s*(br|/p|/h[1-6]|/li|/div|/tr)\s*/?>", re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _attr(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _text(value: Any) -> str:
+    return html.escape(str(value), quote=False)
+
+
+def html_to_text(markup: str) -> str:
+    """Plain-text rendering of an authored HTML fragment"""
+    text = _BREAK_RE.sub("\n", markup)
+    text = html.unescape(_TAG_RE.sub("", text))
+    lines = [line.strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _row(inner: str, style: str = "") -> str:
+    return f'<tr><td style="{style}">{inner}</td></tr>'
+
+
+def _upper_literals(text: str) -> str:
+    """Uppercase the text around {{placeholders}}, leaving the variable names as they are"""
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(text):
+        parts.append(text[position:match.start()].upper())
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(text[position:].upper())
+    return "".join(parts)
+
+
+def _header(content: Dict[str, Any]) -> Tuple[str, str]:
+    background = _attr(content.get("backgroundColor", "#111827"))
+    color = _attr(content.get("textColor", "#FFFFFF"))
+    title = content.get("title", "")
+    subtitle = content.get("subtitle")
+    inner = f'<h1 style="margin:0;font-family:{FONT};font-size:26px;color:{color};">{_text(title)}</h1>'
+    if subtitle:
+        inner += f'<p style="margin:8px 0 0;font-family:{FONT};font-size:16px;color:{color};">{_text(subtitle)}</p>'
+    markup = f'<tr><td bgcolor="{background}" align="center" style="padding:32px 24px;background-color:{background};">{inner}</td></tr>'
+    text = _upper_literals(title) + (f"\n{subtitle}" if subtitle else "")
+    return markup, text
+
+
+def _text_block(content: Dict[str, Any]) -> Tuple[str, str]:
+    # Authored HTML, passed through as is
+    markup = content.get("html", "")
+    return _row(markup, f"padding:24px;font-family:{FONT};font-size:16px;line-height:1.5;color:#111827;"), html_to_text(markup)
+
+
+def _image(content: Dict[str, Any]) -> Tuple[str, str]:
+    alt = content.get("alt", "")
+    img = (f'<img src="{_attr(content.get("src", ""))}" alt="{_attr(alt)}" width="{EMAIL_WIDTH}" '
+           f'style="display:block;width:100%;max-width:{EMAIL_WIDTH}px;height:auto;border:0;">')
+    link = content.get("link")
+    if link:
+        img = f'<a href="{_attr(link)}" target="_blank">{img}</a>'
+    text = f"[{alt}]" if alt else ""
+    if link and text:
+        text += f" {link}"
+    return _row(img, "padding:0;"), text
+
+
+def _button(content: Dict[str, Any]) -> Tuple[str, str]:
+    background = _attr(content.get("backgroundColor", "#2563EB"))
+    color = _attr(content.get("textColor", "#FFFFFF"))
+    label = content.get("text", "")
+    link = content.get("link", "#")
+    button = (f'<table role="presentation" cellpadding="0" cellspacing="0" border="0" align="center"><tr>'
+              f'<td bgcolor="{background}" style="border-radius:6px;background-color:{background};">'
+              f'<a href="{_attr(link)}" target="_blank" style="display:inline-block;padding:14px 28px;'
+              f'font-family:{FONT};font-size:16px;font-weight:bold;color:{color};text-decoration:none;">'
+              f'{_text(label)}</a></td></tr></table>')
+    return _row(button, "padding:16px 24px;"), f"{label}: {link}"
+
+
+def _spacer(content: Dict[str, Any]) -> Tuple[str, str]:
+    height = int(content.get("height", 20))
+    return f'<tr><td height="{height}" style="height:{height}px;font-size:0;line-height:0;">&nbsp;</td></tr>', ""
+
+
+def _product(content: Dict[str, Any]) -> Tuple[str, str]:
+    products = content.get("products", [])
+    title = content.get("title")
+    width = EMAIL_WIDTH // max(len(products), 1)
+    cells = "".join(
+        f'<td align="center" valign="top" width="{width}" style="padding:8px;font-family:{FONT};">'
+        f'<img src="{_attr(p.get("image", ""))}" alt="{_attr(p.get("name", ""))}" width="150" '
+        f'style="display:block;margin:0 auto;border:0;max-width:100%;height:auto;">'
+        f'<p style="margin:8px 0 0;font-size:14px;color:#111827;">{_text(p.get("name", ""))}</p>'
+        f'<p style="margin:4px 0 0;font-size:14px;font-weight:bold;color:#111827;">{_text(p.get("price", ""))}</p></td>'
+        for p in products
+    )
+    inner = f'<table role="presentation" width="100%" cellpadding="0" cellspacing="0" border="0"><tr>{cells}</tr></table>'
+    if title:
+        inner = f'<h2 style="margin:0 0 12px;font-family:{FONT};font-size:20px;color:#111827;text-align:center;">{_text(title)}</h2>' + inner
+    lines = [title] if title else []
+    lines += [f"- {p.get('name', '')} {p.get('price', '')}".rstrip() for p in products]
+    return _row(inner, "padding:24px;"), "\n".join(lines)
+
+
+BLOCK_RENDERERS: Dict[str, Callable[[Dict[str, Any]], Tuple[str, str]]] = {
+    "header": _header,
+    "text": _text_block,
+    "image": _image,
+    "button": _button,
+    "spacer": _spacer,
+    "product": _product,
+}
+
+DOCUMENT_HEAD = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8">'
+    '<meta name="viewport" content="width=device-width, initial-scale=1.0"></head>'
+    '<body style="margin:0;padding:0;background-color:#F3F4F6;">'
+    '<table role="presentation" width="100%" cellpadding="0" cellspacing="0" border="0" bgcolor="#F3F4F6"><tr><td align="center">'
+    f'<table role="presentation" width="{EMAIL_WIDTH}" cellpadding="0" cellspacing="0" border="0" '
+    f'style="width:100%;max-width:{EMAIL_WIDTH}px;background-color:#FFFFFF;">'
+)
+DOCUMENT_TAIL = '</table></td></tr></table></body></html>'
+
+
+@lru_cache(maxsize=4096)
+def _render_block_cached(block_type: str, content_json: str) -> Tuple[str, str]:
+    renderer = BLOCK_RENDERERS.get(block_type)
+    if renderer is None:
+        raise ValueError(f"Unknown block type: {block_type}")
+    return renderer(json.loads(content_json))
+
+
+def render_block(block: Mapping[str, Any]) -> Tuple[str, str]:
+    """(html, text) for one block, placeholders left in place; memoized by content"""
+    return _render_block_cached(block["type"], json.dumps(block.get("content") or {}, sort_keys=True))
+
+
+Part = Union[str, CompiledTemplate]
+
+
+def _merge(parts: List[Part]) -> Tuple[Part, ...]:
+    """Join adjacent static strings so a render only touches the dynamic fragments"""
+    merged: List[Part] = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        elif part != "":
+            merged.append(part)
+    return tuple(merged)
+
+
+def _fill(parts: Tuple[Part, ...], context: Mapping[str, Any]) -> str:
+    return "".join([part if part.__class__ is str else part.render(context) for part in parts])
+
+
+class CompiledEmail:
+    __slots__ = ("html_parts", "text_parts", "variables", "static_blocks", "dynamic_blocks")
+
+    def __init__(self, blocks: Sequence[Mapping[str, Any]]):
+        html_parts: List[Part] = [DOCUMENT_HEAD]
+        text_parts: List[Part] = []
+        variables = set()
+        self.static_blocks = 0
+        self.dynamic_blocks = 0
+        for block in blocks:
+            markup, text = render_block(block)
+            names = set(PLACEHOLDER_RE.findall(markup)) | set(PLACEHOLDER_RE.findall(text))
+            if names:
+                self.dynamic_blocks += 1
+                variables |= names
+                html_parts.append(CompiledTemplate(markup, escape=html.escape))
+                text_parts.append(CompiledTemplate(text))
+            else:
+                self.static_blocks += 1
+                html_parts.append(markup)
+                if text:
+                    text_parts.append(text)
+            if text:
+                text_parts.append("\n\n")
+        html_parts.append(DOCUMENT_TAIL)
+        if text_parts and text_parts[-1] == "\n\n":
+            text_parts.pop()
+        self.html_parts = _merge(html_parts)
+        self.text_parts = _merge(text_parts)
+        self.variables = frozenset(variables)
+
+    def render(self, context: Mapping[str, Any]) -> Dict[str, str]:
+        return {"html": _fill(self.html_parts, context), "text": _fill(self.text_parts, context)}
+
+    def render_many(self, contexts: Sequence[Mapping[str, Any]]) -> List[Dict[str, str]]:
+        return [self.render(context) for context in contexts]
+
+
+def template_version(blocks: Sequence[Mapping[str, Any]]) -> str:
+    return source_version(json.dumps(list(blocks), sort_keys=True, default=str))
+
+
+class EmailTemplateCache:
+    """LRU of compiled block templates keyed by (template id, version)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], CompiledEmail]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id: str, blocks: Sequence[Mapping[str, Any]], version: Optional[str] = None) -> CompiledEmail:
+        key = (template_id, version or template_version(blocks))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+        compiled = CompiledEmail(blocks)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+
+email_templates = EmailTemplateCache(settings.template_cache_size)
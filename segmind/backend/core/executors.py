@@ -0,0 +1,157 @@
+"""Process-wide worker pools for blocking work.
+
+Routes and services submit blocking calls to a small set of named,
+size-bounded thread pools instead of starting threads per request:
+
+    io   blocking network and disk calls (SDK clients, SQLite, file reads)
+    cpu  short CPU-bound steps (image decoding and encoding); sized to the
+         core count, since libraries like Pillow release the GIL while
+         they work
+
+Each pool records how long tasks waited for a worker and how long they
+ran, so a saturated pool shows up as queue time rather than as slow
+requests. `install()` makes the io pool the event loop's default executor,
+which puts asyncio.to_thread calls under the same bound and metrics.
+Work that takes microseconds (string templates, dict lookups) should run
+inline; a pool hop costs more than it saves.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from core.utils.config import settings
+
+T = TypeVar("T")
+
+IO = "io"
+CPU = "cpu"
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class WorkerPool(ThreadPoolExecutor):
+    """ThreadPoolExecutor that records queue and run time per task"""
+
+    def __init__(self, name: str, max_workers: int, window: int = 1000):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self.name = name
+        self.max_workers = max_workers
+        self._metrics_lock = threading.Lock()
+        self._queue_ms = deque(maxlen=window)
+        self._run_ms = deque(maxlen=window)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.active = 0
+
+    def _timed(self, queued_at: float, fn: Callable[..., T], args, kwargs) -> T:
+        started = time.perf_counter()
+        with self._metrics_lock:
+            self.active += 1
+            self._queue_ms.append((started - queued_at) * 1000)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            with self._metrics_lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._metrics_lock:
+                self.active -= 1
+                self.completed += 1
+                self._run_ms.append((time.perf_counter() - started) * 1000)
+        return result
+
+    def submit(self, fn: Callable[..., T], /, *args, **kwargs) -> "Future[T]":
+        with self._metrics_lock:
+            self.submitted += 1
+        return super().submit(self._timed, time.perf_counter(), fn, args, kwargs)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run `fn` on this pool and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            queue_ms, run_ms = list(self._queue_ms), list(self._run_ms)
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.submitted - self.completed - self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_ms_p50": round(_percentile(queue_ms, 0.5), 2),
+                "queue_ms_p95": round(_percentile(queue_ms, 0.95), 2),
+                "run_ms_p50": round(_percentile(run_ms, 0.5), 2),
+                "run_ms_p95": round(_percentile(run_ms, 0.95), 2)
+            }
+
+
+class WorkerPools:
+    def __init__(self, sizes: Dict[str, int] = None):
+        self.sizes = sizes or {
+            IO: settings.io_pool_size,
+            CPU: settings.cpu_pool_size or os.cpu_count() or 4
+        }
+        self._pools: Dict[str, WorkerPool] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, name: str) -> WorkerPool:
+        """The named pool, created on first use"""
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    if name not in self.sizes:
+                        raise KeyError(f"Unknown worker pool: {name}")
+                    pool = self._pools[name] = WorkerPool(name, self.sizes[name])
+        return pool
+
+    @property
+    def io(self) -> WorkerPool:
+        return self.pool(IO)
+
+    @property
+    def cpu(self) -> WorkerPool:
+        return self.pool(CPU)
+
+    def install(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Route the loop's default executor (asyncio.to_thread, run_in_executor(None, ...)) to the io pool"""
+        (loop or asyncio.get_running_loop()).set_default_executor(self.io)
+
+    async def shutdown(self):
+        """Drop queued tasks and wait for running ones to finish"""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if not pools:
+            return
+        # Join the workers from a plain thread: the default executor may be one of these pools
+        loop = asyncio.get_running_loop()
+        joined = loop.create_future()
+
+        def join():
+            for pool in pools:
+                pool.shutdown(wait=True)
+            loop.call_soon_threadsafe(joined.set_result, None)
+
+        threading.Thread(target=join, name="worker-pools-shutdown", daemon=True).start()
+        await joined
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
+
+
+worker_pools = WorkerPools()
@@ -0,0 +1,147 @@
+"""Adaptive batch sizing for campaign card generation.
+
+Each completion's latency is modelled as `overhead + per_card * cards`, fitted
+from exponentially weighted statistics over recent calls, and completion
+tokens per card and prompt tokens per call are tracked the same way. To
+generate n cards, every batch size b that keeps a batch's expected output
+under the max_tokens cap is scored by its estimated completion time plus a
+cost per call:
+
+    ceil(calls / free_slots) * (overhead + per_card * b) + calls * call_cost
+
+where calls = ceil(n / b) and free_slots is what is left of the LLM client's
+shared concurrency budget (which itself shrinks on 429s and 5xx). call_cost
+is the upstream work every call repeats whatever its size: the fixed
+overhead plus reading the prompt again. Without it, a free budget always
+favours one card per call, which maximizes the request rate and the prompt
+tokens sent. The cheapest plan wins, and near-ties go to bigger batches.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.llm_client import llm_client, LLMClient
+from core.utils.config import settings
+
+# Priors used until there are observations (gpt-4 sized cards)
+PRIOR_OVERHEAD = 1.0
+PRIOR_PER_CARD = 2.0
+PRIOR_TOKENS_PER_CARD = 350.0
+PRIOR_PROMPT_TOKENS = 600.0
+# Reading a prompt token costs about this fraction of generating an output token
+PROMPT_TOKEN_WEIGHT = 0.25
+# Leave headroom under max_tokens so a long card doesn't truncate the JSON array
+TOKEN_HEADROOM = 0.85
+# Plans within this fraction of the fastest are considered ties
+TIE_TOLERANCE = 0.05
+
+
+class AdaptiveBatcher:
+    def __init__(self, client: LLMClient = llm_client, alpha: float = 0.2, max_batch: int = None):
+        self.client = client
+        self.alpha = alpha
+        self.max_batch = max_batch or settings.llm_max_cards_per_call
+        self._lock = threading.Lock()
+        self._samples = 0
+        # EWMA of x = cards per call, y = latency, and their products, for a linear fit
+        self._x = self._y = self._xx = self._xy = 0.0
+        self._tokens_per_card: Optional[float] = None
+        self._prompt_tokens: Optional[float] = None
+        self.last_plan: Optional[Dict[str, Any]] = None
+
+    def _ewma(self, current: float, value: float) -> float:
+        return value if self._samples == 0 else current + self.alpha * (value - current)
+
+    def _token_ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    def observe(self, cards: int, latency: float, completion_tokens: Optional[int] = None,
+                prompt_tokens: Optional[int] = None):
+        """Record one successful call that produced `cards` cards"""
+        if cards <= 0:
+            return
+        with self._lock:
+            self._x, self._y = self._ewma(self._x, cards), self._ewma(self._y, latency)
+            self._xx, self._xy = self._ewma(self._xx, cards * cards), self._ewma(self._xy, cards * latency)
+            if completion_tokens:
+                self._tokens_per_card = self._token_ewma(self._tokens_per_card, completion_tokens / cards)
+            if prompt_tokens:
+                self._prompt_tokens = self._token_ewma(self._prompt_tokens, prompt_tokens)
+            self._samples += 1
+
+    def latency_model(self):
+        """(overhead seconds, seconds per card)"""
+        with self._lock:
+            if self._samples == 0:
+                return PRIOR_OVERHEAD, PRIOR_PER_CARD
+            variance = self._xx - self._x * self._x
+            if variance > 0.25:
+                per_card = (self._xy - self._x * self._y) / variance
+                overhead = self._y - per_card * self._x
+                if per_card > 0 and overhead >= 0:
+                    return overhead, per_card
+            # Not enough spread in batch sizes to separate the terms: scale the prior to what we see
+            scale = self._y / (PRIOR_OVERHEAD + PRIOR_PER_CARD * self._x)
+            return PRIOR_OVERHEAD * scale, PRIOR_PER_CARD * scale
+
+    @property
+    def tokens_per_card(self) -> float:
+        return self._tokens_per_card or PRIOR_TOKENS_PER_CARD
+
+    @property
+    def prompt_tokens(self) -> float:
+        return self._prompt_tokens or PRIOR_PROMPT_TOKENS
+
+    def call_cost(self) -> float:
+        """Seconds of upstream work each call adds on top of its cards"""
+        overhead, per_card = self.latency_model()
+        return overhead + self.prompt_tokens * PROMPT_TOKEN_WEIGHT * per_card / self.tokens_per_card
+
+    def plan(self, cards: int, max_tokens: int = 2000) -> List[int]:
+        """Batch sizes (summing to `cards`) for one generation request"""
+        if cards <= 0:
+            return []
+        overhead, per_card = self.latency_model()
+        call_cost = self.call_cost()
+        token_cap = max(1, int(max_tokens * TOKEN_HEADROOM // self.tokens_per_card))
+        largest = max(1, min(cards, self.max_batch, token_cap))
+        budget = self.client.budget
+        limit = budget.limit if budget else self.client.max_concurrency
+        free_slots = max(1, limit - (budget.in_flight if budget else 0))
+
+        estimates = {}
+        for size in range(1, largest + 1):
+            batches = math.ceil(cards / size)
+            seconds = math.ceil(batches / free_slots) * (overhead + per_card * size)
+            estimates[size] = (seconds + batches * call_cost, seconds)
+        cheapest = min(score for score, _ in estimates.values())
+        size = max(s for s, (score, _) in estimates.items() if score <= cheapest * (1 + TIE_TOLERANCE))
+
+        batches = math.ceil(cards / size)
+        base, extra = divmod(cards, batches)
+        sizes = [base + 1] * extra + [base] * (batches - extra)
+        self.last_plan = {
+            "cards": cards,
+            "batch_sizes": sizes,
+            "free_slots": free_slots,
+            "token_cap": token_cap,
+            "estimated_seconds": round(estimates[size][1], 2)
+        }
+        return sizes
+
+    def metrics(self) -> Dict[str, Any]:
+        overhead, per_card = self.latency_model()
+        return {
+            "samples": self._samples,
+            "overhead_seconds": round(overhead, 3),
+            "seconds_per_card": round(per_card, 3),
+            "tokens_per_card": round(self.tokens_per_card, 1),
+            "prompt_tokens": round(self.prompt_tokens, 1),
+            "call_cost_seconds": round(self.call_cost(), 3),
+            "max_batch": self.max_batch,
+            "last_plan": self.last_plan,
+            "client": self.client.stats()
+        }
+
+
+card_batcher = AdaptiveBatcher()
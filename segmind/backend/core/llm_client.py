@@ -0,0 +1,254 @@
+"""Async client for OpenAI-compatible chat completions.
+
+One pooled httpx.AsyncClient (HTTP/2 when the h2 package is installed) is
+shared by every request, so TLS connections are reused instead of opened per
+call. Calls are bounded by a process-wide concurrency budget, each has a
+deadline that covers queueing, retries and backoff, and retryable failures
+(timeouts, connection errors, 429 and 5xx) are retried with full-jitter
+exponential backoff, honouring Retry-After.
+
+The budget adapts to the upstream's load: a 429 or 5xx halves it (at most
+once per cooldown), and it grows back by one after a budget's worth of
+successful calls, up to LLM_MAX_CONCURRENCY. The base URL comes from OPENAI_BASE_URL, so
+a local stub (scripts/stub_llm.py) can stand in for the real API.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
+
+import httpx
+from fastapi import Request
+
+from core.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class LLMError(Exception):
+    """A completion request failed for good (non-retryable, or retries exhausted)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeout(LLMError):
+    """The request's deadline passed before a completion arrived"""
+
+
+class RequestAbandoned(Exception):
+    """The HTTP client went away while the work was running"""
+
+
+@dataclass
+class Completion:
+    content: str
+    latency: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class ConcurrencyBudget:
+    """Resizable limit on in-flight calls (additive increase, multiplicative decrease)"""
+
+    def __init__(self, maximum: int, cooldown: float = 1.0):
+        self.maximum = maximum
+        self.limit = maximum
+        self.in_flight = 0
+        self.cooldown = cooldown
+        self.rate_limited = 0
+        self.server_errors = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self.limit < self.maximum and self._successes >= self.limit:
+            self._successes = 0
+            self.limit += 1
+
+    def on_rate_limited(self):
+        self.rate_limited += 1
+        self._decrease()
+
+    def on_server_error(self):
+        self.server_errors += 1
+        self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self._successes = 0
+            self.limit = max(1, self.limit // 2)
+
+
+class LLMClient:
+    def __init__(self, base_url: str = None, max_concurrency: int = None, timeout: float = None,
+                 max_retries: int = None):
+        self.base_url = (base_url or settings.openai_base_url).rstrip("/")
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.timeout = timeout or settings.llm_timeout
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self._client: Optional[httpx.AsyncClient] = None
+        self.budget: Optional[ConcurrencyBudget] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency)
+            )
+            self.budget = ConcurrencyBudget(self.max_concurrency)
+        return self._client
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(settings.llm_max_backoff, settings.llm_base_backoff * 2 ** attempt))
+
+    async def chat(self, messages: List[Dict[str, str]], api_key: str, model: str = None,
+                   temperature: float = 0.7, max_tokens: int = 2000, deadline: Optional[float] = None) -> str:
+        """Content of the first choice of a chat completion"""
+        completion = await self.complete(messages, api_key, model, temperature, max_tokens, deadline)
+        return completion.content
+
+    async def complete(self, messages: List[Dict[str, str]], api_key: str, model: str = None,
+                       temperature: float = 0.7, max_tokens: int = 2000,
+                       deadline: Optional[float] = None) -> Completion:
+        """First choice of a chat completion, with token usage and the latency of the successful call.
+
+        `deadline` is a time.monotonic() value; defaults to now + LLM_DEADLINE.
+        """
+        client = self._ensure_client()
+        deadline = deadline or time.monotonic() + settings.llm_deadline
+        payload = {
+            "model": model or settings.llm_model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        headers = {"Authorization": f"Bearer {api_key}"}
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.failures += 1
+                raise LLMTimeout("Completion deadline exceeded")
+            retry_after = None
+            try:
+                async with asyncio.timeout(remaining):
+                    async with self.budget:
+                        self.requests += 1
+                        started = time.monotonic()
+                        response = await client.post(
+                            f"{self.base_url}/chat/completions", json=payload, headers=headers,
+                            timeout=min(self.timeout, deadline - time.monotonic())
+                        )
+                if response.status_code < 400:
+                    data = response.json()
+                    usage = data.get("usage") or {}
+                    self.budget.on_success()
+                    return Completion(
+                        content=data["choices"][0]["message"]["content"],
+                        latency=time.monotonic() - started,
+                        prompt_tokens=usage.get("prompt_tokens"),
+                        completion_tokens=usage.get("completion_tokens")
+                    )
+                if response.status_code == 429:
+                    self.budget.on_rate_limited()
+                elif response.status_code >= 500:
+                    self.budget.on_server_error()
+                error = LLMError(f"Completion request failed: HTTP {response.status_code}", response.status_code)
+                if response.status_code != 429 and response.status_code < 500:
+                    self.failures += 1
+                    raise error
+                retry_after = response.headers.get("retry-after")
+            except (TimeoutError, httpx.TimeoutException) as e:
+                error = LLMTimeout(f"Completion request timed out: {type(e).__name__}")
+            except httpx.TransportError as e:
+                error = LLMError(f"Completion request failed: {type(e).__name__}: {e}")
+            except (KeyError, IndexError, ValueError) as e:
+                self.failures += 1
+                raise LLMError(f"Malformed completion response: {e}")
+
+            if attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                self.failures += 1
+                raise error
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"{error}; retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "max_concurrency": self.max_concurrency,
+            "concurrency_limit": self.budget.limit if self.budget else self.max_concurrency,
+            "in_flight": self.budget.in_flight if self.budget else 0,
+            "rate_limited": self.budget.rate_limited if self.budget else 0,
+            "server_errors": self.budget.server_errors if self.budget else 0,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T], poll_interval: float = 0.25) -> T:
+    """Await `work`, cancelling it (and every call it started) if the client disconnects"""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise RequestAbandoned()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+llm_client = LLMClient()
@@ -0,0 +1,228 @@
+"""SQLite-backed store for messages and campaigns.
+
+Replaces the in-process MOCK_MESSAGES/MOCK_CAMPAIGNS lists: lookups go
+through the primary key, listings page by an opaque cursor (the insertion
+sequence), and nothing is kept in Python memory between requests.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.utils.config import settings
+from core.utils.schemas import Message, Campaign
+
+MESSAGE_COLUMNS = ("id", "customer_id", "channel", "content", "subject", "status",
+                   "sent_at", "delivered_at", "opened_at", "clicked_at", "campaign_id")
+CAMPAIGN_COLUMNS = ("id", "name", "segment_id", "channel", "content", "subject", "sender", "status",
+                    "total_recipients", "sent_count", "failed_count", "delivered_count",
+                    "opened_count", "clicked_count", "created_at", "scheduled_at", "product_id",
+                    "template_id", "updated_at", "variables")
+
+# Columns added after the first release of each table, created on open if missing
+ADDED_COLUMNS = {
+    "messages": {"campaign_id": "TEXT"},
+    "campaigns": {"total_recipients": "INTEGER NOT NULL DEFAULT 0", "failed_count": "INTEGER NOT NULL DEFAULT 0",
+                  "sender": "TEXT", "product_id": "TEXT", "template_id": "TEXT", "updated_at": "TEXT",
+                  "variables": "TEXT"},
+}
+
+
+def sqlite_path(database_url: str) -> str:
+    """Filesystem path from a sqlite:/// URL"""
+    if not database_url.startswith("sqlite:///"):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got {database_url}")
+    return database_url[len("sqlite:///"):]
+
+
+def _to_db(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):
+        return value.value
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+def campaign_from_row(row) -> Campaign:
+    fields = {c: row[c] for c in CAMPAIGN_COLUMNS}
+    fields["variables"] = json.loads(fields["variables"]) if fields["variables"] else {}
+    return Campaign(**fields)
+
+
+class MessageStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                customer_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                content TEXT NOT NULL,
+                subject TEXT,
+                status TEXT NOT NULL,
+                sent_at TEXT,
+                delivered_at TEXT,
+                opened_at TEXT,
+                clicked_at TEXT,
+                campaign_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_customer_sent ON messages(customer_id, sent_at);
+            CREATE INDEX IF NOT EXISTS idx_messages_status ON messages(status);
+
+            CREATE TABLE IF NOT EXISTS campaigns (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                segment_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                content TEXT NOT NULL,
+                subject TEXT,
+                sender TEXT,
+                status TEXT NOT NULL,
+                total_recipients INTEGER NOT NULL DEFAULT 0,
+                sent_count INTEGER NOT NULL DEFAULT 0,
+                failed_count INTEGER NOT NULL DEFAULT 0,
+                delivered_count INTEGER NOT NULL DEFAULT 0,
+                opened_count INTEGER NOT NULL DEFAULT 0,
+                clicked_count INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                scheduled_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_campaigns_status ON campaigns(status);
+        ''')
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, declaration in columns.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+        self._conn.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_messages_campaign ON messages(campaign_id);
+            CREATE INDEX IF NOT EXISTS idx_campaigns_scheduled ON campaigns(scheduled_at);
+            CREATE INDEX IF NOT EXISTS idx_campaigns_status_scheduled ON campaigns(status, scheduled_at);
+        ''')
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def read(self, sql: str, params=()) -> List[sqlite3.Row]:
+        """Run a query and return all rows"""
+        return self._execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Connection inside one write transaction, for multi-statement updates"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _insert(self, table: str, columns, model):
+        values = [_to_db(getattr(model, c)) for c in columns]
+        placeholders = ", ".join("?" for _ in columns)
+        self._execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values)
+
+    # Messages
+
+    def add_message(self, message: Message) -> Message:
+        self._insert("messages", MESSAGE_COLUMNS, message)
+        return message
+
+    def add_messages(self, messages: List[Message]):
+        """Insert many messages in one transaction"""
+        if not messages:
+            return
+        with self.transaction() as conn:
+            self.insert_messages(conn, messages)
+
+    @staticmethod
+    def insert_messages(conn: sqlite3.Connection, messages: List[Message]):
+        """Insert messages on conn, inside a caller's transaction"""
+        placeholders = ", ".join("?" for _ in MESSAGE_COLUMNS)
+        rows = [[_to_db(getattr(m, c)) for c in MESSAGE_COLUMNS] for m in messages]
+        conn.executemany(f"INSERT INTO messages ({', '.join(MESSAGE_COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def get_message(self, message_id: str) -> Optional[Message]:
+        rows = self._execute(f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages WHERE id = ?", (message_id,))
+        return Message(**dict(rows[0])) if rows else None
+
+    def list_messages(self, limit: int = 50, cursor: Optional[str] = None, customer_id: Optional[str] = None,
+                      status: Optional[str] = None) -> Tuple[List[Message], Optional[str]]:
+        """Newest-first page of messages and the cursor for the next page (None at the end)"""
+        where, params = [], []
+        if cursor:
+            where.append("seq < ?")
+            params.append(int(cursor))
+        if customer_id:
+            where.append("customer_id = ?")
+            params.append(customer_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = f"SELECT seq, {', '.join(MESSAGE_COLUMNS)} FROM messages"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        rows = self._execute(sql, params + [limit + 1])
+
+        next_cursor = str(rows[limit - 1]["seq"]) if len(rows) > limit else None
+        messages = [Message(**{c: row[c] for c in MESSAGE_COLUMNS}) for row in rows[:limit]]
+        return messages, next_cursor
+
+    def count_messages(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM messages")[0][0]
+
+    # Campaigns
+
+    def add_campaign(self, campaign: Campaign) -> Campaign:
+        self._insert("campaigns", CAMPAIGN_COLUMNS, campaign)
+        return campaign
+
+    def get_campaign(self, campaign_id: str) -> Optional[Campaign]:
+        rows = self._execute(f"SELECT {', '.join(CAMPAIGN_COLUMNS)} FROM campaigns WHERE id = ?", (campaign_id,))
+        return campaign_from_row(rows[0]) if rows else None
+
+    def update_campaign(self, campaign_id: str, **fields: Any) -> Optional[Campaign]:
+        unknown = set(fields) - set(CAMPAIGN_COLUMNS[1:])
+        if unknown:
+            raise ValueError(f"Unknown campaign fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE campaigns SET {assignments} WHERE id = ?",
+                      [_to_db(v) for v in fields.values()] + [campaign_id])
+        return self.get_campaign(campaign_id)
+
+    def seed(self, messages: List[Message], campaigns: List[Campaign]):
+        """Insert demo data into an empty store"""
+        with self._lock:
+            empty = self._conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM messages) AND NOT EXISTS (SELECT 1 FROM campaigns)"
+            ).fetchone()[0]
+        if not empty:
+            return
+        for message in messages:
+            self.add_message(message)
+        for campaign in campaigns:
+            self.add_campaign(campaign)
+
+    def close(self):
+        self._conn.close()
+
+
+message_store = MessageStore(sqlite_path(settings.database_url))
@@ -0,0 +1,275 @@
+"""Durable outbound message queue.
+
+POST /send writes the message row and an outbox entry in one SQLite
+transaction and returns; background workers claim due entries in batches,
+deliver them through the dispatcher (rate limits and channel concurrency
+still apply), and record the outcome. A claim is a lease that the worker
+renews while the batch is being delivered, so only entries of a worker that
+died are reclaimed. Failures are retried with exponential
+backoff and jitter until `outbox_max_attempts`, then dead-lettered.
+Idempotency keys make client retries of /send return the original message.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.message_store import message_store, MessageStore
+from core.rate_limiter import TRANSACTIONAL_FLOW, DEFAULT_SENDER
+from core.utils.config import settings
+from core.utils.schemas import Message
+
+logger = logging.getLogger(__name__)
+
+# A claimed entry whose worker died is reclaimed after this many seconds; live
+# workers renew the lease every third of it while delivering
+LEASE_SECONDS = 60
+
+
+class Outbox:
+    def __init__(self, store: MessageStore = message_store, workers: int = None, batch_size: int = None,
+                 max_attempts: int = None, base_delay: float = None, max_delay: float = None,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.store = store
+        self.workers = workers or settings.outbox_workers
+        self.batch_size = batch_size or settings.outbox_batch_size
+        self.max_attempts = max_attempts or settings.outbox_max_attempts
+        self.base_delay = base_delay if base_delay is not None else settings.outbox_base_delay
+        self.max_delay = max_delay if max_delay is not None else settings.outbox_max_delay
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running = False
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.store.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message_id TEXT NOT NULL UNIQUE,
+                    idempotency_key TEXT UNIQUE,
+                    channel TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    lease_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+
+    # Producer side
+
+    def enqueue(self, message: Message, sender: Optional[str] = None,
+                idempotency_key: Optional[str] = None) -> Message:
+        """Persist message and its outbox entry; an already-used idempotency key returns the first message"""
+        existing = self.enqueue_many([(message, sender, idempotency_key)])[0]
+        return self.store.get_message(existing) if existing else message
+
+    def enqueue_many(self, items: List[Tuple[Message, Optional[str], Optional[str]]]) -> List[Optional[str]]:
+        """Persist (message, sender, idempotency_key) items in one transaction
+
+        Returns, per item, None if it was queued or the id of the message that
+        already owns its idempotency key (earlier in the batch or in the outbox).
+        """
+        keys = [key for _, _, key in items if key]
+        now = time.time()
+        results: List[Optional[str]] = []
+        messages, entries = [], []
+
+        with self.store.transaction() as conn:
+            owners: Dict[str, str] = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                owners.update(conn.execute(
+                    f"SELECT idempotency_key, message_id FROM outbox WHERE idempotency_key IN ({placeholders})",
+                    chunk
+                ).fetchall())
+
+            for message, sender, key in items:
+                if key and key in owners:
+                    results.append(owners[key])
+                    continue
+                if key:
+                    owners[key] = message.id
+                channel = message.channel.value if hasattr(message.channel, "value") else message.channel
+                sender = sender or DEFAULT_SENDER
+                payload = {
+                    "message_id": message.id,
+                    "channel": channel,
+                    "from": sender,
+                    "to": message.customer_id,
+                    "subject": message.subject,
+                    "content": message.content
+                }
+                messages.append(message)
+                entries.append((message.id, key, channel, sender, json.dumps(payload), now, now, now))
+                results.append(None)
+
+            self.store.insert_messages(conn, messages)
+            conn.executemany('''
+                INSERT INTO outbox (message_id, idempotency_key, channel, sender, payload, status,
+                                    next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)
+            ''', entries)
+
+        if entries:
+            self._wake()
+        return results
+
+    def _wake(self):
+        """Wake the workers; producers run in threadpool threads, so go through the loop"""
+        if self._wakeup is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # Consumer side
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self.store.transaction() as conn:
+            rows = conn.execute('''
+                SELECT seq, message_id, sender, payload, attempts FROM outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'in_flight' AND lease_until <= ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            ''', (now, now, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = 'in_flight', lease_until = ?, updated_at = ? WHERE seq = ?",
+                [(now + LEASE_SECONDS, now, row[0]) for row in rows]
+            )
+        return [
+            {"seq": row[0], "message_id": row[1], "sender": row[2], "payload": json.loads(row[3]),
+             "attempts": row[4]}
+            for row in rows
+        ]
+
+    def _extend_lease(self, seqs: List[int]):
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.executemany("UPDATE outbox SET lease_until = ? WHERE seq = ? AND status = 'in_flight'",
+                             [(now + self.lease_seconds, seq) for seq in seqs])
+
+    async def _renew_lease(self, batch: List[Dict[str, Any]]):
+        """Keep extending the batch's lease until cancelled"""
+        seqs = [entry["seq"] for entry in batch]
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self._extend_lease, seqs)
+
+    def _backoff(self, attempts: int) -> float:
+        """Full-jitter exponential backoff for the given attempt count"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+
+    def _record(self, outcomes: List[tuple]):
+        """Apply (entry, result) outcomes of one batch in a single transaction"""
+        now = time.time()
+        sent_at = datetime.now().isoformat()
+        with self.store.transaction() as conn:
+            for entry, result in outcomes:
+                attempts = entry["attempts"] + 1
+                if result is not None and result.accepted:
+                    conn.execute("UPDATE outbox SET status = 'sent', attempts = ?, lease_until = NULL, "
+                                 "last_error = NULL, updated_at = ? WHERE seq = ?", (attempts, now, entry["seq"]))
+                    conn.execute("UPDATE messages SET status = 'sent', sent_at = ? WHERE id = ?",
+                                 (sent_at, entry["message_id"]))
+                    continue
+
+                error = result.error if result is not None else "provider error"
+                retryable = result is None or result.retryable
+                if retryable and attempts < self.max_attempts:
+                    conn.execute("UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, "
+                                 "lease_until = NULL, last_error = ?, updated_at = ? WHERE seq = ?",
+                                 (attempts, now + self._backoff(attempts), error, now, entry["seq"]))
+                else:
+                    conn.execute("UPDATE outbox SET status = 'dead', attempts = ?, lease_until = NULL, "
+                                 "last_error = ?, updated_at = ? WHERE seq = ?",
+                                 (attempts, error, now, entry["seq"]))
+                    conn.execute("UPDATE messages SET status = 'failed' WHERE id = ?", (entry["message_id"],))
+
+            # Sent entries are only kept as long as their idempotency keys must be honoured
+            conn.execute("DELETE FROM outbox WHERE status = 'sent' AND updated_at < ?",
+                         (now - settings.outbox_retention_seconds,))
+
+    async def _worker(self, dispatcher):
+        # The flag as well as cancellation: wait_for() can swallow a cancel that races its timeout
+        while self._running:
+            batch = await asyncio.to_thread(self._claim)
+            if not batch:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            renewing = asyncio.create_task(self._renew_lease(batch))
+            try:
+                results = await asyncio.gather(
+                    *(dispatcher.deliver(entry["payload"], entry["sender"], TRANSACTIONAL_FLOW) for entry in batch),
+                    return_exceptions=True
+                )
+            finally:
+                renewing.cancel()
+            outcomes = [(entry, None if isinstance(result, BaseException) else result)
+                        for entry, result in zip(batch, results)]
+            await asyncio.to_thread(self._record, outcomes)
+
+    async def start(self, dispatcher):
+        """Start the background workers on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        self._tasks = [asyncio.create_task(self._worker(dispatcher)) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = self._loop = None
+
+    # Inspection
+
+    def stats(self) -> Dict[str, int]:
+        rows = self.store.read("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return {status: count for status, count in rows}
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.store.read('''
+            SELECT message_id, channel, sender, attempts, last_error, updated_at FROM outbox
+            WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?
+        ''', (limit,))
+        return [
+            {"message_id": r[0], "channel": r[1], "sender": r[2], "attempts": r[3], "last_error": r[4],
+             "dead_at": datetime.fromtimestamp(r[5]).isoformat()}
+            for r in rows
+        ]
+
+    def requeue(self, message_id: str) -> bool:
+        """Move a dead-lettered message back into the queue"""
+        now = time.time()
+        with self.store.transaction() as conn:
+            updated = conn.execute('''
+                UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ?
+                WHERE message_id = ? AND status = 'dead'
+            ''', (now, now, message_id)).rowcount
+            if updated:
+                conn.execute("UPDATE messages SET status = 'queued' WHERE id = ?", (message_id,))
+        if updated:
+            self._wake()
+        return bool(updated)
+
+
+outbox = Outbox()
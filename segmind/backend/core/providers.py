@@ -0,0 +1,74 @@
+"""Outbound message providers.
+
+HttpProvider posts each message as JSON to `{base_url}/{channel}`, which is
+how the local stub provider (scripts/stub_provider.py) and provider gateways
+are reached. SimulatedProvider accepts everything and is the default when no
+PROVIDER_BASE_URL is configured.
+"""
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from core.utils.config import settings
+
+
+@dataclass
+class ProviderResult:
+    accepted: bool
+    provider_message_id: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = False
+    status_code: Optional[int] = None
+
+
+class MessageProvider:
+    async def send(self, message: Dict[str, Any]) -> ProviderResult:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SimulatedProvider(MessageProvider):
+    """Accepts every message without leaving the process"""
+
+    async def send(self, message: Dict[str, Any]) -> ProviderResult:
+        return ProviderResult(accepted=True, provider_message_id=f"sim_{uuid.uuid4().hex[:12]}")
+
+
+class HttpProvider(MessageProvider):
+    """Sends messages to an HTTP provider endpoint over a pooled async client"""
+
+    def __init__(self, base_url: str, max_connections: int = 200, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def send(self, message: Dict[str, Any]) -> ProviderResult:
+        try:
+            response = await self._client.post(f"{self.base_url}/{message['channel']}", json=message)
+        except httpx.HTTPError as e:
+            return ProviderResult(accepted=False, error=f"{type(e).__name__}: {e}", retryable=True)
+
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            return ProviderResult(accepted=False, error=f"HTTP {response.status_code}: {response.text[:200]}",
+                                  retryable=retryable, status_code=response.status_code)
+        try:
+            provider_message_id = response.json().get("id")
+        except ValueError:
+            provider_message_id = None
+        return ProviderResult(accepted=True, provider_message_id=provider_message_id)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_provider() -> MessageProvider:
+    if settings.provider_base_url:
+        return HttpProvider(settings.provider_base_url, max_connections=sum(settings.channel_concurrency.values()))
+    return SimulatedProvider()
@@ -0,0 +1,197 @@
+"""Token-bucket send scheduler keyed by (channel, sender).
+
+Every (channel, sender) pair is a lane with its own token bucket, and every
+channel also has an account-wide bucket shared by its lanes. Waiting sends
+are queued per flow: priority flows (transactional sends) are served first,
+and campaign flows take turns round-robin, so one large blast only gets its
+fair share of the lane. Queue depth and wait times are exported via metrics().
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from core.utils.config import settings
+
+TRANSACTIONAL_FLOW = "transactional"
+DEFAULT_SENDER = "default"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        if self.tokens >= 1:
+            return blocked
+        return max(blocked, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for seconds (e.g. after a provider 429)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class _WaitStats:
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+
+        def quantile(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2) if ordered else 0.0
+
+        return {
+            "granted": self.count,
+            "avg_wait_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_wait_ms": round(self.max * 1000, 2),
+            "p50_wait_ms": quantile(0.5),
+            "p95_wait_ms": quantile(0.95)
+        }
+
+
+class _Lane:
+    def __init__(self, bucket: TokenBucket, account: TokenBucket):
+        self.bucket = bucket
+        self.account = account
+        self.priority: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.flows: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]" = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.stats = _WaitStats()
+        self.task: Optional[asyncio.Task] = None
+
+    def depth(self) -> int:
+        return len(self.priority) + sum(len(q) for q in self.flows.values())
+
+    def _next_waiter(self) -> Optional[Tuple[asyncio.Future, float]]:
+        while self.priority:
+            waiter = self.priority.popleft()
+            if not waiter[0].done():
+                return waiter
+        while self.flows:
+            flow, queue = next(iter(self.flows.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.flows.move_to_end(flow)
+            else:
+                del self.flows[flow]
+            if not waiter[0].done():
+                return waiter
+        return None
+
+    async def pump(self):
+        while True:
+            if not self.depth():
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            delay = max(self.bucket.time_until_token(), self.account.time_until_token())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            waiter = self._next_waiter()
+            if waiter is None:
+                continue
+            future, enqueued_at = waiter
+            self.bucket.take()
+            self.account.take()
+            self.stats.add(time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+
+class SendScheduler:
+    """Paces sends per (channel, sender) with fair queuing between flows"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits or settings.channel_rate_limits
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+        self._accounts: Dict[str, TokenBucket] = {}
+
+    def _limit(self, channel: str, key: str, default: float) -> float:
+        return float(self.limits.get(channel, {}).get(key, default))
+
+    def _lane(self, channel: str, sender: str) -> _Lane:
+        lane = self._lanes.get((channel, sender))
+        if lane is None:
+            if channel not in self._accounts:
+                rate = self._limit(channel, "account_rate", self._limit(channel, "rate", 10))
+                self._accounts[channel] = TokenBucket(rate, self._limit(channel, "account_burst", rate))
+            bucket = TokenBucket(self._limit(channel, "rate", 10), self._limit(channel, "burst", 10))
+            lane = _Lane(bucket, self._accounts[channel])
+            self._lanes[(channel, sender)] = lane
+        if lane.task is None or lane.task.done():
+            lane.task = asyncio.create_task(lane.pump())
+        return lane
+
+    async def acquire(self, channel: str, sender: str = DEFAULT_SENDER, flow: str = TRANSACTIONAL_FLOW,
+                      priority: Optional[bool] = None):
+        """Wait for this send's turn; transactional sends are prioritized by default"""
+        lane = self._lane(channel, sender)
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, time.monotonic())
+        if priority is None:
+            priority = flow == TRANSACTIONAL_FLOW
+        if priority:
+            lane.priority.append(waiter)
+        else:
+            lane.flows.setdefault(flow, deque()).append(waiter)
+        lane.wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def pause(self, channel: str, sender: str = DEFAULT_SENDER, seconds: float = 1.0):
+        """Back off a lane, e.g. after the provider answered 429"""
+        lane = self._lanes.get((channel, sender))
+        if lane is not None:
+            lane.bucket.pause(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        lanes = []
+        for (channel, sender), lane in self._lanes.items():
+            lanes.append({
+                "channel": channel,
+                "sender": sender,
+                "rate_per_second": lane.bucket.rate,
+                "burst": lane.bucket.burst,
+                "queue_depth": lane.depth(),
+                "priority_depth": len(lane.priority),
+                "flow_depths": {flow: len(queue) for flow, queue in lane.flows.items()},
+                **lane.stats.as_dict()
+            })
+        return {"lanes": lanes}
+
+    async def close(self):
+        for lane in self._lanes.values():
+            if lane.task is not None:
+                lane.task.cancel()
+
+
+send_scheduler = SendScheduler()
@@ -0,0 +1,216 @@
+"""Delivery-receipt ingestion.
+
+Provider status callbacks are coalesced in memory per message (earliest
+timestamp per milestone wins) and flushed by a background task in one
+transaction: a batched read of the affected messages, batched UPDATEs of the
+ones whose milestones actually changed, and one counter increment per
+campaign. Campaign delivered/opened/clicked counts, and the failed count for
+sent messages that the provider later reports as failed, are therefore
+maintained incrementally and never recounted from messages. A batch that
+fails to apply is merged back and retried on the next flush.
+
+Receipts for messages that are not in the store yet (campaign sends are
+persisted in batches) are retried on later flushes for `receipt_orphan_ttl`
+seconds.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.message_store import message_store, MessageStore
+from core.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Funnel milestones in order; a later one implies the earlier ones
+MILESTONES = ("delivered", "opened", "clicked")
+STATUS_RANK = {"queued": 0, "sent": 1, "failed": 1, "delivered": 2, "opened": 3, "clicked": 4}
+FAILURE_STATUSES = {"failed", "undelivered", "bounced", "rejected"}
+
+
+def _parse_timestamp(value: Any) -> str:
+    if value is None:
+        return datetime.now().isoformat()
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat()
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+class _Pending:
+    __slots__ = ("times", "failed", "first_seen")
+
+    def __init__(self):
+        self.times: Dict[str, str] = {}
+        self.failed = False
+        self.first_seen = time.monotonic()
+
+
+class ReceiptCoalescer:
+    def __init__(self, store: MessageStore = message_store, flush_interval: float = None,
+                 flush_size: int = None, orphan_ttl: float = None):
+        self.store = store
+        self.flush_interval = flush_interval or settings.receipt_flush_interval
+        self.flush_size = flush_size or settings.receipt_flush_size
+        self.orphan_ttl = orphan_ttl if orphan_ttl is not None else settings.receipt_orphan_ttl
+        self._pending: Dict[str, _Pending] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    def add(self, message_id: str, status: str, timestamp: Any = None):
+        """Record one provider status callback"""
+        status = status.lower()
+        entry = self._pending.get(message_id)
+        if entry is None:
+            entry = self._pending[message_id] = _Pending()
+        self.received += 1
+
+        if status in FAILURE_STATUSES:
+            entry.failed = True
+        elif status in MILESTONES:
+            at = _parse_timestamp(timestamp)
+            # Opens imply delivery and clicks imply opens
+            for milestone in MILESTONES[:MILESTONES.index(status) + 1]:
+                if milestone not in entry.times or at < entry.times[milestone]:
+                    entry.times[milestone] = at
+        else:
+            raise ValueError(f"Unknown status: {status}")
+
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _apply(self, batch: Dict[str, _Pending]) -> Dict[str, _Pending]:
+        """Write a batch to the store; returns entries whose message doesn't exist yet"""
+        ids = list(batch)
+        current = {}
+        with self.store.transaction() as conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                for row in conn.execute(
+                    f"SELECT id, campaign_id, status, delivered_at, opened_at, clicked_at "
+                    f"FROM messages WHERE id IN ({placeholders})", chunk
+                ):
+                    current[row[0]] = row
+
+            updates = []
+            # delivered, opened, clicked, failed
+            campaign_deltas: Dict[str, List[int]] = {}
+            for message_id, entry in batch.items():
+                row = current.get(message_id)
+                if row is None:
+                    continue
+                _, campaign_id, status, *existing = row
+                new_times = []
+                deltas = [0, 0, 0, 0]
+                for i, milestone in enumerate(MILESTONES):
+                    old, incoming = existing[i], entry.times.get(milestone)
+                    if incoming and (old is None or incoming < old):
+                        new_times.append(incoming)
+                        deltas[i] = 1 if old is None else 0
+                    else:
+                        new_times.append(old)
+                reached = [m for m, t in zip(MILESTONES, new_times) if t]
+                new_status = reached[-1] if reached else ("failed" if entry.failed else status)
+                if STATUS_RANK.get(new_status, 0) < STATUS_RANK.get(status, 0):
+                    new_status = status
+                if new_status == "failed" and status != "failed":
+                    deltas[3] = 1
+                if new_times != existing or new_status != status:
+                    updates.append((*new_times, new_status, message_id))
+                if campaign_id and any(deltas):
+                    totals = campaign_deltas.setdefault(campaign_id, [0, 0, 0, 0])
+                    for i, delta in enumerate(deltas):
+                        totals[i] += delta
+
+            conn.executemany(
+                "UPDATE messages SET delivered_at = ?, opened_at = ?, clicked_at = ?, status = ? WHERE id = ?",
+                updates
+            )
+            conn.executemany(
+                "UPDATE campaigns SET delivered_count = delivered_count + ?, opened_count = opened_count + ?, "
+                "clicked_count = clicked_count + ?, failed_count = failed_count + ? WHERE id = ?",
+                [(*deltas, campaign_id) for campaign_id, deltas in campaign_deltas.items()]
+            )
+
+        self.applied += len(current)
+        return {message_id: entry for message_id, entry in batch.items() if message_id not in current}
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        started = time.perf_counter()
+        try:
+            orphans = await asyncio.to_thread(self._apply, batch)
+        except Exception:
+            # Nothing was written (the transaction rolled back); retry the whole batch next time
+            self._merge_back(batch)
+            raise
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        now = time.monotonic()
+        expired = [message_id for message_id, entry in orphans.items() if now - entry.first_seen > self.orphan_ttl]
+        for message_id in expired:
+            del orphans[message_id]
+        self.dropped += len(expired)
+        self._merge_back(orphans)
+
+    def _merge_back(self, entries: Dict[str, _Pending]):
+        for message_id, entry in entries.items():
+            # Merge with anything that arrived for the same message meanwhile
+            newer = self._pending.get(message_id)
+            if newer is None:
+                self._pending[message_id] = entry
+            else:
+                for milestone, at in entry.times.items():
+                    if milestone not in newer.times or at < newer.times[milestone]:
+                        newer.times[milestone] = at
+                newer.failed = newer.failed or entry.failed
+                newer.first_seen = entry.first_seen
+
+    async def _run(self):
+        while self._running:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Receipt flush failed: {e}")
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "pending_messages": len(self._pending),
+            "applied_messages": self.applied,
+            "dropped_orphans": self.dropped,
+            "last_flush_ms": self.last_flush_ms
+        }
+
+
+receipt_coalescer = ReceiptCoalescer()
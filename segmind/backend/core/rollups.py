@@ -0,0 +1,246 @@
+"""Time-bucketed event rollups for the analytics dashboards.
+
+`event_rollups` holds event counts and purchase revenue per
+(grain, dimension, dimension value, event type, bucket) for hour/day/month
+grains over the dimensions all/category/brand/segment. It is maintained
+incrementally from the events store by rowid watermark (the same
+`ingest_watermarks` table the user_features job uses), so dashboards read a
+primary-key range instead of aggregating raw events per request.
+
+Segment rows use segment membership from user_features at the time the
+events are folded in. Build or update with:
+
+    python -m core.rollups --db ../../kaggle_tools/ecommerce.db
+"""
+import argparse
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from core.segment_engine import compile_criteria, bind_params
+from core.utils.config import settings
+
+JOB_NAME = "event_rollups"
+ROLLUP_STEP = 1000000
+GRAINS = ("hour", "day", "month")
+
+# Bucket start (epoch seconds, UTC) of an hour-bucket column h
+_GRAIN_BUCKETS = {
+    "hour": "h",
+    "day": "h - h % 86400",
+    "month": "CAST(strftime('%s', h, 'unixepoch', 'start of month') AS INTEGER)",
+}
+
+
+class RollupsUnavailable(Exception):
+    """Raised when the events store has no rollups yet"""
+
+
+def create_rollup_tables(conn):
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS event_rollups (
+            grain TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            dimension_value TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            events INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (grain, dimension, dimension_value, event_type, bucket)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_event_rollups_bucket ON event_rollups(grain, dimension, bucket);
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            job TEXT NOT NULL,
+            source_table TEXT NOT NULL,
+            last_rowid INTEGER NOT NULL,
+            updated_at INTEGER,
+            PRIMARY KEY (job, source_table)
+        );
+    ''')
+
+
+def _event_sources(conn) -> Dict[str, Dict[str, str]]:
+    """Physical event tables and SQL expressions over them (alias e)"""
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    sources = {}
+    for table in tables:
+        columns = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+        if table.endswith("_facts") and "event_type_id" in columns:
+            sources[table] = {
+                "time": "e.event_time",
+                "event_type": "(SELECT name FROM event_types WHERE id = e.event_type_id)",
+                "category": "(SELECT name FROM category_codes WHERE id = e.category_code_id)",
+                "brand": "(SELECT name FROM brands WHERE id = e.brand_id)",
+            }
+        elif {"event_time", "event_type", "user_id", "category_code", "brand"} <= columns:
+            sources[table] = {
+                "time": "CAST(strftime('%s', substr(e.event_time, 1, 19)) AS INTEGER)",
+                "event_type": "e.event_type",
+                "category": "e.category_code",
+                "brand": "e.brand",
+            }
+    return sources
+
+
+def _has_table(conn, name) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _fold_range(conn, table, x, lo, hi, segments, reference):
+    """Add events with lo < rowid <= hi to every grain of event_rollups"""
+    source = f'FROM "{table}" e WHERE e.rowid > {lo} AND e.rowid <= {hi}'
+    hour = f"({x['time']} - {x['time']} % 3600)"
+    revenue = f"TOTAL(CASE WHEN {x['event_type']} = 'purchase' THEN e.price END)"
+
+    conn.execute("DELETE FROM temp.rollup_hours")
+    selects = [
+        f"SELECT 'all', '', {x['event_type']} AS t, {hour} AS h, COUNT(*), {revenue} {source} GROUP BY t, h",
+        f"SELECT 'category', {x['category']} AS v, {x['event_type']} AS t, {hour} AS h, COUNT(*), {revenue} "
+        f"{source} AND v IS NOT NULL GROUP BY v, t, h",
+        f"SELECT 'brand', {x['brand']} AS v, {x['event_type']} AS t, {hour} AS h, COUNT(*), {revenue} "
+        f"{source} AND v IS NOT NULL GROUP BY v, t, h",
+    ]
+    for select in selects:
+        conn.execute(f"INSERT INTO temp.rollup_hours {select}")
+    for segment in segments:
+        predicate, values = compile_criteria(segment.get("criteria", {}))
+        conn.execute(f'''
+            INSERT INTO temp.rollup_hours
+            SELECT 'segment', ?, {x['event_type']} AS t, {hour} AS h, COUNT(*), {revenue}
+            {source} AND e.user_id IN (SELECT user_id FROM user_features WHERE {predicate})
+            GROUP BY t, h
+        ''', [segment["id"]] + bind_params(values, reference))
+
+    for grain in GRAINS:
+        conn.execute(f'''
+            INSERT INTO event_rollups (grain, dimension, dimension_value, event_type, bucket, events, revenue)
+            SELECT '{grain}', dimension, dimension_value, event_type, {_GRAIN_BUCKETS[grain]} AS b,
+                   SUM(events), TOTAL(revenue)
+            FROM temp.rollup_hours
+            WHERE event_type IS NOT NULL AND h IS NOT NULL
+            GROUP BY dimension, dimension_value, event_type, b
+            ON CONFLICT(grain, dimension, dimension_value, event_type, bucket) DO UPDATE SET
+                events = events + excluded.events,
+                revenue = revenue + excluded.revenue
+        ''')
+
+
+def update_rollups(conn, segments: Optional[List[Dict[str, Any]]] = None, step: int = ROLLUP_STEP) -> int:
+    """Fold every event added since the last run into event_rollups"""
+    create_rollup_tables(conn)
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS rollup_hours (
+        dimension TEXT, dimension_value TEXT, event_type TEXT, h INTEGER, events INTEGER, revenue REAL)''')
+
+    if segments and not _has_table(conn, "user_features"):
+        print("user_features not found; skipping segment rollups")
+        segments = []
+    segments = segments or []
+    reference = None
+    if segments:
+        reference = conn.execute("SELECT MAX(last_event_time) FROM user_features").fetchone()[0]
+
+    total = 0
+    for table, expressions in _event_sources(conn).items():
+        row = conn.execute("SELECT last_rowid FROM ingest_watermarks WHERE job = ? AND source_table = ?",
+                           (JOB_NAME, table)).fetchone()
+        last_rowid = row[0] if row else 0
+        max_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        while last_rowid < max_rowid:
+            hi = min(last_rowid + step, max_rowid)
+            with conn:
+                _fold_range(conn, table, expressions, last_rowid, hi, segments, reference)
+                conn.execute('''
+                    INSERT INTO ingest_watermarks (job, source_table, last_rowid, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(job, source_table) DO UPDATE SET last_rowid = excluded.last_rowid,
+                                                                 updated_at = excluded.updated_at
+                ''', (JOB_NAME, table, hi, int(time.time())))
+            total += hi - last_rowid
+            last_rowid = hi
+            print(f"  {table}: through rowid {hi:,}")
+    print(f"✓ event_rollups updated ({total:,} new events)")
+    return total
+
+
+class RollupStore:
+    """Range queries over event_rollups"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            raise RollupsUnavailable(f"Events database not found: {self.db_path}")
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        if not _has_table(conn, "event_rollups"):
+            conn.close()
+            raise RollupsUnavailable(f"event_rollups is not built in {self.db_path} (run python -m core.rollups)")
+        return conn
+
+    def latest_bucket(self, grain: str = "day") -> Optional[int]:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT MAX(bucket) FROM event_rollups WHERE grain = ? AND dimension = 'all'", (grain,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def series(self, grain: str, start: int, end: int, dimension: str = "all",
+               dimension_value: Optional[str] = None) -> Dict[int, Dict[str, Dict[str, float]]]:
+        """{bucket: {dimension_value: {event_type: events, ..., 'revenue': x}}} for start <= bucket < end"""
+        sql = '''SELECT bucket, dimension_value, event_type, events, revenue FROM event_rollups
+                 WHERE grain = ? AND dimension = ? AND bucket >= ? AND bucket < ?'''
+        params: List[Any] = [grain, dimension, start, end]
+        if dimension_value is not None:
+            sql = sql.replace("dimension = ?", "dimension = ? AND dimension_value = ?")
+            params.insert(2, dimension_value)
+        conn = self._connect()
+        try:
+            result: Dict[int, Dict[str, Dict[str, float]]] = {}
+            for bucket, value, event_type, events, revenue in conn.execute(sql, params):
+                counters = result.setdefault(bucket, {}).setdefault(value, {"revenue": 0.0})
+                counters[event_type] = counters.get(event_type, 0) + events
+                counters["revenue"] += revenue
+            return result
+        finally:
+            conn.close()
+
+    def totals(self, grain: str, start: int, end: int, dimension: str) -> Dict[str, Dict[str, float]]:
+        """Counters summed over [start, end) per dimension value"""
+        conn = self._connect()
+        try:
+            result: Dict[str, Dict[str, float]] = {}
+            for value, event_type, events, revenue in conn.execute('''
+                SELECT dimension_value, event_type, SUM(events), TOTAL(revenue) FROM event_rollups
+                WHERE grain = ? AND dimension = ? AND bucket >= ? AND bucket < ?
+                GROUP BY dimension_value, event_type
+            ''', (grain, dimension, start, end)):
+                counters = result.setdefault(value, {"revenue": 0.0})
+                counters[event_type] = events
+                counters["revenue"] += revenue
+            return result
+        finally:
+            conn.close()
+
+
+rollup_store = RollupStore(settings.events_db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update event_rollups")
+    parser.add_argument("--db", default=settings.events_db_path, help="events SQLite database")
+    parser.add_argument("--step", type=int, default=ROLLUP_STEP, help="events per transaction")
+    args = parser.parse_args()
+
+    from routes.segments import SEGMENTS
+
+    conn = sqlite3.connect(args.db)
+    try:
+        update_rollups(conn, SEGMENTS, step=args.step)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
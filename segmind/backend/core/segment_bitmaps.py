@@ -0,0 +1,193 @@
+"""Segment membership as bitmaps over dense user ordinals.
+
+Every user in user_features gets an ordinal (its position in user_id order)
+and each segment is a packed bit array over those ordinals, so union,
+intersection, difference and cardinality are vectorized word operations:
+about 125 KB and well under a millisecond per operation per million users.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from core.segment_engine import segment_engine
+from core.utils.config import settings
+
+# Bits set in every byte value, for cardinality on NumPy versions without bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class SegmentBitmap:
+    """Fixed-size bit set over user ordinals backed by uint64 words"""
+
+    __slots__ = ("words", "size")
+
+    def __init__(self, words: np.ndarray, size: int):
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def empty(cls, size: int) -> "SegmentBitmap":
+        return cls(np.zeros((size + 63) // 64, dtype=np.uint64), size)
+
+    @classmethod
+    def full(cls, size: int) -> "SegmentBitmap":
+        return ~cls.empty(size)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "SegmentBitmap":
+        """Build from a boolean array indexed by ordinal"""
+        size = len(mask)
+        padded = np.zeros(((size + 63) // 64) * 64, dtype=bool)
+        padded[:size] = mask
+        packed = np.packbits(padded, bitorder="little")
+        return cls(packed.view(np.uint64).copy(), size)
+
+    @classmethod
+    def from_ordinals(cls, ordinals: Iterable[int], size: int) -> "SegmentBitmap":
+        mask = np.zeros(size, dtype=bool)
+        mask[np.asarray(ordinals, dtype=np.int64)] = True
+        return cls.from_mask(mask)
+
+    def _check(self, other: "SegmentBitmap"):
+        if self.size != other.size:
+            raise ValueError(f"Bitmap sizes differ: {self.size} != {other.size}")
+
+    def __and__(self, other: "SegmentBitmap") -> "SegmentBitmap":
+        self._check(other)
+        return SegmentBitmap(self.words & other.words, self.size)
+
+    def __or__(self, other: "SegmentBitmap") -> "SegmentBitmap":
+        self._check(other)
+        return SegmentBitmap(self.words | other.words, self.size)
+
+    def __xor__(self, other: "SegmentBitmap") -> "SegmentBitmap":
+        self._check(other)
+        return SegmentBitmap(self.words ^ other.words, self.size)
+
+    def __sub__(self, other: "SegmentBitmap") -> "SegmentBitmap":
+        self._check(other)
+        return SegmentBitmap(self.words & ~other.words, self.size)
+
+    def __invert__(self) -> "SegmentBitmap":
+        words = ~self.words
+        tail = self.size % 64
+        if tail:
+            words[-1] &= np.uint64((1 << tail) - 1)
+        return SegmentBitmap(words, self.size)
+
+    def cardinality(self) -> int:
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.words).sum())
+        return int(_POPCOUNT[self.words.view(np.uint8)].sum(dtype=np.int64))
+
+    __len__ = cardinality
+
+    def ordinals(self, limit: Optional[int] = None) -> np.ndarray:
+        """Set ordinals in ascending order"""
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder="little")[:self.size]
+        found = np.flatnonzero(bits)
+        return found if limit is None else found[:limit]
+
+
+def union(bitmaps: List[SegmentBitmap], size: int) -> SegmentBitmap:
+    result = SegmentBitmap.empty(size)
+    for bitmap in bitmaps:
+        result = result | bitmap
+    return result
+
+
+def intersection(bitmaps: List[SegmentBitmap], size: int) -> SegmentBitmap:
+    result = SegmentBitmap.full(size)
+    for bitmap in bitmaps:
+        result = result & bitmap
+    return result
+
+
+class SegmentBitmapSnapshot:
+    """One build of the segment bitmaps together with the user ids they index"""
+
+    __slots__ = ("bitmaps", "ordinal_user_ids")
+
+    def __init__(self, bitmaps: Dict[str, SegmentBitmap], ordinal_user_ids: np.ndarray):
+        self.bitmaps = bitmaps
+        self.ordinal_user_ids = ordinal_user_ids
+
+    @property
+    def size(self) -> int:
+        return len(self.ordinal_user_ids)
+
+    def get(self, name: str) -> SegmentBitmap:
+        try:
+            return self.bitmaps[name]
+        except KeyError:
+            raise KeyError(f"Unknown segment: {name}")
+
+    def query(self, all_of: List[str] = (), any_of: List[str] = (), none_of: List[str] = ()) -> SegmentBitmap:
+        """(AND of all_of) AND (OR of any_of) AND NOT (OR of none_of)"""
+        result = intersection([self.get(n) for n in all_of], self.size)
+        if any_of:
+            result = result & union([self.get(n) for n in any_of], self.size)
+        if none_of:
+            result = result - union([self.get(n) for n in none_of], self.size)
+        return result
+
+    def user_ids(self, bitmap: SegmentBitmap, limit: Optional[int] = None) -> List[int]:
+        if bitmap.size != self.size:
+            raise ValueError(f"Bitmap is from another build: {bitmap.size} != {self.size}")
+        return self.ordinal_user_ids[bitmap.ordinals(limit)].tolist()
+
+
+class SegmentBitmapStore:
+    """Segment bitmaps built from the segment engine, refreshed on a TTL
+
+    A refresh swaps in a new snapshot, so readers that hold one (see
+    snapshot()) keep bitmaps and user ids from the same build.
+    """
+
+    def __init__(self, engine, ttl: float = 300):
+        self.engine = engine
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = SegmentBitmapSnapshot({}, np.empty(0, dtype=np.int64))
+        self._built_at = 0.0
+        self._segment_ids: tuple = ()
+
+    def snapshot(self) -> SegmentBitmapSnapshot:
+        with self._lock:
+            return self._snapshot
+
+    @property
+    def size(self) -> int:
+        return self.snapshot().size
+
+    def refresh(self, segments: List[Dict[str, Any]]):
+        """Rebuild every segment bitmap from one scan of user_features"""
+        user_ids, flags = self.engine.memberships(segments)
+        bitmaps = {
+            segment["id"]: SegmentBitmap.from_mask(flags[:, i])
+            for i, segment in enumerate(segments)
+        }
+        with self._lock:
+            self._snapshot = SegmentBitmapSnapshot(bitmaps, user_ids)
+            self._built_at = time.monotonic()
+            self._segment_ids = tuple(s["id"] for s in segments)
+
+    def ensure(self, segments: List[Dict[str, Any]]):
+        """Refresh if the bitmaps are older than the TTL or the segment list changed"""
+        stale = time.monotonic() - self._built_at > self.ttl
+        if stale or self._segment_ids != tuple(s["id"] for s in segments):
+            self.refresh(segments)
+
+    def get(self, name: str) -> SegmentBitmap:
+        return self.snapshot().get(name)
+
+    def query(self, all_of: List[str] = (), any_of: List[str] = (), none_of: List[str] = ()) -> SegmentBitmap:
+        return self.snapshot().query(all_of, any_of, none_of)
+
+    def user_ids(self, bitmap: SegmentBitmap, limit: Optional[int] = None) -> List[int]:
+        return self.snapshot().user_ids(bitmap, limit)
+
+
+segment_bitmaps = SegmentBitmapStore(segment_engine, ttl=settings.segment_cache_ttl)
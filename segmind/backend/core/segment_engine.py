@@ -0,0 +1,230 @@
+"""Segment engine: compiles segment criteria into SQL over the user_features store.
+
+The store is the `user_features` table maintained by
+kaggle_tools/build_user_features.py (one indexed row per user), so every
+segment count is a single indexed query instead of a scan over raw events.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.utils.config import settings
+
+SECONDS_PER_DAY = 86400
+
+# Criteria name -> SQL expression over user_features. Day-based fields are
+# measured back from the newest event in the store (the `?` placeholder), so
+# historical datasets segment the same way live data would.
+NUMERIC_FIELDS = {
+    "conversion_rate": ("100.0 * purchase_count / NULLIF(view_count, 0)", False),
+    "total_orders": ("purchase_count", False),
+    "previous_orders": ("purchase_count", False),
+    "page_views": ("view_count", False),
+    "cart_adds": ("cart_count", False),
+    "sessions": ("session_count", False),
+    "lifetime_value": ("total_spend", False),
+    "days_since_cart": ("(? - last_cart_time) / 86400.0", True),
+    "days_since_last_order": ("(? - last_purchase_time) / 86400.0", True),
+    "days_since_last_event": ("(? - last_event_time) / 86400.0", True),
+}
+
+BOOLEAN_FIELDS = {
+    "cart_abandonment": "(cart_count > 0 AND (last_purchase_time IS NULL OR last_purchase_time < last_cart_time))",
+    "has_purchased": "(purchase_count > 0)",
+}
+
+OPERATORS = {">": ">", ">=": ">=", "<": "<", "<=": "<=", "=": "=", "==": "=", "!=": "!="}
+
+# Placeholder in compiled params for the newest event time in the store
+REFERENCE_TIME = object()
+
+_CRITERION_RE = re.compile(r"^\s*(>=|<=|==|!=|>|<|=)?\s*\$?\s*(-?\d[\d,]*(?:\.\d+)?)\s*%?\s*$")
+
+
+class SegmentStoreUnavailable(Exception):
+    """Raised when the user_features store is missing or unreadable"""
+
+
+class InvalidCriteria(ValueError):
+    """Raised when a segment criterion cannot be compiled"""
+
+
+def compile_criterion(field: str, value: Any) -> Tuple[str, List[Any], bool]:
+    """Compile one criterion into (sql, params, needs_reference_time)"""
+    if field in BOOLEAN_FIELDS:
+        flag = value if isinstance(value, bool) else str(value).strip().lower()
+        if flag in (True, "true", "yes", "1"):
+            return BOOLEAN_FIELDS[field], [], False
+        if flag in (False, "false", "no", "0"):
+            return f"NOT {BOOLEAN_FIELDS[field]}", [], False
+        raise InvalidCriteria(f"{field}: expected true/false, got {value!r}")
+
+    if field not in NUMERIC_FIELDS:
+        raise InvalidCriteria(f"Unknown criterion: {field}")
+    expression, uses_reference = NUMERIC_FIELDS[field]
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        operator, number = "=", float(value)
+    else:
+        match = _CRITERION_RE.match(str(value))
+        if not match:
+            raise InvalidCriteria(f"{field}: cannot parse {value!r}")
+        operator = OPERATORS[match.group(1) or "="]
+        number = float(match.group(2).replace(",", ""))
+
+    return f"{expression} {operator} ?", [number], uses_reference
+
+
+def compile_criteria(criteria: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Compile a criteria dict into an AND-ed predicate and its params
+
+    Day-based terms leave a REFERENCE_TIME marker in params, filled in by
+    bind_params() once the newest event time is known.
+    """
+    if not criteria:
+        return "1", []
+    parts, params = [], []
+    for field, value in criteria.items():
+        sql, values, uses_reference = compile_criterion(field, value)
+        parts.append(f"({sql})")
+        # The reference time placeholder comes before the threshold one
+        params.extend(([REFERENCE_TIME] if uses_reference else []) + values)
+    return " AND ".join(parts), params
+
+
+def bind_params(params: List[Any], reference_time: Optional[int]) -> List[Any]:
+    """Replace REFERENCE_TIME markers in compiled params"""
+    return [reference_time if p is REFERENCE_TIME else p for p in params]
+
+
+class SegmentEngine:
+    """Evaluates segment criteria against the user_features table with a TTL cache"""
+
+    def __init__(self, db_path: str, cache_ttl: float = 300):
+        self.db_path = db_path
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            raise SegmentStoreUnavailable(f"Events database not found: {self.db_path}")
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+            conn.execute("SELECT 1 FROM user_features LIMIT 1")
+        except sqlite3.Error as e:
+            raise SegmentStoreUnavailable(
+                f"user_features is not available in {self.db_path} "
+                f"(run kaggle_tools/build_user_features.py): {e}"
+            )
+        return conn
+
+    def _cached(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+        value = compute()
+        with self._lock:
+            self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def invalidate(self):
+        """Drop all cached counts"""
+        with self._lock:
+            self._cache.clear()
+
+    def _reference_time(self, conn) -> Optional[int]:
+        return conn.execute("SELECT MAX(last_event_time) FROM user_features").fetchone()[0]
+
+    def count(self, criteria: Dict[str, Any]) -> int:
+        """Number of users matching criteria"""
+        sql, params = compile_criteria(criteria)
+
+        def compute():
+            conn = self._connect()
+            try:
+                reference = self._reference_time(conn) if REFERENCE_TIME in params else None
+                return conn.execute(
+                    f"SELECT COUNT(*) FROM user_features WHERE {sql}", bind_params(params, reference)
+                ).fetchone()[0]
+            finally:
+                conn.close()
+
+        key = ("count", sql, tuple(p for p in params if p is not REFERENCE_TIME))
+        return self._cached(key, compute)
+
+    def overview(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Counts for many segments plus the user total, from one grouped scan"""
+        compiled = [compile_criteria(s.get("criteria", {})) for s in segments]
+
+        def compute():
+            conn = self._connect()
+            try:
+                reference = self._reference_time(conn)
+                columns = ", ".join(f"SUM(CASE WHEN {sql} THEN 1 ELSE 0 END)" for sql, _ in compiled)
+                params = [p for _, values in compiled for p in bind_params(values, reference)]
+                row = conn.execute(
+                    f"SELECT COUNT(*){', ' + columns if columns else ''} FROM user_features", params
+                ).fetchone()
+                return {"total_users": row[0], "counts": [c or 0 for c in row[1:]]}
+            finally:
+                conn.close()
+
+        key = ("overview",) + tuple(
+            (sql, tuple(p for p in values if p is not REFERENCE_TIME)) for sql, values in compiled
+        )
+        return self._cached(key, compute)
+
+    def iter_members(self, criteria: Dict[str, Any], batch_size: int = 1000):
+        """Yield matching user ids in ascending batches, keyset-paged so memory stays flat
+
+        The generator may be advanced from different threads (one at a time),
+        e.g. via asyncio.to_thread.
+        """
+        sql, params = compile_criteria(criteria)
+        conn = self._connect(check_same_thread=False)
+        try:
+            bound = bind_params(params, self._reference_time(conn))
+            last_user_id = -(2 ** 63)
+            while True:
+                rows = conn.execute(
+                    f"SELECT user_id FROM user_features WHERE user_id > ? AND ({sql}) ORDER BY user_id LIMIT ?",
+                    [last_user_id] + bound + [batch_size]
+                ).fetchall()
+                if not rows:
+                    return
+                last_user_id = rows[-1][0]
+                yield [row[0] for row in rows]
+        finally:
+            conn.close()
+
+    def memberships(self, segments: List[Dict[str, Any]], fetch_size: int = 100000):
+        """All user ids (sorted) and a boolean membership matrix, one column per segment"""
+        compiled = [compile_criteria(s.get("criteria", {})) for s in segments]
+        conn = self._connect()
+        try:
+            reference = self._reference_time(conn)
+            columns = "".join(f", CASE WHEN {sql} THEN 1 ELSE 0 END" for sql, _ in compiled)
+            params = [p for _, values in compiled for p in bind_params(values, reference)]
+            cursor = conn.execute(f"SELECT user_id{columns} FROM user_features ORDER BY user_id", params)
+            chunks = []
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=np.int64).reshape(len(rows), len(compiled) + 1))
+        finally:
+            conn.close()
+
+        table = np.concatenate(chunks) if chunks else np.empty((0, len(compiled) + 1), dtype=np.int64)
+        return table[:, 0], table[:, 1:].astype(bool)
+
+
+segment_engine = SegmentEngine(settings.events_db_path, cache_ttl=settings.segment_cache_ttl)
@@ -0,0 +1,162 @@
+"""Compiled message templates.
+
+A template such as "Don't forget your {{product_name}}!" is parsed once into
+a render plan: a str.format pattern with the literal text escaped and every
+placeholder replaced by a positional slot, plus the variable name for each
+slot. Rendering a recipient is then one C-level format call over a tuple of
+values, so the only string allocated per recipient is the result.
+
+Compiled plans are cached by (template id, version). Unknown variables render
+as the original placeholder, matching what an unfilled template looks like.
+Templates compiled with `escape` (e.g. html.escape for email HTML) escape
+every substituted value but not the template text itself.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from core.utils.config import settings
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class _Missing:
+    """Sentinel value rendered back as the placeholder it came from"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __format__(self, spec: str) -> str:
+        return self.text
+
+
+class CompiledTemplate:
+    __slots__ = ("source", "variables", "_pattern", "_slots", "_missing", "_static", "_escape")
+
+    def __init__(self, source: str, escape: Optional[Callable[[str], str]] = None):
+        self.source = source
+        self._escape = escape
+        parts = []
+        slots: List[str] = []
+        index: Dict[str, int] = {}
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            parts.append(source[position:match.start()].replace("{", "{{").replace("}", "}}"))
+            name = match.group(1)
+            if name not in index:
+                index[name] = len(slots)
+                slots.append(name)
+            parts.append("{%d}" % index[name])
+            position = match.end()
+        parts.append(source[position:].replace("{", "{{").replace("}", "}}"))
+
+        self._pattern = "".join(parts)
+        self._slots = tuple(slots)
+        self._missing = tuple(_Missing("{{%s}}" % name) for name in slots)
+        self._static = source if not slots else None
+        self.variables = frozenset(slots)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        if self._static is not None:
+            return self._static
+        get = context.get
+        values = [get(name, missing) for name, missing in zip(self._slots, self._missing)]
+        if self._escape is not None:
+            values = [self._escaped(value) for value in values]
+        return self._pattern.format(*values)
+
+    def _escaped(self, value: Any) -> Any:
+        return value if value.__class__ is _Missing else self._escape(str(value))
+
+    def render_many(self, contexts: Iterable[Mapping[str, Any]]) -> List[str]:
+        """Render one string per context"""
+        if self._static is not None:
+            return [self._static for _ in contexts]
+        if self._escape is not None:
+            return [self.render(context) for context in contexts]
+        fmt = self._pattern.format
+        slots = tuple(zip(self._slots, self._missing))
+        return [fmt(*[context.get(name, missing) for name, missing in slots]) for context in contexts]
+
+    def render_columns(self, columns: Mapping[str, Sequence[Any]], shared: Optional[Mapping[str, Any]] = None) -> List[str]:
+        """Render from per-variable columns of equal length (one entry per recipient).
+
+        Variables not in `columns` come from `shared` and are the same for every
+        recipient; this avoids building a dict per recipient for large batches.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        if self._static is not None:
+            return [self._static] * size
+        shared = shared or {}
+        rows = []
+        for name, missing in zip(self._slots, self._missing):
+            if name in columns:
+                column = columns[name]
+                rows.append(column if self._escape is None else [self._escaped(value) for value in column])
+            else:
+                value = shared.get(name, missing)
+                rows.append(((value if self._escape is None else self._escaped(value)),) * size)
+        return [self._pattern.format(*values) for values in zip(*rows)]
+
+
+def source_version(source: str) -> str:
+    """Version for templates that don't carry one: a digest of their text"""
+    return hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+
+
+class TemplateCache:
+    """LRU of compiled templates keyed by (template id, version)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_id: str, source: str, version: Optional[str] = None) -> CompiledTemplate:
+        key = (template_id, version or source_version(source))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+        compiled = CompiledTemplate(source)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, template_id: Optional[str] = None):
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == template_id]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+template_cache = TemplateCache(settings.template_cache_size)
+
+
+def render_batch(template_id: str, source: str, contexts: Sequence[Mapping[str, Any]],
+                 version: Optional[str] = None) -> List[str]:
+    """Render up to `render_batch_size` recipients with the cached plan for a template"""
+    if len(contexts) > settings.render_batch_size:
+        raise ValueError(f"At most {settings.render_batch_size} recipients per batch")
+    return template_cache.get(template_id, source, version).render_many(contexts)
+
+
+def render_content(source: str, context: Mapping[str, Any]) -> str:
+    """Fill {{name}} placeholders in an ad-hoc template; unknown names are left as they are"""
+    return template_cache.get("", source).render(context)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./segmind.db"
@@ -10,6 +10,65 @@ class Settings(BaseSettings):
     sendgrid_api_key: Optional[str] = None
     frontend_url: str = "http://localhost:3000"
     backend_url: str = "http://localhost:8000"
+    # SQLite store built by kaggle_tools (events + user_features)
+    events_db_path: str = "../../kaggle_tools/ecommerce.db"
+    segment_cache_ttl: int = 300
+    # Response cache for analytics/products/insights routes
+    cache_ttl: int = 60
+    cache_stale_ttl: int = 300
+    cache_max_entries: int = 1024
+    cache_redis_enabled: bool = False
+    # Campaign fan-out: provider endpoint (e.g. scripts/stub_provider.py) and per-channel send concurrency
+    provider_base_url: Optional[str] = None
+    channel_concurrency: Dict[str, int] = {"sms": 50, "email": 100, "push": 200, "whatsapp": 50}
+    dispatch_batch_size: int = 1000
+    # Outbox behind POST /api/messaging/send
+    outbox_workers: int = 4
+    outbox_batch_size: int = 100
+    outbox_max_attempts: int = 6
+    outbox_base_delay: float = 1.0
+    outbox_max_delay: float = 300.0
+    outbox_poll_interval: float = 1.0
+    outbox_retention_seconds: int = 86400
+    # POST /send/bulk limits; the body size is checked while it is read, before any parsing
+    bulk_send_max_items: int = 10000
+    bulk_send_max_bytes: int = 16 * 1024 * 1024
+    # Scheduled campaigns: keep those due within the horizon in memory, reload from the store periodically
+    scheduler_horizon: float = 600.0
+    scheduler_reload_interval: float = 60.0
+    # Campaign card generation (OpenAI-compatible chat completions; point at scripts/stub_llm.py locally)
+    openai_base_url: str = "https://api.openai.com/v1"
+    llm_model: str = "gpt-4"
+    llm_max_concurrency: int = 16
+    llm_timeout: float = 30.0
+    llm_deadline: float = 60.0
+    llm_max_retries: int = 3
+    llm_base_backoff: float = 0.5
+    llm_max_backoff: float = 8.0
+    llm_max_cards_per_call: int = 8
+    card_cache_path: str = "./card_cache.db"
+    card_cache_ttl: float = 86400.0
+    card_cache_max_entries: int = 512
+    # Popup image generation: campaign types per batch request, and how many of them generate at once
+    popup_batch_max_types: int = 8
+    popup_batch_concurrency: int = 4
+    # Message templates
+    template_cache_size: int = 1024
+    render_batch_size: int = 10000
+    # Provider status webhooks
+    receipt_flush_interval: float = 0.5
+    receipt_flush_size: int = 5000
+    receipt_orphan_ttl: float = 60.0
+    # Shared worker pools for blocking work (cpu defaults to the core count)
+    io_pool_size: int = 32
+    cpu_pool_size: Optional[int] = None
+    # Token buckets per (channel, sender) plus an account-wide bucket per channel, in sends/second
+    channel_rate_limits: Dict[str, Dict[str, float]] = {
+        "sms": {"rate": 30, "burst": 30, "account_rate": 100, "account_burst": 100},
+        "email": {"rate": 100, "burst": 200, "account_rate": 500, "account_burst": 1000},
+        "push": {"rate": 500, "burst": 1000, "account_rate": 2000, "account_burst": 4000},
+        "whatsapp": {"rate": 20, "burst": 20, "account_rate": 80, "account_burst": 80},
+    }
 
     class Config:
         env_file = ".env"
@@ -50,6 +50,7 @@ class Message(BaseModel):
     delivered_at: Optional[datetime] = None
     opened_at: Optional[datetime] = None
     clicked_at: Optional[datetime] = None
+    campaign_id: Optional[str] = None
 
 class Campaign(BaseModel):
     id: str
@@ -58,13 +59,20 @@ class Campaign(BaseModel):
     channel: MessageChannel
     content: str
     subject: Optional[str] = None
+    sender: Optional[str] = None
     status: str
+    total_recipients: int = 0
     sent_count: int = 0
+    failed_count: int = 0
     delivered_count: int = 0
     opened_count: int = 0
     clicked_count: int = 0
     created_at: datetime
     scheduled_at: Optional[datetime] = None
+    product_id: Optional[str] = None
+    template_id: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    variables: Dict[str, Any] = Field(default_factory=dict)
 
 class AnalyticsMetrics(BaseModel):
     total_messages: int
@@ -81,6 +89,8 @@ class SendMessageRequest(BaseModel):
     channel: MessageChannel
     content: str
     subject: Optional[str] = None
+    sender: Optional[str] = None
+    idempotency_key: Optional[str] = None
 
 class CreateCampaignRequest(BaseModel):
     name: str
@@ -88,10 +98,24 @@ class CreateCampaignRequest(BaseModel):
     channel: MessageChannel
     content: str
     subject: Optional[str] = None
+    sender: Optional[str] = None
     scheduled_at: Optional[datetime] = None
+    variables: Dict[str, Any] = Field(default_factory=dict)
 
 class CreateSegmentRequest(BaseModel):
     name: str
     type: SegmentType
     description: str
-    criteria: Dict[str, Any]
\ No newline at end of file
+    criteria: Dict[str, Any]
+
+class SegmentQueryRequest(BaseModel):
+    all_of: List[str] = []
+    any_of: List[str] = []
+    none_of: List[str] = []
+    include_user_ids: bool = False
+    limit: int = Field(default=100, ge=0, le=10000)
+
+class StatusCallback(BaseModel):
+    message_id: str
+    status: str  # delivered, opened, clicked, failed/undelivered/bounced/rejected
+    timestamp: Optional[datetime] = None
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
@@ -15,9 +16,32 @@ from routes.campaigns import router as campaigns_router
 from routes.templates import router as templates_router
 from routes.campaign_generator import router as campaign_generator_router
 from routes.popup_generator import router as popup_generator_router
+from routes.messaging import router as messaging_router, send_campaign
 from audience_insights import router as audience_insights_router
+from core.dispatcher import dispatcher
+from core.outbox import outbox
+from core.campaign_scheduler import campaign_scheduler
+from core.receipts import receipt_coalescer
+from core.llm_client import llm_client
+from core.card_cache import card_cache
+from core.executors import worker_pools
 
-app = FastAPI(title="Segmind MVP - Customer Messaging Platform")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_pools.install()
+    await outbox.start(dispatcher)
+    await receipt_coalescer.start()
+    await campaign_scheduler.start(send_campaign)
+    yield
+    await campaign_scheduler.stop()
+    await outbox.stop()
+    await receipt_coalescer.stop()
+    await dispatcher.close()
+    await llm_client.close()
+    card_cache.close()
+    await worker_pools.shutdown()
+
+app = FastAPI(title="Segmind MVP - Customer Messaging Platform", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,6 +61,7 @@ app.include_router(campaigns_router)
 app.include_router(templates_router)
 app.include_router(campaign_generator_router)
 app.include_router(popup_generator_router)
+app.include_router(messaging_router)
 app.include_router(audience_insights_router, prefix="/api")
 
 @app.get("/health")
@@ -44,6 +69,11 @@ def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "segmind-backend"}
 
+@app.get("/health/pools")
+def worker_pool_stats():
+    """Queue and run times of the shared worker pools"""
+    return worker_pools.stats()
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -1,10 +1,56 @@
+import logging
+import time
 from fastapi import APIRouter
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, timezone
+
+from core.cache import cached
+from core.rollups import rollup_store, RollupsUnavailable
+from routes.segments import SEGMENTS, _segment_counts
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+class _EmptyRollups:
+    """Stands in for rollup_store until the events store and its rollups are built"""
+
+    def series(self, *args, **kwargs):
+        return {}
+
+    def totals(self, *args, **kwargs):
+        return {}
+
+def _rollups():
+    """(reader, start of the newest day, source); series are anchored on that day
+
+    Without rollups (no events store, or the rollup job hasn't run yet) the
+    dashboards get zeroed series ending today and source "empty".
+    """
+    try:
+        latest = rollup_store.latest_bucket("day")
+    except RollupsUnavailable as e:
+        logger.warning(f"Serving empty analytics: {e}")
+        latest = None
+    if latest is None:
+        return _EmptyRollups(), int(time.time()) // DAY * DAY, "empty"
+    return rollup_store, latest, "rollups"
+
+def _month_start(bucket):
+    day = datetime.fromtimestamp(bucket, timezone.utc)
+    return int(day.replace(day=1, hour=0, minute=0, second=0).timestamp())
+
+def _day_label(bucket):
+    return datetime.fromtimestamp(bucket, timezone.utc).strftime("%Y-%m-%d")
+
+def _rate(part, whole):
+    return round(100.0 * part / whole, 1) if whole else 0.0
+
+def _growth(current, previous):
+    return round(100.0 * (current - previous) / previous, 1) if previous else 0.0
 
 @router.get("/channels")
+@cached()
 def analytics_channels():
     """Returns channel performance metrics"""
     return {
@@ -17,18 +63,28 @@ def analytics_channels():
     }
 
 @router.get("/overview")
+@cached()
 def analytics_overview():
     """Returns overall analytics metrics"""
+    rollups, latest, source = _rollups()
+    month = _month_start(latest)
+    previous_month = _month_start(month - DAY)
+    months = rollups.series("month", previous_month, month + 1)
+    this_month = months.get(month, {}).get("", {})
+    last_month = months.get(previous_month, {}).get("", {})
+    totals = rollups.totals("month", 0, latest + DAY, "all").get("", {})
     return {
         "total_messages_sent": 156789,
-        "total_customers": 44054,
+        "total_customers": _segment_counts()["total_users"],
         "active_campaigns": 3,
-        "revenue_attributed": 2847593.45,
-        "avg_engagement_rate": 24.7,
-        "monthly_growth": 18.5
+        "revenue_attributed": round(totals.get("revenue", 0.0), 2),
+        "avg_engagement_rate": _rate(totals.get("cart", 0), totals.get("view", 0)),
+        "monthly_growth": _growth(this_month.get("revenue", 0.0), last_month.get("revenue", 0.0)),
+        "source": source
     }
 
 @router.get("/realtime")
+@cached(ttl=5)
 def analytics_realtime():
     """Returns real-time metrics for today"""
     return {
@@ -45,21 +101,27 @@ def analytics_realtime():
     }
 
 @router.get("/engagement")
+@cached()
 def analytics_engagement():
     """Returns engagement analytics data"""
-    # Generate time series data for the last 30 days
-    base_date = datetime.now() - timedelta(days=30)
+    # Daily series for the 30 days up to the newest event. Until message
+    # tracking lands, storefront funnel events stand in for engagement:
+    # views -> opens, cart adds -> clicks, purchases -> conversions.
+    rollups, latest, source = _rollups()
+    days = rollups.series("day", latest - 29 * DAY, latest + DAY)
     daily_data = []
 
     for i in range(30):
-        date = base_date + timedelta(days=i)
+        bucket = latest - (29 - i) * DAY
+        counters = days.get(bucket, {}).get("", {})
+        opens, clicks = counters.get("view", 0), counters.get("cart", 0)
         daily_data.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "opens": random.randint(800, 1200),
-            "clicks": random.randint(200, 400),
-            "conversions": random.randint(20, 80),
-            "engagement_rate": round(random.uniform(15, 35), 1),
-            "bounce_rate": round(random.uniform(5, 15), 1)
+            "date": _day_label(bucket),
+            "opens": opens,
+            "clicks": clicks,
+            "conversions": counters.get("purchase", 0),
+            "engagement_rate": _rate(clicks, opens),
+            "bounce_rate": _rate(counters.get("remove_from_cart", 0), clicks)
         })
 
     return {
@@ -73,108 +135,111 @@ def analytics_engagement():
             {"name": "iPhone 15 Pro Campaign", "engagement_rate": 45.2, "clicks": 3420},
             {"name": "Black Friday Sale", "engagement_rate": 38.7, "clicks": 2890},
             {"name": "Welcome Series", "engagement_rate": 32.1, "clicks": 2340}
-        ]
+        ],
+        "source": source
     }
 
 @router.get("/segments/performance")
+@cached()
 def analytics_segments_performance():
     """Returns segment performance data"""
+    rollups, latest, source = _rollups()
+    overview = _segment_counts()
+    current = rollups.totals("day", latest - 29 * DAY, latest + DAY, "segment")
+    previous = rollups.totals("day", latest - 59 * DAY, latest - 29 * DAY, "segment")
+    lifetime = rollups.totals("day", 0, latest + DAY, "segment")
+
+    segments = []
+    for segment, size in zip(SEGMENTS, overview["counts"]):
+        counters = lifetime.get(segment["id"], {})
+        purchases = counters.get("purchase", 0)
+        segments.append({
+            "id": segment["id"],
+            "name": segment["name"],
+            "size": size,
+            "avg_order_value": round(counters.get("revenue", 0.0) / purchases, 2) if purchases else 0.0,
+            "conversion_rate": _rate(purchases, counters.get("view", 0)),
+            "engagement_rate": _rate(counters.get("cart", 0), counters.get("view", 0)),
+            "revenue": round(counters.get("revenue", 0.0), 2),
+            "growth": _growth(current.get(segment["id"], {}).get("revenue", 0.0),
+                              previous.get(segment["id"], {}).get("revenue", 0.0))
+        })
+
+    total_segmented = sum(s["size"] for s in segments)
+    best = max(segments, key=lambda s: s["revenue"]) if segments else None
     return {
-        "segments": [
-            {
-                "id": "seg_001",
-                "name": "High Value Customers",
-                "size": 2340,
-                "avg_order_value": 847.50,
-                "conversion_rate": 12.4,
-                "engagement_rate": 45.2,
-                "revenue": 1982580,
-                "growth": 15.6
-            },
-            {
-                "id": "seg_002",
-                "name": "Window Shoppers",
-                "size": 8920,
-                "avg_order_value": 234.80,
-                "conversion_rate": 3.2,
-                "engagement_rate": 18.7,
-                "revenue": 324560,
-                "growth": -2.3
-            },
-            {
-                "id": "seg_003",
-                "name": "Repeat Buyers",
-                "size": 5680,
-                "avg_order_value": 567.30,
-                "conversion_rate": 8.9,
-                "engagement_rate": 34.5,
-                "revenue": 856740,
-                "growth": 22.1
-            },
-            {
-                "id": "seg_004",
-                "name": "Mobile Users",
-                "size": 12450,
-                "avg_order_value": 189.60,
-                "conversion_rate": 5.7,
-                "engagement_rate": 28.3,
-                "revenue": 567890,
-                "growth": 8.4
-            }
-        ],
-        "total_segments": 4,
-        "total_customers_segmented": 29390,
-        "best_performing_segment": "High Value Customers",
+        "segments": segments,
+        "total_segments": len(segments),
+        "total_customers_segmented": total_segmented,
+        "best_performing_segment": best["name"] if best else None,
         "segment_distribution": [
-            {"name": "High Value", "value": 2340, "percentage": 8.0},
-            {"name": "Window Shoppers", "value": 8920, "percentage": 30.3},
-            {"name": "Repeat Buyers", "value": 5680, "percentage": 19.3},
-            {"name": "Mobile Users", "value": 12450, "percentage": 42.4}
-        ]
+            {"name": s["name"], "value": s["size"], "percentage": _rate(s["size"], total_segmented)}
+            for s in segments
+        ],
+        "source": source
     }
 
 @router.get("/revenue")
+@cached()
 def analytics_revenue():
     """Returns revenue analytics data"""
-    # Generate monthly revenue data
-    base_date = datetime.now() - timedelta(days=365)
-    monthly_data = []
+    rollups, latest, source = _rollups()
 
-    for i in range(12):
-        date = base_date + timedelta(days=i*30)
+    # Monthly revenue for the 12 months up to the newest event
+    first_month = _month_start(latest)
+    for _ in range(11):
+        first_month = _month_start(first_month - DAY)
+    months = rollups.series("month", first_month, latest + DAY)
+    monthly_data = []
+    for bucket in sorted(months):
+        counters = months[bucket].get("", {})
+        orders = counters.get("purchase", 0)
         monthly_data.append({
-            "month": date.strftime("%b %Y"),
-            "revenue": random.randint(180000, 320000),
-            "orders": random.randint(800, 1500),
-            "avg_order_value": round(random.uniform(180, 280), 2)
+            "month": datetime.fromtimestamp(bucket, timezone.utc).strftime("%b %Y"),
+            "revenue": round(counters.get("revenue", 0.0), 2),
+            "orders": orders,
+            "avg_order_value": round(counters.get("revenue", 0.0) / orders, 2) if orders else 0.0
         })
 
-    # Generate daily revenue for last 30 days
+    # Daily revenue for the last 30 days
+    days = rollups.series("day", latest - 29 * DAY, latest + DAY)
     daily_revenue = []
     for i in range(30):
-        date = (datetime.now() - timedelta(days=29-i))
+        bucket = latest - (29 - i) * DAY
+        counters = days.get(bucket, {}).get("", {})
         daily_revenue.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "revenue": random.randint(8000, 15000),
-            "orders": random.randint(40, 80)
+            "date": _day_label(bucket),
+            "revenue": round(counters.get("revenue", 0.0), 2),
+            "orders": counters.get("purchase", 0)
         })
 
+    previous = rollups.totals("day", latest - 59 * DAY, latest - 29 * DAY, "all").get("", {})
+    current_brands = rollups.totals("day", latest - 29 * DAY, latest + DAY, "brand")
+    previous_brands = rollups.totals("day", latest - 59 * DAY, latest - 29 * DAY, "brand")
+    top_brands = sorted(current_brands.items(), key=lambda item: item[1].get("revenue", 0.0), reverse=True)[:4]
+    total_revenue = sum(d["revenue"] for d in daily_revenue)
+
     return {
         "monthly_revenue": monthly_data,
         "daily_revenue": daily_revenue,
-        "total_revenue_this_month": sum(d["revenue"] for d in daily_revenue),
+        "total_revenue_this_month": round(total_revenue, 2),
         "total_orders_this_month": sum(d["orders"] for d in daily_revenue),
-        "revenue_growth": 18.5,
+        "revenue_growth": _growth(total_revenue, previous.get("revenue", 0.0)),
         "top_products": [
-            {"name": "iPhone 15 Pro", "revenue": 456789, "units": 543, "growth": 23.4},
-            {"name": "Samsung Galaxy S24", "revenue": 234567, "units": 321, "growth": 12.1},
-            {"name": "MacBook Pro M3", "revenue": 345678, "units": 178, "growth": 45.6},
-            {"name": "AirPods Pro", "revenue": 123456, "units": 892, "growth": 8.9}
+            {
+                "name": brand,
+                "revenue": round(counters.get("revenue", 0.0), 2),
+                "units": counters.get("purchase", 0),
+                "growth": _growth(counters.get("revenue", 0.0),
+                                  previous_brands.get(brand, {}).get("revenue", 0.0))
+            }
+            for brand, counters in top_brands
         ],
         "revenue_by_channel": [
             {"channel": "Website", "revenue": 1234567, "percentage": 45.2},
             {"channel": "Mobile App", "revenue": 987654, "percentage": 36.1},
             {"channel": "Social Media", "revenue": 345678, "percentage": 12.6},
             {"channel": "Email Campaign", "revenue": 167890, "percentage": 6.1}
-        ]
-    }
\ No newline at end of file
+        ],
+        "source": source
+    }
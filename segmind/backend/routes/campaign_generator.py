@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import asyncio
 import json
 import random
-import requests
 import os
 import re
+import time
+
+from core.card_cache import card_cache, card_cache_key, BYPASS
+from core.llm_batching import card_batcher
+from core.llm_client import llm_client, cancel_on_disconnect, RequestAbandoned
+from core.utils.config import settings
 
 router = APIRouter(prefix="/api/campaign-generator", tags=["campaign-generator"])
 
@@ -64,8 +71,8 @@ class CampaignCardGenerator:
         # TEMP VARIABLE: Store API key temporarily for class usage
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
 
-    def generate_campaign_cards(self, product: Dict[str, Any], strategy: Dict[str, Any],
-                               weekly_schedule: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def generate_campaign_cards(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                                      weekly_schedule: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Generate campaign cards for a given product and strategy.
 
@@ -79,14 +86,148 @@ class CampaignCardGenerator:
         """
         if self.openai_api_key:
             try:
-                return self._generate_with_openai(product, strategy, weekly_schedule)
+                cards, _ = await self._generate_with_openai_batched(product, strategy, weekly_schedule)
+                return cards
             except Exception as e:
                 print(f"OpenAI generation failed: {e}")
 
         return self._generate_with_templates(product, strategy, weekly_schedule)
 
-    def _generate_with_openai(self, product: Dict[str, Any], strategy: Dict[str, Any],
-                             weekly_schedule: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def generate_campaign_cards_cached(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                                             weekly_schedule: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Generate campaign cards through the card cache.
+
+        Identical inputs (after normalization) are served from the cache, and
+        concurrent identical requests share one OpenAI call. Template output
+        is never cached, so a failed OpenAI call is retried next time.
+
+        Returns:
+            (campaign cards, cache status)
+        """
+        if not self.openai_api_key:
+            return self._generate_with_templates(product, strategy, weekly_schedule), BYPASS
+
+        async def produce():
+            try:
+                return await self._generate_with_openai_batched(product, strategy, weekly_schedule)
+            except Exception as e:
+                print(f"OpenAI generation failed: {e}")
+                return self._generate_with_templates(product, strategy, weekly_schedule), False
+
+        key = self._cache_key(product, strategy, weekly_schedule)
+        return await card_cache.get_or_generate(key, produce)
+
+    def _cache_key(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                   weekly_schedule: List[Dict[str, Any]]) -> str:
+        return card_cache_key(
+            product=product,
+            strategy=strategy,
+            weekly_schedule=weekly_schedule,
+            model=settings.llm_model,
+            temperature=0.7,
+            max_tokens=2000
+        )
+
+    async def stream_campaign_cards(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                                    weekly_schedule: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield cards as soon as each OpenAI batch completes.
+
+        Each event carries the card's index in the schedule, since batches
+        finish out of order, and its source: "openai", "cache", or "template"
+        when the batch failed (or returned too few cards) and that slot fell
+        back to the template generator. A complete OpenAI result is cached
+        like the non-streaming endpoint's.
+        """
+        if not self.openai_api_key:
+            for index, card in enumerate(self._generate_with_templates(product, strategy, weekly_schedule)):
+                yield {"index": index, "card": card, "source": "template"}
+            return
+
+        key = self._cache_key(product, strategy, weekly_schedule)
+        cached, _ = await card_cache.get(key)
+        if cached is not None:
+            for index, card in enumerate(cached):
+                yield {"index": index, "card": card, "source": "cache"}
+            return
+
+        deadline = time.monotonic() + settings.llm_deadline
+        tasks = [asyncio.create_task(self._run_batch(product, strategy, weekly_schedule, offset, size, deadline))
+                 for offset, size in self._batches(weekly_schedule)]
+        cards: List[Optional[Dict[str, Any]]] = [None] * len(weekly_schedule)
+        complete = True
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for i, card, source in self._batch_cards(product, strategy, weekly_schedule, *await next_done):
+                    cards[i] = card
+                    complete = complete and source == "openai"
+                    yield {"index": i, "card": card, "source": source}
+        finally:
+            # Client went away (or the consumer stopped early): drop outstanding calls
+            for task in tasks:
+                task.cancel()
+
+        if complete:
+            await card_cache.put(key, cards)
+
+    async def _generate_with_openai_batched(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                                            weekly_schedule: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Generate cards a few schedule slots per call, with all calls in flight at once.
+
+        The calls share one deadline. Slots of a batch that failed fall back to
+        the template generator, like the streaming endpoint's; the other batches
+        are kept. Cancelling this (e.g. cancel_on_disconnect) cancels every call.
+
+        Returns:
+            (campaign cards, whether every card came from OpenAI)
+        """
+        deadline = time.monotonic() + settings.llm_deadline
+        results = await asyncio.gather(*[
+            self._run_batch(product, strategy, weekly_schedule, offset, size, deadline)
+            for offset, size in self._batches(weekly_schedule)
+        ])
+        cards: List[Optional[Dict[str, Any]]] = [None] * len(weekly_schedule)
+        complete = True
+        for result in results:
+            for i, card, source in self._batch_cards(product, strategy, weekly_schedule, *result):
+                cards[i] = card
+                complete = complete and source == "openai"
+        return cards, complete
+
+    async def _run_batch(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                         weekly_schedule: List[Dict[str, Any]], offset: int, size: int, deadline: float):
+        """(offset, size, generated cards, error) for one OpenAI call over a slice of the schedule"""
+        batch = weekly_schedule[offset:offset + size]
+        try:
+            return offset, size, await self._generate_with_openai(product, strategy, batch, deadline), None
+        except Exception as e:
+            return offset, size, [], e
+
+    def _batch_cards(self, product: Dict[str, Any], strategy: Dict[str, Any], weekly_schedule: List[Dict[str, Any]],
+                     offset: int, size: int, generated: List[Any], error: Optional[Exception]):
+        """(index, card, source) per slot of a finished batch, using templates for slots it didn't fill"""
+        if error is not None:
+            print(f"OpenAI generation failed for cards {offset}-{offset + size - 1}: {error}")
+        for i in range(offset, min(offset + size, len(weekly_schedule))):
+            if i - offset < len(generated) and isinstance(generated[i - offset], dict):
+                yield i, generated[i - offset], "openai"
+            else:
+                card = self._generate_with_templates(product, strategy, [weekly_schedule[i]])[0]
+                card['id'] = f"card_{int(datetime.now().timestamp())}_{i}"
+                yield i, card, "template"
+
+    def _batches(self, weekly_schedule: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        """(offset, size) of each OpenAI call, sized by the adaptive batcher"""
+        batches, offset = [], 0
+        for size in card_batcher.plan(len(weekly_schedule), max_tokens=2000):
+            batches.append((offset, size))
+            offset += size
+        return batches
+
+    async def _generate_with_openai(self, product: Dict[str, Any], strategy: Dict[str, Any],
+                                    weekly_schedule: List[Dict[str, Any]],
+                                    deadline: Optional[float] = None) -> List[Dict[str, Any]]:
         """Generate campaign cards using OpenAI API."""
 
         # TEMP VARIABLE: Build schedule text for API prompt
@@ -95,19 +236,11 @@ class CampaignCardGenerator:
             for s in weekly_schedule
         ])
 
-        # TEMP VARIABLE: Prepare API request headers
-        headers = {
-            'Authorization': f'Bearer {self.openai_api_key}',
-            'Content-Type': 'application/json',
-        }
-
-        # TEMP VARIABLE: Build API request payload
-        payload = {
-            'model': 'gpt-4',
-            'messages': [
-                {
-                    'role': 'system',
-                    'content': '''You are a marketing campaign generator. Create email campaign cards based on the provided strategy.
+        # TEMP VARIABLE: Build chat messages for the API request
+        messages = [
+            {
+                'role': 'system',
+                'content': '''You are a marketing campaign generator. Create email campaign cards based on the provided strategy.
 Return a JSON array of campaign objects with the following structure:
 {
   "id": "unique_id",
@@ -129,10 +262,10 @@ IMPORTANT: The imagePrompt should be a detailed description that reflects the ca
 - If it's about "running" or sports, include a person engaged in that activity with the product
 - If it's a discount campaign, show the product with price tags or sale badges
 - Make the image prompt contextual and specific to each campaign's unique message'''
-                },
-                {
-                    'role': 'user',
-                    'content': f'''Generate campaign cards for:
+            },
+            {
+                'role': 'user',
+                'content': f'''Generate campaign cards for:
 Product: {product.get('name', 'Unknown Product')}
 Primary Audience: {strategy.get('primaryAudience', 'General audience')}
 
@@ -149,34 +282,26 @@ CRITICAL INSTRUCTIONS:
 5. If user mentions a specific discount or offer, EVERY campaign should include that offer
 
 Remember: Window shoppers respond to deals, discounts, and urgency - not generic product descriptions!'''
-                }
-            ],
-            'temperature': 0.7,
-            'max_tokens': 2000,
-        }
+            }
+        ]
 
         # TEMP VARIABLE: Store API response
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers=headers,
-            json=payload,
-            timeout=30
+        completion = await llm_client.complete(
+            messages,
+            api_key=self.openai_api_key,
+            temperature=0.7,
+            max_tokens=2000,
+            deadline=deadline
         )
 
-        if not response.ok:
-            raise Exception(f"OpenAI API request failed: {response.status_code}")
-
-        # TEMP VARIABLE: Parse response data
-        ai_data = response.json()
-        # TEMP VARIABLE: Extract generated content from AI response
-        generated_content = ai_data['choices'][0]['message']['content']
-
         try:
             # TEMP VARIABLE: Parse JSON from AI response
-            campaign_cards = json.loads(generated_content)
-            return campaign_cards
+            campaign_cards = json.loads(completion.content)
         except json.JSONDecodeError:
             raise Exception("Failed to parse JSON from AI response")
+        card_batcher.observe(len(campaign_cards), completion.latency, completion.completion_tokens,
+                             completion.prompt_tokens)
+        return campaign_cards
 
     def _generate_with_templates(self, product: Dict[str, Any], strategy: Dict[str, Any],
                                 weekly_schedule: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -520,7 +645,7 @@ The Segmind Team"""
 
 
 @router.post("/generate-cards")
-def generate_campaign_cards(request: CampaignCardsRequest):
+async def generate_campaign_cards(request: CampaignCardsRequest, http_request: Request):
     """Generate email campaign cards using our Python generator"""
     try:
         # TEMP VARIABLE: Initialize the generator
@@ -531,28 +656,56 @@ def generate_campaign_cards(request: CampaignCardsRequest):
         strategy_dict = request.strategy.dict()
         schedule_list = [schedule.dict() for schedule in request.weeklySchedule]
 
-        # TEMP VARIABLE: Generate campaign cards
-        cards = generator.generate_campaign_cards(
+        # TEMP VARIABLE: Generate campaign cards, abandoning the LLM calls if the client disconnects
+        cards, cache_status = await cancel_on_disconnect(http_request, generator.generate_campaign_cards_cached(
             product=product_dict,
             strategy=strategy_dict,
             weekly_schedule=schedule_list
-        )
+        ))
 
         return {
             "success": True,
             "cards": cards,
             "generated_at": datetime.now().isoformat(),
-            "total_cards": len(cards)
+            "total_cards": len(cards),
+            "cache_status": cache_status
         }
 
+    except RequestAbandoned:
+        return Response(status_code=499)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate campaign cards: {str(e)}"
         )
 
+@router.post("/generate-cards/stream")
+async def stream_campaign_cards(request: CampaignCardsRequest, http_request: Request, format: Optional[str] = None):
+    """Stream campaign cards as they are generated, as NDJSON or (Accept: text/event-stream) SSE.
+
+    Every card event has {"index", "card", "source"}; a final {"done": true, "total_cards"} event ends the stream.
+    """
+    sse = format == "sse" or (format is None and "text/event-stream" in http_request.headers.get("accept", ""))
+    generator = CampaignCardGenerator()
+    events = generator.stream_campaign_cards(
+        product=request.product.dict(),
+        strategy=request.strategy.dict(),
+        weekly_schedule=[schedule.dict() for schedule in request.weeklySchedule]
+    )
+
+    async def body():
+        total = 0
+        async for event in events:
+            total += 1
+            yield f"event: card\ndata: {json.dumps(event)}\n\n" if sse else json.dumps(event) + "\n"
+        done = {"done": True, "total_cards": total, "generated_at": datetime.now().isoformat()}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n" if sse else json.dumps(done) + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 @router.post("/process-cards")
-def process_campaign_cards(request: ProcessCardsRequest):
+async def process_campaign_cards(request: ProcessCardsRequest, http_request: Request):
     """Process campaign cards sent from UI and enhance them with AI"""
     try:
         # TEMP VARIABLE: Initialize the generator with OpenAI support
@@ -575,11 +728,11 @@ def process_campaign_cards(request: ProcessCardsRequest):
             weekly_schedule.append(schedule_item)
 
         # TEMP VARIABLE: Use the main generator method that includes OpenAI integration
-        enhanced_cards = generator.generate_campaign_cards(
+        enhanced_cards, cache_status = await cancel_on_disconnect(http_request, generator.generate_campaign_cards_cached(
             product=product_dict,
             strategy=strategy_dict,
             weekly_schedule=weekly_schedule
-        )
+        ))
 
         # TEMP VARIABLE: Map the generated cards back to the original card IDs
         processed_cards = []
@@ -614,17 +767,30 @@ def process_campaign_cards(request: ProcessCardsRequest):
             "cards": processed_cards,
             "processed_at": datetime.now().isoformat(),
             "total_cards": len(processed_cards),
-            "ai_generated": True
+            "ai_generated": True,
+            "cache_status": cache_status
         }
 
+    except RequestAbandoned:
+        return Response(status_code=499)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process campaign cards: {str(e)}"
         )
 
+@router.get("/cache/stats")
+async def get_card_cache_stats():
+    """Hit/miss counters for the generated card cache"""
+    return card_cache.stats()
+
+@router.get("/batching/metrics")
+async def get_batching_metrics():
+    """Current latency/token model, last batching decision and LLM concurrency budget"""
+    return card_batcher.metrics()
+
 @router.get("/test")
-def test_generator():
+async def test_generator():
     """Test endpoint to verify the campaign generator works"""
     # TEMP VARIABLE: Test product data
     test_product = {
@@ -654,7 +820,7 @@ def test_generator():
 
     # TEMP VARIABLE: Initialize generator and generate test cards
     generator = CampaignCardGenerator()
-    cards = generator.generate_campaign_cards(test_product, test_strategy, test_schedule)
+    cards = await generator.generate_campaign_cards(test_product, test_strategy, test_schedule)
 
     return {
         "success": True,
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, date
 
+from core.campaign_repository import campaign_repository, local_time
+from core.campaign_scheduler import campaign_scheduler
+from core.dispatcher import dispatcher
+from core.utils.schemas import Campaign, MessageChannel
+from routes.messaging import require_variables, send_campaign as dispatch_campaign
+from routes.segments import find_segment
+
 router = APIRouter(prefix="/api/campaigns", tags=["campaigns"])
 
 class CampaignCreate(BaseModel):
     name: str
-    type: str  # 'email', 'sms', 'whatsapp'
+    type: MessageChannel  # 'email', 'sms', 'whatsapp', 'push'
     segment_id: str
     product_id: Optional[str] = None
     content: str
     subject: Optional[str] = None
     scheduled_at: Optional[datetime] = None
     template_id: Optional[str] = None
+    variables: Dict[str, Any] = {}
 
 class CampaignUpdate(BaseModel):
     name: Optional[str] = None
@@ -21,172 +29,156 @@ class CampaignUpdate(BaseModel):
     subject: Optional[str] = None
     scheduled_at: Optional[datetime] = None
     status: Optional[str] = None
+    variables: Optional[Dict[str, Any]] = None
 
-@router.get("/")
-def get_campaigns():
-    """Returns list of all campaigns"""
-    return [
-        {
-            "id": "camp_001",
-            "name": "High Converters Email Blast",
-            "type": "email",
-            "segment": "High Converters",
-            "product": "iPhone 15 Pro",
-            "status": "scheduled",
-            "scheduled_at": "2025-10-26T10:00:00Z",
-            "created_at": "2025-10-25T14:30:00Z",
-            "metrics": {
-                "sent": 0,
-                "delivered": 0,
-                "opened": 0,
-                "clicked": 0
-            }
-        },
-        {
-            "id": "camp_002",
-            "name": "Window Shoppers SMS",
-            "type": "sms",
-            "segment": "Window Shoppers",
-            "product": "AirPods Pro",
-            "status": "scheduled",
-            "scheduled_at": "2025-10-27T14:30:00Z",
-            "created_at": "2025-10-25T15:15:00Z",
-            "metrics": {
-                "sent": 0,
-                "delivered": 0,
-                "opened": 0,
-                "clicked": 0
-            }
-        },
-        {
-            "id": "camp_003",
-            "name": "Loyal Customers WhatsApp",
-            "type": "whatsapp",
-            "segment": "Loyal Customers",
-            "product": "Samsung Galaxy S24",
-            "status": "scheduled",
-            "scheduled_at": "2025-10-28T09:00:00Z",
-            "created_at": "2025-10-25T16:45:00Z",
-            "metrics": {
-                "sent": 0,
-                "delivered": 0,
-                "opened": 0,
-                "clicked": 0
-            }
+def _campaign_view(campaign: Campaign):
+    segment = find_segment(campaign.segment_id)
+    return {
+        "id": campaign.id,
+        "name": campaign.name,
+        "type": campaign.channel,
+        "segment_id": campaign.segment_id,
+        "segment": segment["name"] if segment else campaign.segment_id,
+        "product_id": campaign.product_id,
+        "template_id": campaign.template_id,
+        "content": campaign.content,
+        "subject": campaign.subject,
+        "variables": campaign.variables,
+        "status": campaign.status,
+        "scheduled_at": campaign.scheduled_at,
+        "created_at": campaign.created_at,
+        "updated_at": campaign.updated_at,
+        "metrics": {
+            "sent": campaign.sent_count,
+            "delivered": campaign.delivered_count,
+            "opened": campaign.opened_count,
+            "clicked": campaign.clicked_count
         }
-    ]
+    }
+
+@router.get("/")
+def get_campaigns(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Returns campaigns, newest first; pass X-Next-Cursor back as cursor for the next page"""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    campaigns, next_cursor = campaign_repository.page(limit, cursor, status)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_campaign_view(c) for c in campaigns]
 
 @router.post("/")
 def create_campaign(campaign: CampaignCreate):
     """Creates a new campaign"""
-    # In real implementation, this would save to database
-    campaign_id = f"camp_{len(str(datetime.now().timestamp()).replace('.', ''))}"
-
+    require_variables(campaign.content, campaign.subject, campaign.variables)
+    created = campaign_repository.create(
+        name=campaign.name,
+        channel=campaign.type,
+        segment_id=campaign.segment_id,
+        product_id=campaign.product_id,
+        content=campaign.content,
+        subject=campaign.subject,
+        scheduled_at=campaign.scheduled_at,
+        template_id=campaign.template_id,
+        variables=campaign.variables
+    )
+    campaign_scheduler.sync(created)
     return {
-        "id": campaign_id,
+        "id": created.id,
         "message": "Campaign created successfully",
-        "campaign": {
-            "id": campaign_id,
-            "name": campaign.name,
-            "type": campaign.type,
-            "segment_id": campaign.segment_id,
-            "product_id": campaign.product_id,
-            "content": campaign.content,
-            "subject": campaign.subject,
-            "scheduled_at": campaign.scheduled_at,
-            "template_id": campaign.template_id,
-            "status": "draft",
-            "created_at": datetime.now().isoformat()
-        }
+        "campaign": _campaign_view(created)
     }
 
 @router.get("/{campaign_id}")
 def get_campaign(campaign_id: str):
     """Returns details of a specific campaign"""
-    # Mock data - in real implementation, query database
-    return {
-        "id": campaign_id,
-        "name": "High Converters Email Blast",
-        "type": "email",
-        "segment": "High Converters",
-        "product": "iPhone 15 Pro",
-        "content": "🎯 Personalized Campaign for High Converters...",
-        "subject": "Exclusive iPhone 15 Pro Offer Just for You!",
-        "status": "scheduled",
-        "scheduled_at": "2025-10-26T10:00:00Z",
-        "created_at": "2025-10-25T14:30:00Z",
-        "metrics": {
-            "sent": 0,
-            "delivered": 0,
-            "opened": 0,
-            "clicked": 0,
-            "conversion_rate": 0.0,
-            "revenue": 0.0
-        }
-    }
+    campaign = campaign_repository.get(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return _campaign_view(campaign)
 
 @router.put("/{campaign_id}")
 def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
     """Updates a campaign"""
-    # In real implementation, this would update the database
+    fields = campaign_update.dict(exclude_unset=True)
+    existing = campaign_repository.get(campaign_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if fields.get("variables") is None:
+        fields.pop("variables", None)
+    require_variables(fields.get("content", existing.content), fields.get("subject", existing.subject),
+                      fields.get("variables", existing.variables))
+    if "scheduled_at" in fields and "status" not in fields and not dispatcher.is_running(campaign_id):
+        # Like create: a future schedule makes a draft scheduled, clearing it makes it a draft again
+        scheduled_at = local_time(fields["scheduled_at"])
+        if existing.status == "draft" and scheduled_at is not None and scheduled_at > datetime.now():
+            fields["status"] = "scheduled"
+        elif existing.status == "scheduled" and scheduled_at is None:
+            fields["status"] = "draft"
+    if fields:
+        campaign_scheduler.sync(campaign_repository.update(campaign_id, **fields))
     return {
         "id": campaign_id,
         "message": "Campaign updated successfully",
-        "updated_fields": campaign_update.dict(exclude_unset=True)
+        "updated_fields": fields
     }
 
 @router.delete("/{campaign_id}")
 def delete_campaign(campaign_id: str):
     """Deletes a campaign"""
-    # In real implementation, this would delete from database
+    if dispatcher.is_running(campaign_id):
+        raise HTTPException(status_code=409, detail="Campaign is sending")
+    if not campaign_repository.delete(campaign_id):
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    campaign_scheduler.sync(None, campaign_id)
     return {
         "message": f"Campaign {campaign_id} deleted successfully"
     }
 
+@router.get("/scheduler/stats")
+def get_scheduler_stats():
+    """Returns pending and fired counts for the campaign scheduler"""
+    return campaign_scheduler.stats()
+
 @router.get("/calendar/{year}/{month}")
 def get_campaign_calendar(year: int, month: int):
     """Returns campaigns scheduled for a specific month"""
-    # Mock data for calendar view
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=422, detail="Month must be between 1 and 12")
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    campaigns = []
+    for campaign in campaign_repository.scheduled_between(start, end):
+        segment = find_segment(campaign.segment_id)
+        campaigns.append({
+            "id": campaign.id,
+            "name": campaign.name,
+            "type": campaign.channel,
+            "date": campaign.scheduled_at.strftime("%Y-%m-%d"),
+            "time": campaign.scheduled_at.strftime("%H:%M"),
+            "status": campaign.status,
+            "segment": segment["name"] if segment else campaign.segment_id
+        })
     return {
         "year": year,
         "month": month,
-        "campaigns": [
-            {
-                "id": "camp_001",
-                "name": "High Converters Email",
-                "type": "email",
-                "date": f"{year}-{month:02d}-26",
-                "time": "10:00",
-                "segment": "High Converters"
-            },
-            {
-                "id": "camp_002",
-                "name": "Window Shoppers SMS",
-                "type": "sms",
-                "date": f"{year}-{month:02d}-27",
-                "time": "14:30",
-                "segment": "Window Shoppers"
-            },
-            {
-                "id": "camp_003",
-                "name": "Loyal Customers WhatsApp",
-                "type": "whatsapp",
-                "date": f"{year}-{month:02d}-28",
-                "time": "09:00",
-                "segment": "Loyal Customers"
-            }
-        ]
+        "campaigns": campaigns
     }
 
 @router.post("/{campaign_id}/send")
-def send_campaign(campaign_id: str):
+async def send_campaign(campaign_id: str):
     """Sends a campaign immediately"""
-    # In real implementation, this would trigger the messaging service
+    result = await dispatch_campaign(campaign_id)
     return {
         "id": campaign_id,
-        "message": "Campaign sent successfully",
+        "message": "Campaign sending started",
         "sent_at": datetime.now().isoformat(),
-        "status": "sent"
+        "status": result["campaign_status"],
+        "estimated_recipients": result["estimated_recipients"]
     }
 
 @router.post("/generate")
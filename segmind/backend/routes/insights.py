@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 
+from core.cache import cached
+
 router = APIRouter(prefix="/api/insights", tags=["insights"])
 
 @router.get("/product-segment-correlations")
+@cached()
 def get_product_segment_insights():
     """Returns AI-powered product-segment affinity insights"""
     return [
@@ -64,6 +67,7 @@ def get_product_segment_insights():
     ]
 
 @router.get("/segment-performance/{segment_id}")
+@cached()
 def get_segment_performance(segment_id: str):
     """Returns detailed performance metrics for a specific segment"""
     # Mock data - in real implementation, this would query the database
@@ -1,13 +1,29 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter, ValidationError
+from typing import List, Optional
+import asyncio
+import json
 import uuid
 from datetime import datetime, timedelta
 
-from core.utils.schemas import Message, Campaign, SendMessageRequest, CreateCampaignRequest, MessageChannel
+from core.campaign_repository import campaign_repository
+from core.campaign_scheduler import campaign_scheduler
+from core.dispatcher import dispatcher, unresolved_variables
+from core.rate_limiter import send_scheduler
+from core.message_store import message_store
+from core.outbox import outbox
+from core.receipts import receipt_coalescer, MILESTONES, FAILURE_STATUSES
+from core.segment_engine import segment_engine, SegmentStoreUnavailable
+from core.utils.config import settings
+from core.utils.schemas import Message, Campaign, SendMessageRequest, CreateCampaignRequest, MessageChannel, StatusCallback
+from routes.segments import find_segment
 
-router = APIRouter()
+router = APIRouter(prefix="/api/messaging", tags=["messaging"])
 
-# Mock data
+# Handlers that only touch the SQLite stores are plain `def`, so FastAPI runs
+# them in its threadpool; async handlers move store calls off the loop with to_thread
+
+# Demo data, written to the message store the first time it is empty
 MOCK_MESSAGES = [
     Message(
         id="msg_1",
@@ -50,6 +66,7 @@ MOCK_CAMPAIGNS = [
         segment_id="seg_3",
         channel=MessageChannel.SMS,
         content="Don't forget your {{product_name}}! Complete purchase and save {{discount}}%",
+        variables={"product_name": "Samsung Galaxy S24", "discount": 10},
         status="active",
         sent_count=1247,
         delivered_count=1198,
@@ -86,85 +103,278 @@ MOCK_CAMPAIGNS = [
     )
 ]
 
+message_store.seed(MOCK_MESSAGES, MOCK_CAMPAIGNS)
+
 @router.post("/send", response_model=Message)
-async def send_message(request: SendMessageRequest):
-    """Send a single message"""
+def send_message(request: SendMessageRequest, idempotency_key: Optional[str] = Header(None)):
+    """Queue a single message for delivery; retries with the same Idempotency-Key return the original"""
     new_message = Message(
         id=f"msg_{uuid.uuid4().hex[:8]}",
         customer_id=request.customer_id,
         channel=request.channel,
         content=request.content,
         subject=request.subject,
-        status="sent",
-        sent_at=datetime.now()
+        status="queued"
     )
 
-    MOCK_MESSAGES.append(new_message)
-    return new_message
+    return outbox.enqueue(new_message, request.sender, idempotency_key or request.idempotency_key)
+
+_BULK_ADAPTER = TypeAdapter(List[SendMessageRequest])
+_ITEM_ADAPTER = TypeAdapter(SendMessageRequest)
+
+def _too_many_items():
+    return HTTPException(status_code=413, detail=f"At most {settings.bulk_send_max_items} messages per request")
+
+async def _bulk_body(request: Request) -> bytes:
+    """Request body, refused with 413 as soon as it passes bulk_send_max_bytes"""
+    limit = settings.bulk_send_max_bytes
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise too_large
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _bulk_json(body: bytes, content_type: str) -> bytes:
+    """Bulk body as one JSON array; NDJSON lines are counted, then joined into an array"""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        lines = [line for line in body.splitlines() if line.strip()]
+        if len(lines) > settings.bulk_send_max_items:
+            raise _too_many_items()
+        return b"[" + b",".join(lines) + b"]"
+    return body
+
+@router.post("/send/bulk")
+async def send_bulk(request: Request):
+    """Queue many messages in one transaction (JSON array or NDJSON); returns a result per item"""
+    raw = _bulk_json(await _bulk_body(request), request.headers.get("content-type", ""))
+
+    # Validate the whole batch in one pass; only if that fails, find the bad items
+    errors = {}
+    try:
+        items = list(enumerate(_BULK_ADAPTER.validate_json(raw)))
+    except ValidationError as e:
+        for error in e.errors(include_url=False):
+            loc = error["loc"]
+            if not loc or not isinstance(loc[0], int):
+                raise HTTPException(status_code=400, detail=f"Body must be a JSON array or NDJSON: {error['msg']}")
+            errors.setdefault(loc[0], []).append({"loc": list(loc[1:]), "msg": error["msg"]})
+        items = [(i, _ITEM_ADAPTER.validate_python(item)) for i, item in enumerate(json.loads(raw)) if i not in errors]
+
+    # JSON arrays are only bounded by bytes until they are parsed
+    if len(items) + len(errors) > settings.bulk_send_max_items:
+        raise _too_many_items()
+
+    messages = [
+        Message(
+            id=f"msg_{uuid.uuid4().hex[:8]}",
+            customer_id=item.customer_id,
+            channel=item.channel,
+            content=item.content,
+            subject=item.subject,
+            status="queued"
+        )
+        for _, item in items
+    ]
+    owners = await asyncio.to_thread(outbox.enqueue_many, [
+        (message, item.sender, item.idempotency_key) for message, (_, item) in zip(messages, items)
+    ])
+
+    results = [{"index": i, "status": "rejected", "errors": item_errors} for i, item_errors in errors.items()]
+    for (i, _), message, owner in zip(items, messages, owners):
+        if owner:
+            results.append({"index": i, "id": owner, "status": "duplicate"})
+        else:
+            results.append({"index": i, "id": message.id, "status": "queued"})
+    results.sort(key=lambda r: r["index"])
+
+    queued = sum(1 for r in results if r["status"] == "queued")
+    return {
+        "queued": queued,
+        "duplicates": len(items) - queued,
+        "rejected": len(errors),
+        "results": results
+    }
+
+@router.get("/outbox/stats")
+def get_outbox_stats():
+    """Get outbox entry counts by status"""
+    return outbox.stats()
+
+@router.get("/outbox/dead-letters")
+def get_dead_letters(limit: int = Query(100, ge=1, le=1000)):
+    """Get messages that exhausted their delivery attempts"""
+    return outbox.dead_letters(limit)
+
+@router.post("/outbox/dead-letters/{message_id}/requeue")
+def requeue_dead_letter(message_id: str):
+    """Queue a dead-lettered message for delivery again"""
+    if not outbox.requeue(message_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered message not found")
+    return {"status": "queued", "message_id": message_id}
+
+_CALLBACKS_ADAPTER = TypeAdapter(List[StatusCallback])
+_CALLBACK_STATUSES = set(MILESTONES) | FAILURE_STATUSES
+
+@router.post("/webhooks/status", status_code=202)
+async def receive_status_callbacks(request: Request):
+    """Accept provider delivery receipts (one object, a JSON array or NDJSON); applied in batches"""
+    raw = _bulk_json(await request.body(), request.headers.get("content-type", ""))
+    if raw.lstrip().startswith(b"{"):
+        raw = b"[" + raw + b"]"
+    try:
+        callbacks = _CALLBACKS_ADAPTER.validate_json(raw)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+    ignored = 0
+    for callback in callbacks:
+        status = callback.status.lower()
+        if status not in _CALLBACK_STATUSES:
+            # Providers also report intermediate states (queued, sending); nothing to record
+            ignored += 1
+            continue
+        receipt_coalescer.add(callback.message_id, status, callback.timestamp)
+    return {"accepted": len(callbacks) - ignored, "ignored": ignored}
+
+@router.get("/webhooks/stats")
+async def get_webhook_stats():
+    """Get delivery receipt ingestion counters"""
+    return receipt_coalescer.stats()
 
 @router.get("/messages", response_model=List[Message])
-async def get_messages(limit: int = 50):
-    """Get recent messages"""
-    return MOCK_MESSAGES[-limit:]
+def get_messages(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Get recent messages, newest first; pass X-Next-Cursor back as cursor for the next page"""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    messages, next_cursor = message_store.list_messages(limit, cursor, customer_id, status)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return messages
 
 @router.get("/messages/{message_id}", response_model=Message)
-async def get_message(message_id: str):
+def get_message(message_id: str):
     """Get a specific message"""
-    message = next((m for m in MOCK_MESSAGES if m.id == message_id), None)
+    message = message_store.get_message(message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     return message
 
+def require_variables(content: str, subject: Optional[str], variables: dict):
+    """Reject campaign content whose placeholders would be sent unfilled"""
+    missing = unresolved_variables(content, subject, variables)
+    if missing:
+        raise HTTPException(status_code=422,
+                            detail=f"No value for template variables: {', '.join(missing)}; add them to variables")
+
 @router.post("/campaigns", response_model=Campaign)
-async def create_campaign(request: CreateCampaignRequest):
+def create_campaign(request: CreateCampaignRequest):
     """Create a new campaign"""
-    new_campaign = Campaign(
-        id=f"camp_{uuid.uuid4().hex[:8]}",
+    require_variables(request.content, request.subject, request.variables)
+    campaign = campaign_repository.create(
         name=request.name,
         segment_id=request.segment_id,
         channel=request.channel,
         content=request.content,
         subject=request.subject,
-        status="draft",
-        sent_count=0,
-        delivered_count=0,
-        opened_count=0,
-        clicked_count=0,
-        created_at=datetime.now(),
-        scheduled_at=request.scheduled_at
+        sender=request.sender,
+        scheduled_at=request.scheduled_at,
+        variables=request.variables
     )
-
-    MOCK_CAMPAIGNS.append(new_campaign)
-    return new_campaign
+    campaign_scheduler.sync(campaign)
+    return campaign
 
 @router.get("/campaigns", response_model=List[Campaign])
-async def get_campaigns():
-    """Get all campaigns"""
-    return MOCK_CAMPAIGNS
+def get_campaigns(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Get campaigns, newest first; pass X-Next-Cursor back as cursor for the next page"""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    campaigns, next_cursor = campaign_repository.page(limit, cursor, status)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return campaigns
 
 @router.get("/campaigns/{campaign_id}", response_model=Campaign)
-async def get_campaign(campaign_id: str):
+def get_campaign(campaign_id: str):
     """Get a specific campaign"""
-    campaign = next((c for c in MOCK_CAMPAIGNS if c.id == campaign_id), None)
+    campaign = message_store.get_campaign(campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     return campaign
 
+# Campaigns between the running check and dispatcher.start, which await store calls in between
+_starting = set()
+
 @router.post("/campaigns/{campaign_id}/send")
 async def send_campaign(campaign_id: str):
     """Send a campaign to all customers in the segment"""
-    campaign = next((c for c in MOCK_CAMPAIGNS if c.id == campaign_id), None)
+    campaign = await asyncio.to_thread(message_store.get_campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
+    if dispatcher.is_running(campaign_id) or campaign_id in _starting:
+        raise HTTPException(status_code=409, detail="Campaign is already sending")
+    require_variables(campaign.content, campaign.subject, campaign.variables)
+    segment = find_segment(campaign.segment_id)
+    if not segment:
+        raise HTTPException(status_code=422, detail=f"Unknown segment: {campaign.segment_id}")
 
-    # Simulate sending
-    campaign.status = "sending"
-    campaign.sent_count = 1000  # Mock count
+    _starting.add(campaign_id)
+    try:
+        try:
+            estimated = await asyncio.to_thread(segment_engine.count, segment["criteria"])
+        except SegmentStoreUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        await asyncio.to_thread(message_store.update_campaign, campaign_id, status="sending",
+                                total_recipients=0, sent_count=0, failed_count=0)
+        recipients = segment_engine.iter_members(segment["criteria"], settings.dispatch_batch_size)
+        dispatcher.start(campaign, recipients)
+    finally:
+        _starting.discard(campaign_id)
 
     return {
         "status": "success",
         "campaign_id": campaign_id,
-        "estimated_recipients": 1000
+        "campaign_status": "sending",
+        "estimated_recipients": estimated
+    }
+
+@router.get("/metrics/rate-limits")
+async def get_rate_limit_metrics():
+    """Get queue depth and wait times per (channel, sender) send lane"""
+    return send_scheduler.metrics()
+
+@router.get("/campaigns/{campaign_id}/progress")
+def get_campaign_progress(campaign_id: str):
+    """Get live fan-out counters for a campaign"""
+    progress = dispatcher.progress.get(campaign_id)
+    if progress:
+        return progress.as_dict()
+    campaign = message_store.get_campaign(campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return {
+        "campaign_id": campaign_id,
+        "total_recipients": campaign.total_recipients,
+        "sent": campaign.sent_count,
+        "failed": campaign.failed_count,
+        "running": False
     }
 
 @router.get("/automations/cart-recovery")
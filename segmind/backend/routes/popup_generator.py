@@ -8,10 +8,13 @@ import base64
 from datetime import datetime
 from PIL import Image
 from io import BytesIO
-import threading
+import asyncio
 import logging
 from pathlib import Path
 
+from core.executors import worker_pools
+from core.utils.config import settings
+
 # Only import if Gemini is available
 try:
     from google import genai
@@ -43,20 +46,6 @@ class PopupGenerationRequest(BaseModel):
     aspect_ratio: str  # "square", "vertical", "horizontal"
     color_scheme: Optional[str] = "auto"  # "vibrant", "pastel", "monochrome", "auto"
 
-class ReturnThread(threading.Thread):
-    """Thread that returns a value from target function"""
-    def __init__(self, target, args=()):
-        super().__init__(target=target, args=args)
-        self._return = None
-
-    def run(self):
-        if self._target is not None:
-            self._return = self._target(*self._args)
-
-    def join(self):
-        super().join()
-        return self._return
-
 def crop_to_aspect_ratio(image: Image.Image, aspect_ratio: str) -> Image.Image:
     """Crop image to specified aspect ratio"""
     width, height = image.size
@@ -112,6 +101,31 @@ def generate_popup_with_gemini(client, prompt: str, product_image: Image.Image,
         logger.error(f"Gemini generation error: {e}")
         raise
 
+def process_generated_image(data: bytes, request: PopupGenerationRequest, index: int) -> dict:
+    """Crop a generated image, save it and encode it for the frontend"""
+    image = Image.open(BytesIO(data))
+
+    # Crop image based on aspect ratio
+    image = crop_to_aspect_ratio(image, request.aspect_ratio)
+
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{request.product_name.replace(' ', '_')}_{request.campaign_type}_{timestamp}_{index}.png"
+    save_path = GENERATED_DIR / filename
+
+    image.save(save_path)
+
+    # Convert to base64 for frontend
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    img_base64 = base64.b64encode(buffered.getvalue()).decode()
+
+    return {
+        "filename": filename,
+        "base64": f"data:image/png;base64,{img_base64}",
+        "path": str(save_path)
+    }
+
 def create_intelligent_prompt(request: PopupGenerationRequest) -> str:
     """Create a proven prompt that generates high-quality ads"""
 
@@ -208,40 +222,19 @@ async def generate_popup_ad(request: PopupGenerationRequest):
         else:
             logger.info(f"Successfully loaded example ad")
 
-        # Generate the popup ad
-        response = generate_popup_with_gemini(client, prompt, product_image, example_ad)
+        # Generate the popup ad (a blocking SDK call, so off the event loop)
+        response = await worker_pools.io.run(generate_popup_with_gemini, client, prompt, product_image, example_ad)
 
         # Process the response
-        generated_images = []
-        for i, part in enumerate(response.candidates[0].content.parts):
-            if part.inline_data is not None:
-                # Save the generated image
-                image = Image.open(BytesIO(part.inline_data.data))
-
-                # Crop image based on aspect ratio
-                image = crop_to_aspect_ratio(image, request.aspect_ratio)
-
-                # Create filename with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{request.product_name.replace(' ', '_')}_{request.campaign_type}_{timestamp}_{i}.png"
-                save_path = GENERATED_DIR / filename
-
-                image.save(save_path)
-
-                # Convert to base64 for frontend
-                buffered = BytesIO()
-                image.save(buffered, format="PNG")
-                img_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-                generated_images.append({
-                    "filename": filename,
-                    "base64": f"data:image/png;base64,{img_base64}",
-                    "path": str(save_path)
-                })
+        generated_images = await asyncio.gather(*[
+            worker_pools.cpu.run(process_generated_image, part.inline_data.data, request, i)
+            for i, part in enumerate(response.candidates[0].content.parts)
+            if part.inline_data is not None
+        ])
 
         return {
             "success": True,
-            "generated_images": generated_images,
+            "generated_images": list(generated_images),
             "prompt_used": prompt,
             "campaign_type": request.campaign_type,
             "product": request.product_name
@@ -267,8 +260,12 @@ async def generate_popup_batch(
 ):
     """Generate multiple popup variations in batch"""
 
-    results = []
-    campaign_list = campaign_types.split(",")
+    campaign_list = [campaign_type.strip() for campaign_type in campaign_types.split(",") if campaign_type.strip()]
+    if not campaign_list:
+        raise HTTPException(status_code=422, detail="No campaign types given")
+    if len(campaign_list) > settings.popup_batch_max_types:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {settings.popup_batch_max_types} campaign types per batch")
 
     # Save uploaded product images
     saved_images = []
@@ -280,22 +277,24 @@ async def generate_popup_batch(
                     f.write(await upload_file.read())
                 saved_images.append(file_path)
 
-    # Generate popup for each campaign type
-    for campaign_type in campaign_list:
-        request = PopupGenerationRequest(
-            product_name=product_name,
-            campaign_type=campaign_type.strip(),
-            prompt_text=prompt_text,
-            style=style,
-            aspect_ratio=aspect_ratio
-        )
+    # Generate popups concurrently, a few at a time so one batch can't fill the io pool
+    semaphore = asyncio.Semaphore(settings.popup_batch_concurrency)
+
+    async def generate(campaign_type: str):
+        async with semaphore:
+            return await generate_popup_ad(PopupGenerationRequest(
+                product_name=product_name,
+                campaign_type=campaign_type,
+                prompt_text=prompt_text,
+                style=style,
+                aspect_ratio=aspect_ratio
+            ))
 
-        result = await generate_popup_ad(request)
-        results.append(result)
+    results = await asyncio.gather(*[generate(campaign_type) for campaign_type in campaign_list])
 
     return {
         "success": True,
-        "results": results,
+        "results": list(results),
         "total_generated": len(results)
     }
 
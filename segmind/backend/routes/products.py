@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
+from core.cache import cached
+
 router = APIRouter(prefix="/api/products", tags=["products"])
 analytics_router = APIRouter(prefix="/api/analytics/products", tags=["products-analytics"])
 
 @router.get("/")
+@cached()
 def get_products():
     """Returns product analytics data"""
     return [
@@ -85,6 +88,7 @@ def get_products():
     ]
 
 @router.get("/stats/overview")
+@cached()
 def products_overview():
     """Returns product performance overview"""
     return {
@@ -98,6 +102,7 @@ def products_overview():
     }
 
 @analytics_router.get("/top")
+@cached()
 def get_top_products():
     """Returns top products with segment analysis"""
     return {
@@ -1,72 +1,161 @@
-from fastapi import APIRouter
+import logging
+
+from fastapi import APIRouter, HTTPException
+
+from core.segment_engine import segment_engine, SegmentStoreUnavailable
+from core.segment_bitmaps import segment_bitmaps
+from core.utils.schemas import SegmentQueryRequest
 
 router = APIRouter(prefix="/api/segments", tags=["segments"])
+logger = logging.getLogger(__name__)
+
+# Segment definitions; customer_count is computed live from the criteria
+SEGMENTS = [
+    {
+        "id": "seg_001",
+        "name": "High Converters",
+        "type": "behavioral",
+        "description": "Customers with conversion rate > 10% and multiple purchases",
+        "criteria": {"conversion_rate": "> 10%", "total_orders": "> 3"},
+        "created_at": "2024-01-15T08:30:00Z",
+        "updated_at": "2024-10-20T14:22:00Z"
+    },
+    {
+        "id": "seg_002",
+        "name": "Window Shoppers",
+        "type": "engagement",
+        "description": "High site engagement but low purchase rate",
+        "criteria": {"page_views": "> 20", "conversion_rate": "< 2%"},
+        "created_at": "2024-01-15T08:30:00Z",
+        "updated_at": "2024-10-18T11:15:00Z"
+    },
+    {
+        "id": "seg_003",
+        "name": "Cart Abandoners",
+        "type": "behavioral",
+        "description": "Users who add items to cart but don't complete purchase",
+        "criteria": {"cart_abandonment": "true", "days_since_cart": "< 7"},
+        "created_at": "2024-01-15T08:30:00Z",
+        "updated_at": "2024-10-22T16:45:00Z"
+    },
+    {
+        "id": "seg_004",
+        "name": "Loyal Customers",
+        "type": "value",
+        "description": "Repeat customers with high lifetime value",
+        "criteria": {"total_orders": "> 5", "lifetime_value": "> $500"},
+        "created_at": "2024-01-15T08:30:00Z",
+        "updated_at": "2024-10-19T09:33:00Z"
+    },
+    {
+        "id": "seg_005",
+        "name": "At Risk",
+        "type": "retention",
+        "description": "Previously active customers who haven't purchased recently",
+        "criteria": {"days_since_last_order": "> 60", "previous_orders": "> 1"},
+        "created_at": "2024-01-15T08:30:00Z",
+        "updated_at": "2024-10-21T13:12:00Z"
+    }
+]
+
+
+# Demo counts served when the events store hasn't been built (the default and Docker setups)
+SAMPLE_COUNTS = {"seg_001": 2847, "seg_002": 15623, "seg_003": 8941, "seg_004": 4256, "seg_005": 12387}
+
+
+def find_segment(segment_id):
+    """Segment definition by id; short ids like "seg_3" match "seg_003" """
+    for segment in SEGMENTS:
+        if segment["id"] == segment_id:
+            return segment
+    prefix, _, number = segment_id.rpartition("_")
+    if number.isdigit():
+        return find_segment(f"{prefix}_{int(number):03d}") if len(number) < 3 else None
+    return None
+
+def _segment_counts():
+    """Live customer counts for every segment, from one cached grouped query
+
+    Falls back to the demo counts (source "sample") when the events store is unavailable.
+    """
+    try:
+        return {**segment_engine.overview(SEGMENTS), "source": "live"}
+    except SegmentStoreUnavailable as e:
+        logger.warning(f"Serving sample segment counts: {e}")
+        counts = [SAMPLE_COUNTS[segment["id"]] for segment in SEGMENTS]
+        return {"total_users": sum(counts), "counts": counts, "source": "sample"}
 
 @router.get("/")
 def get_segments():
     """Returns detailed customer segments for management"""
+    overview = _segment_counts()
     return [
-        {
-            "id": "seg_001",
-            "name": "High Converters",
-            "type": "behavioral",
-            "description": "Customers with conversion rate > 10% and multiple purchases",
-            "customer_count": 2847,
-            "criteria": {"conversion_rate": "> 10%", "total_orders": "> 3"},
-            "created_at": "2024-01-15T08:30:00Z",
-            "updated_at": "2024-10-20T14:22:00Z"
-        },
-        {
-            "id": "seg_002",
-            "name": "Window Shoppers",
-            "type": "engagement",
-            "description": "High site engagement but low purchase rate",
-            "customer_count": 15623,
-            "criteria": {"page_views": "> 20", "conversion_rate": "< 2%"},
-            "created_at": "2024-01-15T08:30:00Z",
-            "updated_at": "2024-10-18T11:15:00Z"
-        },
-        {
-            "id": "seg_003",
-            "name": "Cart Abandoners",
-            "type": "behavioral",
-            "description": "Users who add items to cart but don't complete purchase",
-            "customer_count": 8941,
-            "criteria": {"cart_abandonment": "true", "days_since_cart": "< 7"},
-            "created_at": "2024-01-15T08:30:00Z",
-            "updated_at": "2024-10-22T16:45:00Z"
-        },
-        {
-            "id": "seg_004",
-            "name": "Loyal Customers",
-            "type": "value",
-            "description": "Repeat customers with high lifetime value",
-            "customer_count": 4256,
-            "criteria": {"total_orders": "> 5", "lifetime_value": "> $500"},
-            "created_at": "2024-01-15T08:30:00Z",
-            "updated_at": "2024-10-19T09:33:00Z"
-        },
-        {
-            "id": "seg_005",
-            "name": "At Risk",
-            "type": "retention",
-            "description": "Previously active customers who haven't purchased recently",
-            "customer_count": 12387,
-            "criteria": {"days_since_last_order": "> 60", "previous_orders": "> 1"},
-            "created_at": "2024-01-15T08:30:00Z",
-            "updated_at": "2024-10-21T13:12:00Z"
-        }
+        {**segment, "customer_count": count, "count_source": overview["source"]}
+        for segment, count in zip(SEGMENTS, overview["counts"])
     ]
 
 @router.get("/stats/overview")
 def segments_overview():
     """Returns customer segment statistics overview"""
+    overview = _segment_counts()
+    total = overview["total_users"]
     return {
+        "total_users": total,
+        "source": overview["source"],
         "segments": [
-            {"name": "High Converters", "count": 2847, "percentage": 6.5},
-            {"name": "Window Shoppers", "count": 15623, "percentage": 35.4},
-            {"name": "Cart Abandoners", "count": 8941, "percentage": 20.3},
-            {"name": "Loyal Customers", "count": 4256, "percentage": 9.7},
-            {"name": "At Risk", "count": 12387, "percentage": 28.1}
+            {
+                "name": segment["name"],
+                "count": count,
+                "percentage": round(100.0 * count / total, 1) if total else 0.0
+            }
+            for segment, count in zip(SEGMENTS, overview["counts"])
         ]
-    }
\ No newline at end of file
+    }
+
+def _bitmaps():
+    """Current segment bitmaps, rebuilt from user_features when stale"""
+    try:
+        segment_bitmaps.ensure(SEGMENTS)
+    except SegmentStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return segment_bitmaps.snapshot()
+
+def _segment_id(segment_id):
+    """Canonical id for a requested segment id, accepting short ids like "seg_2" """
+    segment = find_segment(segment_id)
+    if segment is None:
+        raise HTTPException(status_code=404, detail=f"Unknown segment: {segment_id}")
+    return segment["id"]
+
+@router.get("/overlap")
+def segments_overlap(a: str, b: str):
+    """Returns intersection, union and difference sizes for two segments"""
+    a, b = _segment_id(a), _segment_id(b)
+    snapshot = _bitmaps()
+    left, right = snapshot.get(a), snapshot.get(b)
+    both = (left & right).cardinality()
+    either = (left | right).cardinality()
+    return {
+        "a": a,
+        "b": b,
+        "a_count": left.cardinality(),
+        "b_count": right.cardinality(),
+        "intersection": both,
+        "union": either,
+        "a_only": (left - right).cardinality(),
+        "b_only": (right - left).cardinality(),
+        "jaccard": round(both / either, 4) if either else 0.0
+    }
+
+@router.post("/query")
+def query_segments(request: SegmentQueryRequest):
+    """Returns users in all of / any of / none of the given segments"""
+    all_of = [_segment_id(n) for n in request.all_of]
+    any_of = [_segment_id(n) for n in request.any_of]
+    none_of = [_segment_id(n) for n in request.none_of]
+    snapshot = _bitmaps()
+    result = snapshot.query(all_of, any_of, none_of)
+    response = {"count": result.cardinality(), "total_users": snapshot.size}
+    if request.include_user_ids:
+        response["user_ids"] = snapshot.user_ids(result, request.limit)
+    return response
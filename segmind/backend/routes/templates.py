@@ -1,6 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+from core.email_renderer import email_templates
+from core.utils.config import settings
 
 router = APIRouter(prefix="/api/templates", tags=["templates"])
 
@@ -18,142 +22,10 @@ class EmailTemplate(BaseModel):
     blocks: List[TemplateBlock]
     thumbnail: str
 
-@router.get("/")
-def get_templates():
-    """Returns list of available email templates"""
-    return [
-        {
-            "id": "template_001",
-            "name": "Product Spotlight",
-            "type": "promotional",
-            "preview": "Perfect for highlighting specific products to targeted segments",
-            "thumbnail": "https://via.placeholder.com/300x200/8B5CF6/FFFFFF?text=Product+Spotlight",
-            "blocks": [
-                {
-                    "id": "header_1",
-                    "type": "header",
-                    "content": {
-                        "title": "Exclusive for Our Valued Customers",
-                        "subtitle": "Amazing Product - Limited Time Offer",
-                        "backgroundColor": "#8B5CF6",
-                        "textColor": "#FFFFFF"
-                    }
-                },
-                {
-                    "id": "image_1",
-                    "type": "image",
-                    "content": {
-                        "src": "https://via.placeholder.com/600x300/3B82F6/FFFFFF?text=Product+Image",
-                        "alt": "Product Image",
-                        "link": "#shop-now"
-                    }
-                },
-                {
-                    "id": "text_1",
-                    "type": "text",
-                    "content": {
-                        "html": "<h2>🎯 Hand-picked just for you!</h2><p>Based on your preferences as a <strong>valued customer</strong>, we think you'll love this exclusive offer on our premium product.</p>"
-                    }
-                },
-                {
-                    "id": "button_1",
-                    "type": "button",
-                    "content": {
-                        "text": "Shop Now - 25% OFF",
-                        "link": "#shop-now",
-                        "backgroundColor": "#EF4444",
-                        "textColor": "#FFFFFF"
-                    }
-                }
-            ]
-        },
-        {
-            "id": "template_002",
-            "name": "Welcome Series",
-            "type": "welcome",
-            "preview": "Perfect for onboarding new customers",
-            "thumbnail": "https://via.placeholder.com/300x200/10B981/FFFFFF?text=Welcome+Series",
-            "blocks": [
-                {
-                    "id": "header_2",
-                    "type": "header",
-                    "content": {
-                        "title": "Welcome to Segmind!",
-                        "subtitle": "We're excited to have you join our community",
-                        "backgroundColor": "#10B981",
-                        "textColor": "#FFFFFF"
-                    }
-                },
-                {
-                    "id": "text_2",
-                    "type": "text",
-                    "content": {
-                        "html": "<h2>🎉 Your journey starts here</h2><p>Get ready to discover personalized recommendations, exclusive deals, and premium products tailored just for you.</p>"
-                    }
-                },
-                {
-                    "id": "product_1",
-                    "type": "product",
-                    "content": {
-                        "title": "Trending Now",
-                        "products": [
-                            {"name": "iPhone 15 Pro", "price": "$1199", "image": "https://via.placeholder.com/150x150/3B82F6/FFFFFF?text=iPhone"},
-                            {"name": "MacBook Air", "price": "$1299", "image": "https://via.placeholder.com/150x150/8B5CF6/FFFFFF?text=MacBook"},
-                            {"name": "AirPods Pro", "price": "$249", "image": "https://via.placeholder.com/150x150/EF4444/FFFFFF?text=AirPods"}
-                        ]
-                    }
-                }
-            ]
-        },
-        {
-            "id": "template_003",
-            "name": "Cart Recovery",
-            "type": "cart_abandonment",
-            "preview": "Win back customers who left items in their cart",
-            "thumbnail": "https://via.placeholder.com/300x200/F59E0B/FFFFFF?text=Cart+Recovery",
-            "blocks": [
-                {
-                    "id": "header_3",
-                    "type": "header",
-                    "content": {
-                        "title": "Don't forget your items!",
-                        "subtitle": "Your cart is waiting for you",
-                        "backgroundColor": "#F59E0B",
-                        "textColor": "#FFFFFF"
-                    }
-                },
-                {
-                    "id": "text_3",
-                    "type": "text",
-                    "content": {
-                        "html": "<h2>🛒 Still thinking about it?</h2><p>We saved your items! Complete your purchase now and get <strong>free shipping</strong> + an exclusive 10% discount.</p>"
-                    }
-                },
-                {
-                    "id": "spacer_1",
-                    "type": "spacer",
-                    "content": {"height": 20}
-                },
-                {
-                    "id": "button_2",
-                    "type": "button",
-                    "content": {
-                        "text": "Complete Purchase",
-                        "link": "#checkout",
-                        "backgroundColor": "#10B981",
-                        "textColor": "#FFFFFF"
-                    }
-                }
-            ]
-        }
-    ]
-
-@router.get("/{template_id}")
-def get_template(template_id: str):
-    """Returns a specific template by ID"""
-    # Mock data - in real implementation, query database
-    return {
-        "id": template_id,
+# Email templates; {{placeholders}} are filled per recipient when rendering
+TEMPLATES = [
+    {
+        "id": "template_001",
         "name": "Product Spotlight",
         "type": "promotional",
         "preview": "Perfect for highlighting specific products to targeted segments",
@@ -164,26 +36,187 @@ def get_template(template_id: str):
                 "type": "header",
                 "content": {
                     "title": "Exclusive for Our Valued Customers",
-                    "subtitle": "Amazing Product - Limited Time Offer",
+                    "subtitle": "{{product_name}} - Limited Time Offer",
                     "backgroundColor": "#8B5CF6",
                     "textColor": "#FFFFFF"
                 }
+            },
+            {
+                "id": "image_1",
+                "type": "image",
+                "content": {
+                    "src": "https://via.placeholder.com/600x300/3B82F6/FFFFFF?text=Product+Image",
+                    "alt": "Product Image",
+                    "link": "#shop-now"
+                }
+            },
+            {
+                "id": "text_1",
+                "type": "text",
+                "content": {
+                    "html": "<h2>🎯 Hand-picked just for you!</h2><p>Based on your preferences as a <strong>valued customer</strong>, we think you'll love this exclusive offer on {{product_name}}.</p>"
+                }
+            },
+            {
+                "id": "button_1",
+                "type": "button",
+                "content": {
+                    "text": "Shop Now - 25% OFF",
+                    "link": "#shop-now",
+                    "backgroundColor": "#EF4444",
+                    "textColor": "#FFFFFF"
+                }
+            }
+        ]
+    },
+    {
+        "id": "template_002",
+        "name": "Welcome Series",
+        "type": "welcome",
+        "preview": "Perfect for onboarding new customers",
+        "thumbnail": "https://via.placeholder.com/300x200/10B981/FFFFFF?text=Welcome+Series",
+        "blocks": [
+            {
+                "id": "header_2",
+                "type": "header",
+                "content": {
+                    "title": "Welcome to Segmind!",
+                    "subtitle": "We're excited to have you join our community",
+                    "backgroundColor": "#10B981",
+                    "textColor": "#FFFFFF"
+                }
+            },
+            {
+                "id": "text_2",
+                "type": "text",
+                "content": {
+                    "html": "<h2>🎉 Your journey starts here</h2><p>Hi {{first_name}}! Get ready to discover personalized recommendations, exclusive deals, and premium products tailored just for you.</p>"
+                }
+            },
+            {
+                "id": "product_1",
+                "type": "product",
+                "content": {
+                    "title": "Trending Now",
+                    "products": [
+                        {"name": "iPhone 15 Pro", "price": "$1199", "image": "https://via.placeholder.com/150x150/3B82F6/FFFFFF?text=iPhone"},
+                        {"name": "MacBook Air", "price": "$1299", "image": "https://via.placeholder.com/150x150/8B5CF6/FFFFFF?text=MacBook"},
+                        {"name": "AirPods Pro", "price": "$249", "image": "https://via.placeholder.com/150x150/EF4444/FFFFFF?text=AirPods"}
+                    ]
+                }
+            }
+        ]
+    },
+    {
+        "id": "template_003",
+        "name": "Cart Recovery",
+        "type": "cart_abandonment",
+        "preview": "Win back customers who left items in their cart",
+        "thumbnail": "https://via.placeholder.com/300x200/F59E0B/FFFFFF?text=Cart+Recovery",
+        "blocks": [
+            {
+                "id": "header_3",
+                "type": "header",
+                "content": {
+                    "title": "Don't forget your items!",
+                    "subtitle": "Your cart is waiting for you",
+                    "backgroundColor": "#F59E0B",
+                    "textColor": "#FFFFFF"
+                }
+            },
+            {
+                "id": "text_3",
+                "type": "text",
+                "content": {
+                    "html": "<h2>🛒 Still thinking about it?</h2><p>We saved your items! Complete your purchase now and get <strong>free shipping</strong> + an exclusive 10% discount.</p>"
+                }
+            },
+            {
+                "id": "spacer_1",
+                "type": "spacer",
+                "content": {"height": 20}
+            },
+            {
+                "id": "button_2",
+                "type": "button",
+                "content": {
+                    "text": "Complete Purchase",
+                    "link": "#checkout",
+                    "backgroundColor": "#10B981",
+                    "textColor": "#FFFFFF"
+                }
             }
         ]
     }
+]
+
+# Used for previews when a variable isn't supplied
+PREVIEW_DEFAULTS = {"first_name": "there", "product_name": "our latest products", "segment": "valued customer"}
+
+def find_template(template_id):
+    for template in TEMPLATES:
+        if template["id"] == template_id:
+            return template
+    return None
+
+@router.get("/")
+def get_templates():
+    """Returns list of available email templates"""
+    return TEMPLATES
+
+@router.get("/{template_id}")
+def get_template(template_id: str):
+    """Returns a specific template by ID"""
+    template = find_template(template_id)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+def _compiled(template_id: str):
+    template = find_template(template_id)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return email_templates.get(template_id, template["blocks"])
 
 @router.post("/{template_id}/customize")
-def customize_template(template_id: str, segment: Optional[str] = None, product: Optional[str] = None):
-    """Customizes a template with segment and product data"""
-    # In real implementation, this would personalize the template
+def customize_template(
+    template_id: str,
+    segment: Optional[str] = None,
+    product: Optional[str] = None,
+    variables: Optional[Dict[str, Any]] = Body(default=None)
+):
+    """Customizes a template with segment and product data; returns email HTML and plain text"""
+    compiled = _compiled(template_id)
+    context = {**PREVIEW_DEFAULTS, **(variables or {})}
+    if segment:
+        context["segment"] = segment
+    if product:
+        context["product_name"] = product
+    rendered = compiled.render(context)
     return {
         "template_id": template_id,
         "customized_for": {
             "segment": segment,
             "product": product
         },
+        "html": rendered["html"],
+        "text": rendered["text"],
+        "variables": sorted(compiled.variables),
         "message": "Template customized successfully",
-        "customized_at": "2025-10-25T12:00:00Z"
+        "customized_at": datetime.now().isoformat()
+    }
+
+@router.post("/{template_id}/render")
+def render_template(template_id: str, recipients: List[Dict[str, Any]] = Body(...)):
+    """Renders HTML and plain text for a batch of recipients (one variables object each)"""
+    if len(recipients) > settings.render_batch_size:
+        raise HTTPException(status_code=413, detail=f"At most {settings.render_batch_size} recipients per request")
+    compiled = _compiled(template_id)
+    return {
+        "template_id": template_id,
+        "static_blocks": compiled.static_blocks,
+        "dynamic_blocks": compiled.dynamic_blocks,
+        "rendered": compiled.render_many(recipients)
     }
 
 @router.get("/categories/{category}")
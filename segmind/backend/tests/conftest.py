@@ -0,0 +1,54 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Point every store at a scratch directory before core.utils.config builds the settings
+_scratch = tempfile.mkdtemp(prefix="segmind-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/segmind.db")
+os.environ.setdefault("CARD_CACHE_PATH", f"{_scratch}/card_cache.db")
+os.environ.setdefault("EVENTS_DB_PATH", f"{_scratch}/ecommerce.db")
+
+# Modules import each other as core.* / routes.*, relative to the backend directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SCRIPTS = Path(__file__).resolve().parents[2] / "scripts"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def stub_server():
+    """Start a stub from scripts/ (stub_provider.py, stub_llm.py) on a free port; returns its base URL"""
+    processes = []
+
+    def start(script, *args):
+        port = _free_port()
+        process = subprocess.Popen([sys.executable, str(SCRIPTS / script), "--port", str(port), *args],
+                                   stdout=subprocess.DEVNULL)
+        processes.append(process)
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                httpx.get(f"{url}/stats")
+                return url
+            except httpx.TransportError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"{script} did not start")
+                time.sleep(0.1)
+
+    yield start
+    for process in processes:
+        process.terminate()
+        process.wait()
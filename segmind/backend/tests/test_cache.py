@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+
+from core.cache import KEY_LOCK_STRIPES, ResponseCache
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"value": self.calls}
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_hit_serves_cached_value(redis_client, executor):
+    cache = ResponseCache(ttl=60, redis_client=redis_client, executor=executor)
+    compute = Counter()
+
+    assert cache.get_or_compute("k", compute) == {"value": 1}
+    assert cache.get_or_compute("k", compute) == {"value": 1}
+    assert compute.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_redis_tier_is_shared_between_caches(redis_client, executor):
+    first = ResponseCache(ttl=60, redis_client=redis_client, executor=executor)
+    second = ResponseCache(ttl=60, redis_client=redis_client, executor=executor)
+    compute = Counter()
+
+    first.get_or_compute("k", compute)
+    assert second.get_or_compute("k", compute) == {"value": 1}
+    assert compute.calls == 1
+    assert 0 < redis_client.ttl("segmind:cache:k") <= 60 + first.stale_ttl
+
+
+def test_stale_entry_is_served_while_refreshing(redis_client, executor):
+    cache = ResponseCache(ttl=0.05, stale_ttl=60, redis_client=redis_client, executor=executor)
+    compute = Counter()
+    cache.get_or_compute("k", compute)
+    time.sleep(0.06)
+
+    assert cache.get_or_compute("k", compute) == {"value": 1}
+    _wait_for(lambda: compute.calls == 2 and not cache._refreshing)
+    assert cache.get_or_compute("k", compute) == {"value": 2}
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_concurrent_stale_reads_start_one_refresh(redis_client, executor):
+    cache = ResponseCache(ttl=0.05, stale_ttl=60, redis_client=redis_client, executor=executor)
+    cache.get_or_compute("k", lambda: "old")
+    time.sleep(0.06)
+
+    release = threading.Event()
+    refreshes = Counter()
+
+    def slow_compute():
+        refreshes()
+        release.wait(2)
+        return "new"
+
+    with ThreadPoolExecutor(max_workers=16) as readers:
+        values = list(readers.map(lambda _: cache.get_or_compute("k", slow_compute), range(32)))
+    release.set()
+
+    assert values == ["old"] * 32
+    _wait_for(lambda: not cache._refreshing)
+    assert refreshes.calls == 1
+    assert cache.get_or_compute("k", slow_compute) == "new"
+
+
+def test_concurrent_misses_compute_once(executor):
+    cache = ResponseCache(ttl=60, executor=executor)
+    compute = Counter()
+
+    def slow_compute():
+        time.sleep(0.05)
+        return compute()
+
+    with ThreadPoolExecutor(max_workers=8) as readers:
+        values = list(readers.map(lambda _: cache.get_or_compute("k", slow_compute), range(8)))
+
+    assert values == [{"value": 1}] * 8
+    assert compute.calls == 1
+
+
+def test_entries_expire_after_ttl_and_stale_ttl(redis_client, executor):
+    cache = ResponseCache(ttl=0.02, stale_ttl=0.02, redis_client=redis_client, executor=executor)
+    compute = Counter()
+    cache.get_or_compute("k", compute)
+    # Redis expiry has one-second resolution; drop the remote copy to test local expiry alone
+    redis_client.delete("segmind:cache:k")
+    time.sleep(0.05)
+
+    assert cache.get_or_compute("k", compute) == {"value": 2}
+    assert cache.stats()["misses"] == 2
+
+
+def test_key_locks_do_not_grow_with_keys(executor):
+    cache = ResponseCache(ttl=60, max_entries=8, executor=executor)
+    for i in range(1000):
+        cache.get_or_compute(f"k{i}", lambda: i)
+
+    assert len(cache._key_locks) == KEY_LOCK_STRIPES
+    assert cache.stats()["entries"] == 8
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core.llm_client import LLMClient, RequestAbandoned, cancel_on_disconnect
+from routes import campaign_generator
+from routes.campaign_generator import CampaignCardGenerator
+
+PRODUCT = {"name": "Galaxy S24"}
+STRATEGY = {"product": "Galaxy S24", "primaryAudience": "Window Shoppers", "strategy": "deals",
+            "customPrompt": "15% off"}
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _schedule(size, theme="default"):
+    return [{"day": DAYS[i], "time": "9:00 AM", "type": f"Promo {i}", "audience": "Window Shoppers",
+             "emailTheme": theme} for i in range(size)]
+
+
+class _DisconnectingRequest:
+    """Stands in for a Starlette request whose client goes away after `after` seconds"""
+
+    def __init__(self, after: float):
+        self.disconnect_at = time.monotonic() + after
+
+    async def is_disconnected(self) -> bool:
+        return time.monotonic() >= self.disconnect_at
+
+
+@pytest.fixture
+def single_card_batches(monkeypatch):
+    monkeypatch.setattr(CampaignCardGenerator, "_batches",
+                        lambda self, schedule: [(offset, 1) for offset in range(len(schedule))])
+
+
+@pytest.fixture
+def stub_llm_client(stub_server, monkeypatch):
+    def start(*args):
+        client = LLMClient(f"{stub_server('stub_llm.py', *args)}/v1", max_concurrency=8, max_retries=0)
+        monkeypatch.setattr(campaign_generator, "llm_client", client)
+        return client
+
+    return start
+
+
+def test_failed_batch_falls_back_per_slot(single_card_batches, monkeypatch):
+    generator = CampaignCardGenerator(openai_api_key="test")
+
+    async def generate(product, strategy, batch, deadline=None):
+        if batch[0]["day"] == "Tuesday":
+            raise Exception("HTTP 500")
+        return [{"id": f"ai_{batch[0]['day']}", "day": batch[0]["day"]}]
+
+    monkeypatch.setattr(generator, "_generate_with_openai", generate)
+    cards, complete = asyncio.run(generator._generate_with_openai_batched(PRODUCT, STRATEGY, _schedule(3)))
+
+    assert not complete
+    assert [card["id"] for card in cards[::2]] == ["ai_Monday", "ai_Wednesday"]
+    assert cards[1]["id"].startswith("card_") and cards[1]["day"] == "Tuesday"
+
+
+def test_disconnect_cancels_every_sibling_call(single_card_batches, stub_llm_client):
+    client = stub_llm_client("--latency-ms", "3000")
+    generator = CampaignCardGenerator(openai_api_key="test")
+
+    async def run():
+        work = generator.generate_campaign_cards_cached(PRODUCT, STRATEGY, _schedule(3, theme="disconnect"))
+        with pytest.raises(RequestAbandoned):
+            await cancel_on_disconnect(_DisconnectingRequest(0.3), work, poll_interval=0.05)
+        await asyncio.sleep(0.1)
+        in_flight = client.budget.in_flight
+        await client.close()
+        return in_flight
+
+    started = time.monotonic()
+    assert asyncio.run(run()) == 0
+    assert time.monotonic() - started < 2
+    assert client.requests == 3
+
+
+def _stream(schedule, sse=False):
+    """Events from /generate-cards/stream, parsed from NDJSON or SSE"""
+    app = FastAPI()
+    app.include_router(campaign_generator.router)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/campaign-generator/generate-cards/stream",
+                                     params={"format": "sse"} if sse else None,
+                                     json={"product": PRODUCT, "strategy": STRATEGY, "weeklySchedule": schedule})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    if sse:
+        return [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_sends_cards_as_batches_finish_then_serves_cache(stub_llm_client, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(CampaignCardGenerator, "_batches", lambda self, schedule: [(0, 3), (3, 1)])
+    client = stub_llm_client("--per-card-ms", "150")
+    schedule = _schedule(4, theme="stream")
+
+    *cards, done = _stream(schedule)
+
+    # The one-card batch finishes first, so its index leads
+    assert [event["index"] for event in cards] == [3, 0, 1, 2]
+    assert {event["source"] for event in cards} == {"openai"}
+    assert [cards[i]["card"]["day"] for i in (1, 2, 3, 0)] == DAYS[:4]
+    assert done["done"] and done["total_cards"] == 4
+    assert client.requests == 2
+
+    *cached, done = _stream(schedule, sse=True)
+    assert [event["index"] for event in cached] == [0, 1, 2, 3]
+    assert {event["source"] for event in cached} == {"cache"}
+    assert done["total_cards"] == 4
+    assert client.requests == 2
+
+
+def test_stream_falls_back_to_templates_per_card(single_card_batches, stub_llm_client, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    client = stub_llm_client("--failure-rate", "1")
+    schedule = _schedule(3, theme="stream-failures")
+
+    *cards, done = _stream(schedule)
+
+    assert sorted(event["index"] for event in cards) == [0, 1, 2]
+    assert {event["source"] for event in cards} == {"template"}
+    assert all(event["card"]["id"].endswith(f"_{event['index']}") for event in cards)
+    assert done["total_cards"] == 3
+
+    # Template fallbacks are not cached: the next request calls the LLM again
+    *cards, _ = _stream(schedule)
+    assert {event["source"] for event in cards} == {"template"}
+    assert client.requests == 6
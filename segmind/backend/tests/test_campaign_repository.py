@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.campaign_repository import CampaignRepository
+from core.message_store import MessageStore
+from routes import campaigns
+
+
+@pytest.fixture
+def repository(tmp_path):
+    store = MessageStore(str(tmp_path / "messages.db"))
+    yield CampaignRepository(store)
+    store.close()
+
+
+def _create(repository, name, scheduled_at=None, **fields):
+    return repository.create(name=name, segment_id="seg_001", channel="sms", content="Hi",
+                             scheduled_at=scheduled_at, **fields)
+
+
+def _pages(repository, limit, status=None):
+    names, cursor = [], None
+    while True:
+        page, cursor = repository.page(limit, cursor, status)
+        names.append([c.name for c in page])
+        if cursor is None:
+            return names
+
+
+def test_pages_are_newest_first_and_cursors_round_trip(repository):
+    for i in range(7):
+        _create(repository, f"c{i}")
+
+    assert _pages(repository, 3) == [["c6", "c5", "c4"], ["c3", "c2", "c1"], ["c0"]]
+    assert _pages(repository, 7) == [["c6", "c5", "c4", "c3", "c2", "c1", "c0"]]
+
+
+def test_cursor_is_stable_while_campaigns_are_added_and_deleted(repository):
+    created = [_create(repository, f"c{i}") for i in range(5)]
+    first, cursor = repository.page(2)
+
+    _create(repository, "newer")
+    repository.delete(created[2].id)
+
+    rest, cursor = repository.page(2, cursor)
+    assert [c.name for c in first + rest] == ["c4", "c3", "c1", "c0"]
+    assert cursor is None
+
+
+def test_status_filter_pages_only_matching_campaigns(repository):
+    tomorrow = datetime.now() + timedelta(days=1)
+    for i in range(6):
+        _create(repository, f"c{i}", scheduled_at=tomorrow if i % 2 else None)
+
+    assert _pages(repository, 2, status="scheduled") == [["c5", "c3"], ["c1"]]
+    assert _pages(repository, 5, status="draft") == [["c4", "c2", "c0"]]
+    assert repository.page(5, status="sending") == ([], None)
+
+
+def test_calendar_range_is_half_open_and_in_schedule_order(repository):
+    _create(repository, "late", datetime(2026, 3, 31, 23, 59))
+    _create(repository, "first", datetime(2026, 3, 1))
+    _create(repository, "next month", datetime(2026, 4, 1))
+    _create(repository, "previous month", datetime(2026, 2, 28, 23, 59))
+    _create(repository, "unscheduled")
+
+    march = repository.scheduled_between(datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert [c.name for c in march] == ["first", "late"]
+
+
+def test_aware_times_are_stored_as_local_time(repository):
+    aware = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+    campaign = _create(repository, "aware", aware)
+    local = aware.astimezone().replace(tzinfo=None)
+
+    assert repository.get(campaign.id).scheduled_at == local
+    assert [c.id for c in repository.scheduled_between(local, local + timedelta(seconds=1))] == [campaign.id]
+    assert [c.id for c in repository.with_status("scheduled", before=aware + timedelta(seconds=1))] == [campaign.id]
+
+
+def test_routes_page_by_header_cursor_and_serve_the_calendar(repository, monkeypatch):
+    monkeypatch.setattr(campaigns, "campaign_repository", repository)
+    app = FastAPI()
+    app.include_router(campaigns.router)
+    client = TestClient(app)
+    for day in (5, 20):
+        _create(repository, f"march {day}", datetime(2026, 3, day, 9, 30))
+    _create(repository, "draft")
+
+    first = client.get("/api/campaigns/", params={"limit": 2})
+    second = client.get("/api/campaigns/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [c["name"] for c in first.json() + second.json()] == ["draft", "march 20", "march 5"]
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get("/api/campaigns/", params={"cursor": "abc"}).status_code == 400
+
+    calendar = client.get("/api/campaigns/calendar/2026/3").json()
+    assert [(c["date"], c["time"]) for c in calendar["campaigns"]] == [("2026-03-05", "09:30"), ("2026-03-20", "09:30")]
+    assert client.get("/api/campaigns/calendar/2026/13").status_code == 422
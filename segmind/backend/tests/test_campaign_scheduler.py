@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.campaign_repository import CampaignRepository
+from core.campaign_scheduler import CampaignScheduler
+from core.message_store import MessageStore
+
+
+@pytest.fixture
+def repository(tmp_path):
+    store = MessageStore(str(tmp_path / "messages.db"))
+    yield CampaignRepository(store)
+    store.close()
+
+
+def _schedule(repository, seconds=0.0):
+    return repository.create(name="Scheduled", segment_id="seg_1", channel="sms", content="Hi",
+                             scheduled_at=datetime.now() + timedelta(seconds=seconds))
+
+
+def test_due_campaign_fires_once(repository):
+    campaign = _schedule(repository)
+    fired = []
+
+    async def run():
+        scheduler = CampaignScheduler(repository, horizon=60, reload_interval=60)
+
+        async def fire(campaign_id):
+            fired.append(campaign_id)
+
+        await scheduler.start(fire)
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert fired == [campaign.id]
+    assert (scheduler.fired, scheduler.skipped) == (1, 0)
+    assert repository.get(campaign.id).status == "sending"
+
+
+def test_stop_cancels_and_awaits_fire_tasks(repository):
+    _schedule(repository)
+    events = []
+
+    async def run():
+        scheduler = CampaignScheduler(repository, horizon=60, reload_interval=60)
+        started = asyncio.Event()
+
+        async def fire(campaign_id):
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+        await scheduler.start(fire)
+        await asyncio.wait_for(started.wait(), timeout=5)
+        assert len(scheduler._firing) == 1
+        await scheduler.stop()
+        events.append("stopped")
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert events == ["cancelled", "stopped"]
+    assert not scheduler._firing
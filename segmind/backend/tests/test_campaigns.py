@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.campaign_repository import campaign_repository
+from core.dispatcher import dispatcher
+from routes.campaigns import router
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def _create(**fields):
+    body = {"name": "Update test", "type": "sms", "segment_id": "seg_1", "content": "Hi", **fields}
+    return client.post("/api/campaigns/", json=body).json()["id"]
+
+
+def _status(campaign_id):
+    return client.get(f"/api/campaigns/{campaign_id}").json()["status"]
+
+
+def test_scheduling_a_draft_makes_it_scheduled():
+    campaign_id = _create()
+    assert _status(campaign_id) == "draft"
+
+    scheduled_at = (datetime.now() + timedelta(days=1)).isoformat()
+    response = client.put(f"/api/campaigns/{campaign_id}", json={"scheduled_at": scheduled_at})
+
+    assert response.json()["updated_fields"]["status"] == "scheduled"
+    assert _status(campaign_id) == "scheduled"
+
+    client.put(f"/api/campaigns/{campaign_id}", json={"scheduled_at": None})
+    assert _status(campaign_id) == "draft"
+
+
+@pytest.mark.parametrize("fields", [
+    {"scheduled_at": (datetime.now() - timedelta(days=1)).isoformat()},
+    {"scheduled_at": (datetime.now() + timedelta(days=1)).isoformat(), "status": "draft"},
+])
+def test_past_or_explicit_status_is_kept(fields):
+    campaign_id = _create()
+    client.put(f"/api/campaigns/{campaign_id}", json=fields)
+
+    assert _status(campaign_id) == "draft"
+
+
+def test_sending_campaign_keeps_its_status(monkeypatch):
+    campaign_id = _create()
+    campaign_repository.update(campaign_id, status="sending")
+    monkeypatch.setattr(dispatcher, "is_running", lambda cid: cid == campaign_id)
+
+    scheduled_at = (datetime.now() + timedelta(days=1)).isoformat()
+    client.put(f"/api/campaigns/{campaign_id}", json={"scheduled_at": scheduled_at})
+
+    assert _status(campaign_id) == "sending"
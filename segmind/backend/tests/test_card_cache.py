@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from core import card_cache as card_cache_module
+from core.card_cache import HIT_DISK, HIT_MEMORY, MISS, SHARED, CardCache, card_cache_key
+from core.llm_client import LLMClient
+
+MESSAGES = [{"role": "user", "content": "Monday 9:00 AM: Flash Sale for Window Shoppers"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CardCache(str(tmp_path / "cards.db"), ttl=60, max_entries=2)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable time.time() for the cache module"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(card_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def _producer(client):
+    async def produce():
+        completion = await client.complete(MESSAGES, "test")
+        return [completion.content], True
+
+    return produce
+
+
+def test_key_ignores_order_whitespace_and_empty_fields():
+    key = card_cache_key(product={"name": "Galaxy  S24", "brand": "Samsung"}, strategy={"prompt": " 15% off "},
+                         schedule=[{"day": "Monday"}, {"day": "Tuesday"}], model="gpt-4")
+
+    assert key == card_cache_key(model="gpt-4", schedule=[{"day": "Monday"}, {"day": "Tuesday"}],
+                                 strategy={"prompt": "15% off", "theme": None, "extra": ""},
+                                 product={"brand": "Samsung", "name": "Galaxy S24"})
+    assert key != card_cache_key(product={"name": "Galaxy S24", "brand": "Samsung"}, strategy={"prompt": "15% off"},
+                                 schedule=[{"day": "Tuesday"}, {"day": "Monday"}], model="gpt-4")
+    assert key != card_cache_key(product={"name": "Galaxy S24", "brand": "Samsung"}, strategy={"prompt": "15% off"},
+                                 schedule=[{"day": "Monday"}, {"day": "Tuesday"}], model="gpt-4o")
+
+
+def test_memory_tier_is_lru(cache):
+    async def run():
+        for key in ("a", "b"):
+            await cache.put(key, [key])
+        await cache.get("a")
+        await cache.put("c", ["c"])
+        return list(cache._memory)
+
+    # "b" was least recently used; it is gone from memory but still on disk
+    assert asyncio.run(run()) == ["a", "c"]
+    assert asyncio.run(cache.get("b")) == (["b"], HIT_DISK)
+
+
+def test_entries_expire_in_both_tiers(cache, clock):
+    asyncio.run(cache.put("a", ["card"]))
+    assert asyncio.run(cache.get("a")) == (["card"], HIT_MEMORY)
+
+    clock[0] += 61
+    assert asyncio.run(cache.get("a")) == (None, None)
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_disk_tier_survives_restart(cache):
+    asyncio.run(cache.put("a", [{"id": "card_1"}]))
+    restarted = CardCache(cache.db_path, ttl=60)
+    try:
+        assert asyncio.run(restarted.get("a")) == ([{"id": "card_1"}], HIT_DISK)
+        assert asyncio.run(restarted.get("a")) == ([{"id": "card_1"}], HIT_MEMORY)
+    finally:
+        restarted.close()
+
+
+def test_uncacheable_results_are_not_stored(cache):
+    async def produce():
+        return ["fallback"], False
+
+    assert asyncio.run(cache.get_or_generate("a", produce)) == (["fallback"], MISS)
+    assert asyncio.run(cache.get("a")) == (None, None)
+
+
+def test_concurrent_misses_share_one_call(cache, stub_server):
+    client = LLMClient(f"{stub_server('stub_llm.py', '--latency-ms', '300')}/v1", max_concurrency=8)
+
+    async def run():
+        try:
+            return await asyncio.gather(*[cache.get_or_generate("a", _producer(client)) for _ in range(3)])
+        finally:
+            await client.close()
+
+    results = asyncio.run(run())
+    assert [status for _, status in results] == [MISS, SHARED, SHARED]
+    assert results[0][0] == results[1][0] == results[2][0]
+    assert results[1][0] is not results[2][0]
+    assert client.requests == 1
+    assert asyncio.run(cache.get("a"))[1] == HIT_MEMORY
+
+
+def test_call_is_cancelled_only_when_the_last_waiter_leaves(cache, stub_server):
+    client = LLMClient(f"{stub_server('stub_llm.py', '--latency-ms', '500')}/v1", max_concurrency=8)
+
+    async def run():
+        try:
+            first = asyncio.create_task(cache.get_or_generate("a", _producer(client)))
+            second = asyncio.create_task(cache.get_or_generate("a", _producer(client)))
+            await asyncio.sleep(0.1)
+            first.cancel()
+            cards, status = await second
+            assert status == SHARED and cards
+
+            third = asyncio.create_task(cache.get_or_generate("b", _producer(client)))
+            fourth = asyncio.create_task(cache.get_or_generate("b", _producer(client)))
+            await asyncio.sleep(0.1)
+            third.cancel()
+            fourth.cancel()
+            await asyncio.gather(third, fourth, return_exceptions=True)
+            await asyncio.sleep(0.05)
+            return cache.stats()["in_flight"], client.budget.in_flight
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == (0, 0)
+    assert client.requests == 2
+    assert asyncio.run(cache.get("b")) == (None, None)
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import httpx
+import pytest
+
+from core.dispatcher import CampaignDispatcher, unresolved_variables
+from core.message_store import MessageStore
+from core.providers import HttpProvider, SimulatedProvider
+from core.rate_limiter import SendScheduler
+from core.utils.schemas import Campaign
+
+LIMITS = {"email": {"rate": 1000, "burst": 1000, "account_rate": 1000, "account_burst": 1000}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessageStore(str(tmp_path / "messages.db"))
+    yield store
+    store.close()
+
+
+def _campaign(**fields) -> Campaign:
+    return Campaign(**{
+        "id": "camp_test",
+        "name": "Test",
+        "segment_id": "seg_1",
+        "channel": "email",
+        "content": "Hi {{customer_id}}, your {{product_name}} is {{discount}}% off",
+        "subject": "{{product_name}} for {{customer_id}}",
+        "status": "sending",
+        "created_at": datetime.now(),
+        "variables": {"product_name": "Galaxy S24", "discount": 10},
+        **fields
+    })
+
+
+def _dispatch(store, url, campaign, batches):
+    dispatcher = CampaignDispatcher(provider_factory=lambda: HttpProvider(url), channel_concurrency={"email": 4},
+                                    store=store, scheduler=SendScheduler(LIMITS))
+
+    async def run():
+        try:
+            return await dispatcher.run(campaign, iter(batches))
+        finally:
+            await dispatcher.close()
+
+    return asyncio.run(run())
+
+
+def test_campaign_is_rendered_and_completed_through_stub_provider(store, stub_server):
+    url = stub_server("stub_provider.py")
+    campaign = store.add_campaign(_campaign())
+
+    progress = _dispatch(store, url, campaign, [["u1", "u2"], ["u3"]])
+
+    assert (progress.total, progress.sent, progress.failed) == (3, 3, 0)
+    received = {message["to"]: message for message in httpx.get(f"{url}/messages").json()}
+    assert sorted(received) == ["u1", "u2", "u3"]
+    assert received["u2"]["content"] == "Hi u2, your Galaxy S24 is 10% off"
+    assert received["u2"]["subject"] == "Galaxy S24 for u2"
+
+    stored = store.get_campaign("camp_test")
+    assert (stored.status, stored.total_recipients, stored.sent_count, stored.failed_count) == ("completed", 3, 3, 0)
+    messages, _ = store.list_messages(customer_id="u3")
+    assert [(m.content, m.status) for m in messages] == [("Hi u3, your Galaxy S24 is 10% off", "sent")]
+
+
+def test_campaign_fails_when_provider_rejects_every_send(store, stub_server):
+    url = stub_server("stub_provider.py", "--failure-rate", "1")
+    campaign = store.add_campaign(_campaign())
+
+    progress = _dispatch(store, url, campaign, [["u1", "u2"]])
+
+    assert (progress.sent, progress.failed) == (0, 2)
+    assert store.get_campaign("camp_test").status == "failed"
+    messages, _ = store.list_messages()
+    assert {m.status for m in messages} == {"failed"}
+
+
+def test_cancel_while_fetching_recipients_still_records_final_status(store):
+    campaign = store.add_campaign(_campaign())
+    fetching = threading.Event()
+    release = threading.Event()
+    closed = threading.Event()
+
+    def recipients():
+        try:
+            yield ["u1", "u2"]
+            fetching.set()
+            release.wait(5)
+            yield ["u3"]
+        finally:
+            closed.set()
+
+    dispatcher = CampaignDispatcher(provider_factory=SimulatedProvider, channel_concurrency={"email": 4},
+                                    store=store, scheduler=SendScheduler(LIMITS))
+
+    async def run():
+        task = dispatcher.start(campaign, recipients())
+        await asyncio.to_thread(fetching.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await dispatcher.close()
+
+    asyncio.run(run())
+    stored = store.get_campaign("camp_test")
+    assert stored.status == "cancelled"
+    assert stored.total_recipients == 2
+    assert dispatcher.progress == {}
+
+    # The generator is closed once the fetch that was running returns
+    assert not closed.is_set()
+    release.set()
+    assert closed.wait(5)
+
+
+def test_finished_runs_leave_progress(store):
+    campaign = store.add_campaign(_campaign())
+    dispatcher = CampaignDispatcher(provider_factory=SimulatedProvider, channel_concurrency={"email": 4},
+                                    store=store, scheduler=SendScheduler(LIMITS))
+
+    async def run():
+        try:
+            return await dispatcher.run(campaign, iter([["u1"]]))
+        finally:
+            await dispatcher.close()
+
+    assert asyncio.run(run()).sent == 1
+    assert dispatcher.progress == {}
+    assert store.get_campaign("camp_test").status == "completed"
+
+
+def test_unresolved_variables():
+    assert unresolved_variables("Hi {{customer_id}}, {{ product_name }}", "{{discount}}%", {"discount": 5}) \
+        == ["product_name"]
+    assert unresolved_variables("Hi {{customer_id}}", None, {}) == []
@@ -0,0 +1,21 @@
+from core.email_renderer import CompiledEmail, render_block
+
+
+def test_header_placeholders_are_filled_in_text_part():
+    email = CompiledEmail([
+        {"type": "header", "content": {"title": "Hi {{first_name}}, your deal", "subtitle": "For {{ first_name }}"}},
+        {"type": "text", "content": {"html": "<p>Save {{discount}}%</p>"}},
+    ])
+
+    assert email.variables == {"first_name", "discount"}
+    rendered = email.render({"first_name": "Ana", "discount": 15})
+    assert rendered["text"] == "HI Ana, YOUR DEAL\nFor Ana\n\nSave 15%"
+    assert "Hi Ana, your deal" in rendered["html"]
+    assert "{{" not in rendered["html"]
+
+
+def test_static_header_text_is_uppercased():
+    markup, text = render_block({"type": "header", "content": {"title": "Summer sale"}})
+
+    assert text == "SUMMER SALE"
+    assert ">Summer sale</h1>" in markup
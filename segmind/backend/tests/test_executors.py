@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.executors import CPU, IO, WorkerPool, WorkerPools
+
+
+@pytest.fixture
+def pools():
+    pools = WorkerPools({IO: 1, CPU: 2})
+    yield pools
+    asyncio.run(pools.shutdown())
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_pool_records_queue_and_run_time():
+    pool = WorkerPool("test", max_workers=1)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait)
+        queued = pool.submit(time.sleep, 0.01)
+        _wait_for(lambda: pool.stats()["active"] == 1)
+        assert pool.stats()["queued"] == 1
+        time.sleep(0.05)
+        release.set()
+        running.result(), queued.result()
+
+        failing = pool.submit(int, "not a number")
+        with pytest.raises(ValueError):
+            failing.result()
+
+        stats = pool.stats()
+        assert (stats["submitted"], stats["completed"], stats["failed"]) == (3, 3, 1)
+        assert (stats["active"], stats["queued"]) == (0, 0)
+        # The second task waited behind the first for at least 50 ms
+        assert stats["queue_ms_p95"] >= 50
+        assert stats["run_ms_p95"] >= 50
+    finally:
+        pool.shutdown()
+
+
+def test_pools_are_created_once_by_name(pools):
+    assert pools.io is pools.pool(IO)
+    assert pools.cpu.max_workers == 2
+    with pytest.raises(KeyError):
+        pools.pool("gpu")
+    assert set(pools.stats()) == {IO, CPU}
+
+
+def test_install_routes_to_thread_through_the_io_pool(pools):
+    async def run():
+        pools.install()
+        return await asyncio.to_thread(lambda: threading.current_thread().name)
+
+    assert asyncio.run(run()).startswith("io-worker")
+    assert pools.io.stats()["completed"] == 1
+
+
+def test_shutdown_cancels_queued_work_and_joins_workers(pools):
+    release = threading.Event()
+    pool = pools.io
+    running = pool.submit(release.wait)
+    queued = pool.submit(time.sleep, 0)
+    _wait_for(lambda: pool.stats()["active"] == 1)
+    workers = list(pool._threads)
+
+    async def run():
+        pools.install()
+        shutting_down = asyncio.create_task(pools.shutdown())
+        await asyncio.sleep(0.05)
+        assert not shutting_down.done()
+        release.set()
+        await shutting_down
+
+    asyncio.run(run())
+
+    assert running.done() and not running.cancelled()
+    assert queued.cancelled()
+    assert workers and not any(worker.is_alive() for worker in workers)
+    assert pools.stats() == {}
+    assert pools.io is not pool
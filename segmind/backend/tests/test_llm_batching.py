@@ -0,0 +1,80 @@
+import pytest
+
+from core.llm_batching import PRIOR_OVERHEAD, PRIOR_PER_CARD, AdaptiveBatcher
+from core.llm_client import ConcurrencyBudget, LLMClient
+
+
+def _batcher(max_concurrency=16, max_batch=8):
+    return AdaptiveBatcher(LLMClient(base_url="http://stub/v1", max_concurrency=max_concurrency),
+                           max_batch=max_batch)
+
+
+def test_latency_model_starts_from_priors():
+    assert _batcher().latency_model() == (PRIOR_OVERHEAD, PRIOR_PER_CARD)
+
+
+def test_latency_model_fits_overhead_and_per_card():
+    batcher = _batcher()
+    for _ in range(20):
+        for cards in (1, 2, 4):
+            batcher.observe(cards, 0.5 + 0.25 * cards)
+
+    overhead, per_card = batcher.latency_model()
+    assert overhead == pytest.approx(0.5, abs=0.05)
+    assert per_card == pytest.approx(0.25, abs=0.02)
+
+
+def test_latency_model_scales_prior_without_spread_in_sizes():
+    batcher = _batcher()
+    for _ in range(5):
+        batcher.observe(2, 2.5)
+
+    overhead, per_card = batcher.latency_model()
+    assert overhead / per_card == pytest.approx(PRIOR_OVERHEAD / PRIOR_PER_CARD)
+    assert overhead + 2 * per_card == pytest.approx(2.5)
+
+
+def test_plan_with_free_budget_does_not_split_into_single_cards():
+    batcher = _batcher()
+    sizes = batcher.plan(7)
+
+    assert sum(sizes) == 7
+    assert len(sizes) < 7
+    assert max(sizes) - min(sizes) <= 1
+    assert max(sizes) <= batcher.last_plan["token_cap"]
+
+
+def test_plan_respects_token_cap():
+    batcher = _batcher()
+    batcher.observe(1, 2.0, completion_tokens=900)
+
+    assert batcher.plan(3, max_tokens=2000) == [1, 1, 1]
+
+
+def test_plan_uses_biggest_batches_with_one_free_slot():
+    batcher = _batcher(max_concurrency=1)
+
+    # Calls run one after another, so the fewest calls the token cap allows (4 cards) win
+    assert batcher.plan(6) == [3, 3]
+    assert batcher.last_plan["free_slots"] == 1
+
+
+def test_larger_prompts_mean_fewer_calls():
+    def calls(prompt_tokens):
+        batcher = _batcher()
+        for cards in (1, 2, 3, 4) * 5:
+            batcher.observe(cards, 0.2 + 1.0 * cards, completion_tokens=300 * cards, prompt_tokens=prompt_tokens)
+        return len(batcher.plan(8))
+
+    assert calls(20000) < calls(100)
+
+
+def test_plan_follows_shrunken_budget():
+    batcher = _batcher()
+    batcher.client.budget = ConcurrencyBudget(16, cooldown=0)
+    for _ in range(4):
+        batcher.client.budget.on_rate_limited()
+
+    batcher.plan(8)
+    assert batcher.last_plan["free_slots"] == 1
+    assert len(batcher.last_plan["batch_sizes"]) == 2
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from core.llm_client import ConcurrencyBudget, LLMClient, LLMError, LLMTimeout
+
+MESSAGES = [{"role": "user", "content": "Monday 9:00 AM: Flash Sale for Window Shoppers"}]
+
+
+def _complete(client, calls=1, deadline_seconds=None):
+    async def run():
+        try:
+            deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+            return await asyncio.gather(*[client.complete(MESSAGES, "test", deadline=deadline) for _ in range(calls)])
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_completion_from_stub(stub_server):
+    url = stub_server("stub_llm.py")
+    [completion] = _complete(LLMClient(f"{url}/v1", max_concurrency=4))
+
+    assert '"type": "Flash Sale"' in completion.content
+    assert completion.prompt_tokens and completion.completion_tokens
+
+
+def test_deadline_expires_before_slow_completion(stub_server):
+    url = stub_server("stub_llm.py", "--latency-ms", "2000")
+    client = LLMClient(f"{url}/v1", max_concurrency=4, timeout=30)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        _complete(client, deadline_seconds=0.3)
+    assert time.monotonic() - started < 1.5
+    assert client.failures == 1
+
+
+@pytest.mark.parametrize("option,counter", [("--rate-limit-rate", "rate_limited"), ("--failure-rate", "server_errors")])
+def test_budget_halves_on_rate_limit_and_server_error(stub_server, option, counter):
+    url = stub_server("stub_llm.py", option, "1")
+    client = LLMClient(f"{url}/v1", max_concurrency=8, max_retries=0)
+
+    with pytest.raises(LLMError) as raised:
+        _complete(client)
+    assert raised.value.status_code in (429, 500)
+    stats = client.stats()
+    assert stats["concurrency_limit"] == 4
+    assert stats[counter] == 1
+
+
+def test_budget_grows_back_after_successes():
+    budget = ConcurrencyBudget(8, cooldown=0)
+    budget.on_rate_limited()
+    budget.on_server_error()
+    assert budget.limit == 2
+
+    for _ in range(2):
+        budget.on_success()
+    assert budget.limit == 3
+    for _ in range(100):
+        budget.on_success()
+    assert budget.limit == 8
+
+
+def test_sequential_calls_reuse_one_connection(stub_server):
+    url = stub_server("stub_llm.py")
+    client = LLMClient(f"{url}/v1", max_concurrency=4)
+
+    async def run():
+        try:
+            for _ in range(5):
+                await client.complete(MESSAGES, "test")
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    stats = httpx.get(f"{url}/stats").json()
+    assert stats["completed"] == 5
+    assert stats["connections"] == 1
+
+
+def test_concurrent_calls_stay_within_budget_connections(stub_server):
+    url = stub_server("stub_llm.py", "--latency-ms", "50")
+    _complete(LLMClient(f"{url}/v1", max_concurrency=3), calls=12)
+
+    stats = httpx.get(f"{url}/stats").json()
+    assert stats["completed"] == 12
+    assert stats["max_in_flight"] <= 3
+    assert stats["connections"] <= 3
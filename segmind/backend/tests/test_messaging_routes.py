@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core.message_store import message_store
+from core.utils.config import settings
+from routes import messaging
+from routes.campaigns import router as campaigns_router
+from routes.messaging import router
+
+app = FastAPI()
+app.include_router(router)
+app.include_router(campaigns_router)
+
+HOLD_SECONDS = 0.3
+
+# (method, path, json body) for handlers that read or write the SQLite stores
+STORE_REQUESTS = [
+    ("GET", "/api/messaging/messages", None),
+    ("GET", "/api/messaging/messages/msg_1", None),
+    ("POST", "/api/messaging/send", {"customer_id": "cust_9", "channel": "sms", "content": "Hi"}),
+    ("POST", "/api/messaging/send/bulk", [{"customer_id": "cust_9", "channel": "sms", "content": "Hi"},
+                                          {"customer_id": "cust_8", "channel": "sms", "content": "Hello"}]),
+    ("GET", "/api/messaging/outbox/stats", None),
+    ("GET", "/api/messaging/outbox/dead-letters", None),
+    ("POST", "/api/messaging/outbox/dead-letters/msg_missing/requeue", None),
+    ("GET", "/api/messaging/campaigns", None),
+    ("GET", "/api/messaging/campaigns/camp_1", None),
+    ("GET", "/api/messaging/campaigns/camp_1/progress", None),
+    ("POST", "/api/messaging/campaigns", {"name": "Loop test", "segment_id": "seg_1", "channel": "sms",
+                                          "content": "Hello"}),
+    # Without an events database these answer 503 after the store lookups
+    ("POST", "/api/messaging/campaigns/camp_2/send", None),
+    ("POST", "/api/campaigns/camp_2/send", None),
+]
+
+
+async def _max_loop_stall(method, path, body):
+    """Issue a request while another thread holds the store lock; longest event loop stall in seconds"""
+    held = threading.Event()
+
+    def hold_store_lock():
+        with message_store._lock:
+            held.set()
+            time.sleep(HOLD_SECONDS)
+
+    holder = threading.Thread(target=hold_store_lock)
+    holder.start()
+    held.wait()
+
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        ticking = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        response = await client.request(method, path, json=body)
+        done.set()
+        await ticking
+    holder.join()
+    assert response.status_code != 500, response.text
+    return stall
+
+
+@pytest.mark.parametrize("method,path,body", STORE_REQUESTS, ids=[f"{m} {p}" for m, p, _ in STORE_REQUESTS])
+def test_store_access_does_not_block_event_loop(method, path, body):
+    assert asyncio.run(_max_loop_stall(method, path, body)) < HOLD_SECONDS / 2
+
+
+def _post_bulk(content, content_type="application/json"):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/messaging/send/bulk", content=content,
+                                     headers={"content-type": content_type})
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def no_validation(monkeypatch):
+    """Fail the test if the bulk body gets as far as validation"""
+    class Refuse:
+        def __getattr__(self, name):
+            raise AssertionError("bulk body was validated")
+
+    monkeypatch.setattr(messaging, "_BULK_ADAPTER", Refuse())
+    monkeypatch.setattr(messaging, "_ITEM_ADAPTER", Refuse())
+
+
+def test_bulk_ndjson_is_counted_before_validation(monkeypatch, no_validation):
+    monkeypatch.setattr(settings, "bulk_send_max_items", 2)
+    line = b'{"customer_id": "cust_9", "channel": "sms", "content": "Hi"}\n'
+
+    assert _post_bulk(line * 3, "application/x-ndjson").status_code == 413
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_bulk_body_size_is_capped_while_reading(monkeypatch, no_validation, chunked):
+    monkeypatch.setattr(settings, "bulk_send_max_bytes", 1024)
+    body = b"[" + b",".join([b'{"customer_id": "cust_9", "channel": "sms", "content": "Hi"}'] * 50) + b"]"
+
+    async def chunks():
+        for start in range(0, len(body), 256):
+            yield body[start:start + 256]
+
+    assert _post_bulk(chunks() if chunked else body).status_code == 413
+
+
+def test_bulk_item_limit_counts_invalid_lines_too(monkeypatch):
+    monkeypatch.setattr(settings, "bulk_send_max_items", 2)
+    line = b'{"customer_id": "cust_9", "channel": "sms", "content": "Hi"}\n'
+    response = _post_bulk(line * 2 + b'{"customer_id": "cust_9"}\n', "application/x-ndjson")
+    assert response.status_code == 413
+
+    response = _post_bulk(line * 2, "application/x-ndjson")
+    assert response.status_code == 200
+    assert response.json()["queued"] == 2
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from core.message_store import MessageStore
+from core.outbox import Outbox
+from core.providers import ProviderResult
+from core.utils.schemas import Message
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessageStore(str(tmp_path / "messages.db"))
+    yield store
+    store.close()
+
+
+class FakeDispatcher:
+    """Answers every delivery with the next result, after `delay` seconds"""
+
+    def __init__(self, *results, delay=0.0):
+        self.results = list(results)
+        self.delay = delay
+        self.calls = []
+
+    async def deliver(self, payload, sender, flow):
+        self.calls.append(payload["message_id"])
+        await asyncio.sleep(self.delay)
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def _message(message_id="msg_1"):
+    return Message(id=message_id, customer_id="cust_1", channel="sms", content="Hi", status="queued",
+                   sent_at=datetime.now())
+
+
+def _run(outbox, dispatcher, until, timeout=5.0):
+    async def run():
+        await outbox.start(dispatcher)
+        deadline = time.monotonic() + timeout
+        try:
+            while not until():
+                assert time.monotonic() < deadline, "outbox did not settle"
+                await asyncio.sleep(0.01)
+        finally:
+            await outbox.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("attempts,cap", [(1, 1.0), (2, 2.0), (4, 8.0), (6, 10.0), (20, 10.0)])
+def test_backoff_is_capped_exponential_with_full_jitter(store, monkeypatch, attempts, cap):
+    outbox = Outbox(store, workers=1, base_delay=1.0, max_delay=10.0)
+    monkeypatch.setattr("core.outbox.random.uniform", lambda lo, hi: (lo, hi))
+
+    assert outbox._backoff(attempts) == (0, cap)
+
+
+def test_retryable_failures_are_retried_then_dead_lettered(store):
+    outbox = Outbox(store, workers=1, max_attempts=3, base_delay=0.0)
+    dispatcher = FakeDispatcher(ProviderResult(accepted=False, error="HTTP 503", retryable=True))
+    outbox.enqueue(_message())
+
+    _run(outbox, dispatcher, lambda: outbox.stats().get("dead"))
+
+    assert dispatcher.calls == ["msg_1"] * 3
+    assert [(d["message_id"], d["attempts"], d["last_error"]) for d in outbox.dead_letters()] == [
+        ("msg_1", 3, "HTTP 503")]
+    assert store.get_message("msg_1").status == "failed"
+
+
+def test_permanent_failure_is_dead_lettered_at_once(store):
+    outbox = Outbox(store, workers=1, max_attempts=5, base_delay=0.0)
+    dispatcher = FakeDispatcher(ProviderResult(accepted=False, error="HTTP 400", retryable=False))
+    outbox.enqueue(_message())
+
+    _run(outbox, dispatcher, lambda: outbox.stats().get("dead"))
+
+    assert dispatcher.calls == ["msg_1"]
+
+
+def test_retry_then_success_and_requeue(store):
+    outbox = Outbox(store, workers=1, max_attempts=2, base_delay=0.0)
+    failure = ProviderResult(accepted=False, error="timeout", retryable=True)
+    dispatcher = FakeDispatcher(failure, failure, ProviderResult(accepted=True))
+    outbox.enqueue(_message())
+    _run(outbox, dispatcher, lambda: outbox.stats().get("dead"))
+
+    assert outbox.requeue("msg_1")
+    assert store.get_message("msg_1").status == "queued"
+    _run(outbox, dispatcher, lambda: outbox.stats().get("sent"))
+
+    assert outbox.stats() == {"sent": 1}
+    assert store.get_message("msg_1").status == "sent"
+    assert not outbox.requeue("msg_1")
+
+
+def test_slow_delivery_keeps_its_lease(store):
+    outbox = Outbox(store, workers=2, base_delay=0.0, lease_seconds=0.2)
+    dispatcher = FakeDispatcher(ProviderResult(accepted=True), delay=1.5)
+    outbox.enqueue(_message())
+
+    _run(outbox, dispatcher, lambda: outbox.stats().get("sent"))
+
+    # Without renewal the idle worker would reclaim the entry on its next poll and send it again
+    assert dispatcher.calls == ["msg_1"]
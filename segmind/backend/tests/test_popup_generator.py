@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from core.utils.config import settings
+from routes import popup_generator
+
+app = FastAPI()
+app.include_router(popup_generator.router)
+
+
+def _generate_batch(campaign_types):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/popup-generator/generate-batch", data={
+                "product_name": "Galaxy S24",
+                "campaign_types": campaign_types,
+                "prompt_text": "Summer sale"
+            })
+
+    return asyncio.run(run())
+
+
+def test_batch_generation_is_bounded(monkeypatch):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def generate_popup_ad(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"success": True, "campaign_type": request.campaign_type}
+
+    monkeypatch.setattr(popup_generator, "generate_popup_ad", generate_popup_ad)
+    types = [f"type_{i}" for i in range(settings.popup_batch_max_types)]
+    response = _generate_batch(", ".join(types) + ",")
+
+    assert response.status_code == 200
+    assert [result["campaign_type"] for result in response.json()["results"]] == types
+    assert max_in_flight == settings.popup_batch_concurrency
+
+
+def test_batch_rejects_too_many_campaign_types():
+    response = _generate_batch(",".join(["flash_sale"] * (settings.popup_batch_max_types + 1)))
+
+    assert response.status_code == 413
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from core.message_store import MessageStore
+from core.receipts import ReceiptCoalescer
+from core.utils.schemas import Campaign, Message
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessageStore(str(tmp_path / "messages.db"))
+    store.add_campaign(Campaign(id="camp_1", name="Test", segment_id="seg_1", channel="sms", content="Hi",
+                                status="completed", sent_count=3, created_at=datetime.now()))
+    yield store
+    store.close()
+
+
+def _send(store, *message_ids):
+    store.add_messages([Message(id=message_id, customer_id="cust_1", channel="sms", content="Hi", status="sent",
+                                sent_at=datetime.now(), campaign_id="camp_1") for message_id in message_ids])
+
+
+def _counts(store):
+    campaign = store.get_campaign("camp_1")
+    return campaign.delivered_count, campaign.opened_count, campaign.clicked_count, campaign.failed_count
+
+
+def test_receipts_are_coalesced_per_message(store):
+    _send(store, "msg_1", "msg_2")
+    coalescer = ReceiptCoalescer(store)
+    coalescer.add("msg_1", "delivered", "2026-01-01T10:05:00")
+    coalescer.add("msg_1", "delivered", "2026-01-01T10:00:00")
+    coalescer.add("msg_1", "clicked", "2026-01-01T10:30:00")
+    coalescer.add("msg_2", "opened", "2026-01-01T11:00:00")
+    assert coalescer.stats()["pending_messages"] == 2
+
+    asyncio.run(coalescer.flush())
+
+    message = store.get_message("msg_1")
+    assert message.status == "clicked"
+    assert message.delivered_at == datetime(2026, 1, 1, 10, 0)
+    assert message.opened_at == message.clicked_at == datetime(2026, 1, 1, 10, 30)
+    assert store.get_message("msg_2").status == "opened"
+    assert _counts(store) == (2, 2, 1, 0)
+    assert coalescer.stats()["pending_messages"] == 0
+
+
+def test_repeated_receipts_do_not_double_count(store):
+    _send(store, "msg_1")
+    coalescer = ReceiptCoalescer(store)
+    for _ in range(2):
+        coalescer.add("msg_1", "delivered", "2026-01-01T10:00:00")
+        asyncio.run(coalescer.flush())
+
+    # An earlier timestamp moves the milestone but doesn't count it again
+    coalescer.add("msg_1", "delivered", "2026-01-01T09:00:00")
+    asyncio.run(coalescer.flush())
+
+    assert store.get_message("msg_1").delivered_at == datetime(2026, 1, 1, 9, 0)
+    assert _counts(store) == (1, 0, 0, 0)
+
+
+def test_failure_receipts_update_failed_count(store):
+    _send(store, "msg_1", "msg_2")
+    coalescer = ReceiptCoalescer(store)
+    coalescer.add("msg_1", "undelivered")
+    coalescer.add("msg_2", "bounced")
+    coalescer.add("msg_2", "delivered")
+    asyncio.run(coalescer.flush())
+    coalescer.add("msg_1", "failed")
+    asyncio.run(coalescer.flush())
+
+    assert store.get_message("msg_1").status == "failed"
+    assert store.get_message("msg_2").status == "delivered"
+    assert _counts(store) == (1, 0, 0, 1)
+
+
+def test_orphans_wait_for_their_message(store):
+    coalescer = ReceiptCoalescer(store, orphan_ttl=60)
+    coalescer.add("msg_late", "delivered", "2026-01-01T10:00:00")
+    asyncio.run(coalescer.flush())
+    assert coalescer.stats()["pending_messages"] == 1
+
+    _send(store, "msg_late")
+    asyncio.run(coalescer.flush())
+
+    assert store.get_message("msg_late").status == "delivered"
+    assert coalescer.stats()["pending_messages"] == 0
+    assert coalescer.stats()["dropped_orphans"] == 0
+
+
+def test_orphans_are_dropped_after_ttl(store):
+    coalescer = ReceiptCoalescer(store, orphan_ttl=0)
+    coalescer.add("msg_unknown", "delivered")
+    asyncio.run(coalescer.flush())
+
+    assert coalescer.stats()["pending_messages"] == 0
+    assert coalescer.stats()["dropped_orphans"] == 1
+
+
+def test_failed_flush_keeps_the_batch(store, monkeypatch):
+    _send(store, "msg_1")
+    coalescer = ReceiptCoalescer(store)
+    coalescer.add("msg_1", "delivered", "2026-01-01T10:00:00")
+
+    def unavailable(batch):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(coalescer, "_apply", unavailable)
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.flush())
+    assert coalescer.stats()["pending_messages"] == 1
+
+    monkeypatch.undo()
+    asyncio.run(coalescer.flush())
+    assert store.get_message("msg_1").status == "delivered"
+    assert _counts(store) == (1, 0, 0, 0)
@@ -0,0 +1,126 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.cache import response_cache
+from core.rollups import RollupStore, RollupsUnavailable, update_rollups
+from routes import analytics
+
+EVENTS = [
+    ("2024-01-31 23:10:00 UTC", "view", "electronics.smartphone", "apple", 900.0, 1),
+    ("2024-01-31 23:40:00 UTC", "purchase", "electronics.smartphone", "apple", 900.0, 1),
+    ("2024-02-01 00:05:00 UTC", "view", "electronics.audio", "sony", 120.0, 2),
+    ("2024-02-01 00:20:00 UTC", "cart", None, "sony", 120.0, 2),
+    ("2024-02-01 09:00:00 UTC", "purchase", "electronics.audio", "sony", 120.0, 2),
+]
+
+
+def _ts(parts):
+    return int(datetime(*parts, tzinfo=timezone.utc).timestamp())
+
+
+def _add_events(conn, events):
+    conn.executemany("INSERT INTO events (event_time, event_type, category_code, brand, price, user_id) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", events)
+    conn.commit()
+
+
+@pytest.fixture
+def events_db(tmp_path):
+    path = tmp_path / "ecommerce.db"
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE events (event_time TEXT, event_type TEXT, category_code TEXT, brand TEXT,
+                                         price REAL, user_id INTEGER)''')
+    _add_events(conn, EVENTS)
+    yield conn, str(path)
+    conn.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def start(store):
+        monkeypatch.setattr(analytics, "rollup_store", store)
+        response_cache.invalidate()
+        app = FastAPI()
+        app.include_router(analytics.router)
+        return TestClient(app)
+
+    yield start
+    response_cache.invalidate()
+
+
+def test_events_fold_into_hour_day_and_month(events_db):
+    conn, path = events_db
+    assert update_rollups(conn) == len(EVENTS)
+    store = RollupStore(path)
+
+    hours = store.series("hour", 0, 2 ** 40)
+    assert sorted(hours) == [_ts((2024, 1, 31, 23)), _ts((2024, 2, 1, 0)), _ts((2024, 2, 1, 9))]
+    assert hours[_ts((2024, 1, 31, 23))][""] == {"view": 1, "purchase": 1, "revenue": 900.0}
+    assert hours[_ts((2024, 2, 1, 0))][""] == {"view": 1, "cart": 1, "revenue": 0.0}
+
+    days = store.series("day", 0, 2 ** 40)
+    assert sorted(days) == [_ts((2024, 1, 31)), _ts((2024, 2, 1))]
+    assert days[_ts((2024, 2, 1))][""] == {"view": 1, "cart": 1, "purchase": 1, "revenue": 120.0}
+
+    months = store.series("month", 0, 2 ** 40)
+    assert sorted(months) == [_ts((2024, 1, 1)), _ts((2024, 2, 1))]
+    assert months[_ts((2024, 1, 1))][""] == {"view": 1, "purchase": 1, "revenue": 900.0}
+    assert store.latest_bucket("day") == _ts((2024, 2, 1))
+
+    brands = store.totals("month", 0, 2 ** 40, "brand")
+    assert brands["sony"] == {"view": 1, "cart": 1, "purchase": 1, "revenue": 120.0}
+    # Events without a category are counted under "all" but not as a category
+    categories = store.totals("day", 0, 2 ** 40, "category")
+    assert categories["electronics.audio"] == {"view": 1, "purchase": 1, "revenue": 120.0}
+
+
+def test_second_run_folds_only_new_events(events_db):
+    conn, path = events_db
+    update_rollups(conn)
+    assert update_rollups(conn) == 0
+
+    _add_events(conn, [("2024-02-01 09:30:00 UTC", "purchase", "electronics.audio", "sony", 80.0, 3)])
+    assert update_rollups(conn, step=1) == 1
+
+    totals = RollupStore(path).totals("month", _ts((2024, 2, 1)), 2 ** 40, "all")[""]
+    assert totals == {"view": 1, "cart": 1, "purchase": 2, "revenue": 200.0}
+
+
+def test_store_without_rollups_is_unavailable(events_db, tmp_path):
+    _, path = events_db
+    with pytest.raises(RollupsUnavailable):
+        RollupStore(path).latest_bucket()
+    with pytest.raises(RollupsUnavailable):
+        RollupStore(str(tmp_path / "missing.db")).series("day", 0, 1)
+
+
+@pytest.mark.parametrize("path", ["missing.db", "ecommerce.db"])
+def test_analytics_answer_before_rollups_exist(client, events_db, tmp_path, path):
+    api = client(RollupStore(str(tmp_path / path)))
+
+    for endpoint in ("overview", "engagement", "segments/performance", "revenue"):
+        response = api.get(f"/api/analytics/{endpoint}")
+        assert response.status_code == 200
+        assert response.json()["source"] == "empty"
+
+    engagement = api.get("/api/analytics/engagement").json()
+    assert len(engagement["daily_engagement"]) == 30
+    assert engagement["daily_engagement"][-1]["date"] == datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    assert engagement["total_opens"] == 0
+
+
+def test_analytics_read_rollups(client, events_db):
+    conn, path = events_db
+    update_rollups(conn)
+    api = client(RollupStore(path))
+
+    overview = api.get("/api/analytics/overview").json()
+    assert overview["source"] == "rollups"
+    assert overview["revenue_attributed"] == 1020.0
+    revenue = api.get("/api/analytics/revenue").json()
+    assert [m["month"] for m in revenue["monthly_revenue"]] == ["Jan 2024", "Feb 2024"]
+    assert revenue["daily_revenue"][-1] == {"date": "2024-02-01", "revenue": 120.0, "orders": 1}
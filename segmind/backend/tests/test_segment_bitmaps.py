@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.segment_bitmaps import SegmentBitmap, SegmentBitmapStore
+from routes import segments
+
+
+class FakeEngine:
+    """Memberships for user ids 1..size; segment i holds users whose id is divisible by i + 2"""
+
+    def __init__(self, size=10):
+        self.size = size
+
+    def memberships(self, segment_list):
+        user_ids = np.arange(1, self.size + 1, dtype=np.int64)
+        flags = np.stack([user_ids % (i + 2) == 0 for i in range(len(segment_list))], axis=1)
+        return user_ids, flags
+
+
+def test_bitmap_set_operations():
+    left = SegmentBitmap.from_ordinals([0, 1, 64, 69], 70)
+    right = SegmentBitmap.from_ordinals([1, 2, 69], 70)
+
+    assert (left & right).ordinals().tolist() == [1, 69]
+    assert (left | right).cardinality() == 5
+    assert (left - right).ordinals().tolist() == [0, 64]
+    assert (left ^ right).ordinals().tolist() == [0, 2, 64]
+    assert len(~left) == 66
+    assert SegmentBitmap.full(70).cardinality() == 70
+    with pytest.raises(ValueError):
+        left & SegmentBitmap.empty(71)
+
+
+def test_store_query():
+    store = SegmentBitmapStore(FakeEngine(12))
+    store.ensure(segments.SEGMENTS)
+
+    # seg_001: multiples of 2, seg_002: of 3, seg_003: of 4
+    assert store.user_ids(store.query(all_of=["seg_001", "seg_002"])) == [6, 12]
+    assert store.user_ids(store.query(any_of=["seg_002", "seg_003"], none_of=["seg_001"])) == [3, 9]
+    assert store.query().cardinality() == 12
+    with pytest.raises(KeyError):
+        store.get("seg_999")
+
+
+def test_snapshot_survives_refresh_with_new_users():
+    engine = FakeEngine(10)
+    store = SegmentBitmapStore(engine)
+    store.refresh(segments.SEGMENTS)
+    snapshot = store.snapshot()
+    result = snapshot.query(all_of=["seg_001"])
+
+    engine.size = 20
+    store.refresh(segments.SEGMENTS)
+
+    assert snapshot.user_ids(result) == [2, 4, 6, 8, 10]
+    with pytest.raises(ValueError):
+        store.user_ids(result)
+
+
+def test_query_is_consistent_during_refreshes():
+    engine = FakeEngine(10)
+    store = SegmentBitmapStore(engine)
+    store.refresh(segments.SEGMENTS)
+    stop = threading.Event()
+
+    def refresh():
+        while not stop.is_set():
+            engine.size = 10 if engine.size == 200 else 200
+            store.refresh(segments.SEGMENTS)
+
+    thread = threading.Thread(target=refresh)
+    thread.start()
+    try:
+        for _ in range(2000):
+            store.query(all_of=["seg_001"], any_of=["seg_002"], none_of=["seg_003"])
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_overlap_accepts_short_ids(monkeypatch):
+    monkeypatch.setattr(segments, "segment_bitmaps", SegmentBitmapStore(FakeEngine(12)))
+    app = FastAPI()
+    app.include_router(segments.router)
+    client = TestClient(app)
+
+    overlap = client.get("/api/segments/overlap", params={"a": "seg_1", "b": "seg_002"}).json()
+    assert overlap["a"] == "seg_001" and overlap["b"] == "seg_002"
+    assert (overlap["a_count"], overlap["b_count"], overlap["intersection"]) == (6, 4, 2)
+    assert overlap["jaccard"] == 0.25
+
+    query = client.post("/api/segments/query", json={"all_of": ["seg_2"], "include_user_ids": True}).json()
+    assert query == {"count": 4, "total_users": 12, "user_ids": [3, 6, 9, 12]}
+
+    assert client.get("/api/segments/overlap", params={"a": "seg_9", "b": "seg_1"}).status_code == 404
@@ -0,0 +1,120 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.segment_engine import (REFERENCE_TIME, InvalidCriteria, SegmentEngine, SegmentStoreUnavailable,
+                                 bind_params, compile_criteria, compile_criterion)
+from routes import segments
+
+DAY = 86400
+NOW = 1_700_000_000
+
+# user_id, views, carts, purchases, spend, last_event, last_cart, last_purchase
+USERS = [
+    (1, 30, 0, 0, 0.0, NOW, None, None),
+    (2, 10, 2, 4, 650.0, NOW - DAY, NOW - 90 * DAY, NOW - 2 * DAY),
+    (3, 50, 3, 0, 0.0, NOW - 2 * DAY, NOW - 3 * DAY, None),
+    (4, 12, 5, 6, 900.0, NOW - 70 * DAY, NOW - 80 * DAY, NOW - 70 * DAY),
+]
+
+
+@pytest.fixture
+def features_db(tmp_path):
+    path = tmp_path / "ecommerce.db"
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE user_features (
+            user_id INTEGER PRIMARY KEY, view_count INTEGER, cart_count INTEGER, purchase_count INTEGER,
+            total_spend REAL, last_event_time INTEGER, last_cart_time INTEGER, last_purchase_time INTEGER,
+            session_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.executemany("INSERT INTO user_features (user_id, view_count, cart_count, purchase_count, total_spend, "
+                     "last_event_time, last_cart_time, last_purchase_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", USERS)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.mark.parametrize("field,value,sql,params", [
+    ("total_orders", "> 3", "purchase_count > ?", [3.0]),
+    ("conversion_rate", "< 2%", "100.0 * purchase_count / NULLIF(view_count, 0) < ?", [2.0]),
+    ("lifetime_value", ">= $1,500.50", "total_spend >= ?", [1500.5]),
+    ("page_views", 20, "view_count = ?", [20.0]),
+    ("page_views", "== 5", "view_count = ?", [5.0]),
+    ("sessions", "!= 0", "session_count != ?", [0.0]),
+])
+def test_compile_numeric_criteria(field, value, sql, params):
+    assert compile_criterion(field, value) == (sql, params, False)
+
+
+def test_compile_day_criteria_use_reference_time():
+    sql, params = compile_criteria({"days_since_cart": "< 7", "total_orders": "> 1"})
+
+    assert sql == "((? - last_cart_time) / 86400.0 < ?) AND (purchase_count > ?)"
+    assert params == [REFERENCE_TIME, 7.0, 1.0]
+    assert bind_params(params, NOW) == [NOW, 7.0, 1.0]
+
+
+@pytest.mark.parametrize("value,negated", [("true", False), (True, False), ("no", True), (False, True)])
+def test_compile_boolean_criteria(value, negated):
+    sql, params, _ = compile_criterion("cart_abandonment", value)
+
+    assert sql.startswith("NOT ") == negated
+    assert params == []
+
+
+@pytest.mark.parametrize("field,value", [("unknown", "> 1"), ("total_orders", "lots"), ("has_purchased", "maybe")])
+def test_invalid_criteria(field, value):
+    with pytest.raises(InvalidCriteria):
+        compile_criterion(field, value)
+
+
+def test_empty_criteria_match_everything():
+    assert compile_criteria({}) == ("1", [])
+
+
+def test_counts_and_members_over_user_features(features_db):
+    engine = SegmentEngine(features_db, cache_ttl=60)
+
+    assert engine.count({"total_orders": "> 3", "lifetime_value": "> $500"}) == 2
+    assert engine.count({"cart_abandonment": "true", "days_since_cart": "< 7"}) == 1
+    assert engine.count({"days_since_last_order": "> 60"}) == 1
+    overview = engine.overview(segments.SEGMENTS)
+    assert overview["total_users"] == 4
+    assert overview["counts"] == [engine.count(s["criteria"]) for s in segments.SEGMENTS]
+    assert list(engine.iter_members({"page_views": ">= 12"}, batch_size=1)) == [[1], [3], [4]]
+
+
+def test_missing_store_is_unavailable(tmp_path):
+    with pytest.raises(SegmentStoreUnavailable):
+        SegmentEngine(str(tmp_path / "missing.db")).count({})
+
+
+def test_segment_routes_fall_back_to_sample_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(segments, "segment_engine", SegmentEngine(str(tmp_path / "missing.db")))
+    app = FastAPI()
+    app.include_router(segments.router)
+    client = TestClient(app)
+
+    listed = client.get("/api/segments/")
+    assert listed.status_code == 200
+    assert [s["customer_count"] for s in listed.json()] == list(segments.SAMPLE_COUNTS.values())
+    assert {s["count_source"] for s in listed.json()} == {"sample"}
+
+    overview = client.get("/api/segments/stats/overview").json()
+    assert overview["source"] == "sample"
+    assert overview["total_users"] == sum(segments.SAMPLE_COUNTS.values())
+    assert round(sum(s["percentage"] for s in overview["segments"])) == 100
+
+
+def test_segment_routes_serve_live_counts(features_db, monkeypatch):
+    monkeypatch.setattr(segments, "segment_engine", SegmentEngine(features_db))
+    app = FastAPI()
+    app.include_router(segments.router)
+
+    overview = TestClient(app).get("/api/segments/stats/overview").json()
+    assert overview["source"] == "live"
+    assert overview["total_users"] == 4
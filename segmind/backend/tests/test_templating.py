@@ -0,0 +1,88 @@
+import html
+
+import pytest
+
+from core.templating import CompiledTemplate, TemplateCache, render_batch, render_content, source_version
+from core.utils.config import settings
+
+
+def test_variables_are_substituted():
+    template = CompiledTemplate("Hi {{ first_name }}, your {{product}} is {{first_name}}'s")
+
+    assert template.variables == {"first_name", "product"}
+    assert template.render({"first_name": "Ada", "product": "Galaxy S24", "unused": 1}) == \
+        "Hi Ada, your Galaxy S24 is Ada's"
+    assert template.render({"first_name": 7, "product": None}) == "Hi 7, your None is 7's"
+
+
+def test_missing_variables_keep_their_placeholder():
+    template = CompiledTemplate("Hi {{first_name}}, save {{ discount }}%")
+
+    assert template.render({"first_name": "Ada"}) == "Hi Ada, save {{discount}}%"
+    assert template.render_many([{}, {"discount": 15}]) == ["Hi {{first_name}}, save {{discount}}%",
+                                                           "Hi {{first_name}}, save 15%"]
+
+
+def test_literal_braces_and_static_templates():
+    template = CompiledTemplate('{"offer": "{{code}}"} {0} {single}')
+
+    assert template.render({"code": "SAVE15"}) == '{"offer": "SAVE15"} {0} {single}'
+    static = CompiledTemplate("No {placeholders} here")
+    assert static.variables == frozenset()
+    assert static.render({"placeholders": "x"}) == "No {placeholders} here"
+    assert static.render_many([{}, {}]) == ["No {placeholders} here"] * 2
+
+
+def test_escape_applies_to_values_only():
+    template = CompiledTemplate("<p>Hi {{name}}</p>{{missing}}", escape=html.escape)
+
+    assert template.render({"name": "<Ada & co>"}) == "<p>Hi &lt;Ada &amp; co&gt;</p>{{missing}}"
+    assert template.render_many([{"name": "<b>"}]) == ["<p>Hi &lt;b&gt;</p>{{missing}}"]
+
+
+@pytest.mark.parametrize("escape,expected", [
+    (None, ["<b>Ada</b> from Acme", "Bo from Acme"]),
+    (html.escape, ["&lt;b&gt;Ada&lt;/b&gt; from Acme", "Bo from Acme"]),
+])
+def test_render_columns(escape, expected):
+    template = CompiledTemplate("{{name}} from {{company}}", escape=escape)
+
+    assert template.render_columns({"name": ["<b>Ada</b>", "Bo"]}, {"company": "Acme"}) == expected
+    assert template.render_columns({"name": ["Ada"]}) == ["Ada from {{company}}"]
+    assert template.render_columns({}) == []
+
+
+def test_render_columns_matches_render_many():
+    template = CompiledTemplate("{{a}}-{{b}}-{{a}}")
+    contexts = [{"a": i, "b": i * i} for i in range(5)]
+
+    assert template.render_columns({"a": [c["a"] for c in contexts], "b": [c["b"] for c in contexts]}) == \
+        template.render_many(contexts)
+
+
+def test_cache_reuses_plans_per_version():
+    cache = TemplateCache(max_entries=2)
+    first = cache.get("welcome", "Hi {{name}}")
+
+    assert cache.get("welcome", "Hi {{name}}") is first
+    assert cache.get("welcome", "Hello {{name}}") is not first
+    assert cache.get("welcome", "Hi {{name}}", version="v2").render({"name": "Ada"}) == "Hi Ada"
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 3}
+
+    # The LRU entry ("welcome", version of "Hi {{name}}") was evicted
+    assert ("welcome", source_version("Hi {{name}}")) not in cache._entries
+
+    cache.get("promo", "Sale")
+    cache.invalidate("welcome")
+    assert cache.stats()["entries"] == 1
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_render_helpers(monkeypatch):
+    assert render_content("Hi {{name}}", {"name": "Ada"}) == "Hi Ada"
+    assert render_batch("t1", "Hi {{name}}", [{"name": "Ada"}, {}]) == ["Hi Ada", "Hi {{name}}"]
+
+    monkeypatch.setattr(settings, "render_batch_size", 1)
+    with pytest.raises(ValueError):
+        render_batch("t1", "Hi {{name}}", [{}, {}])
@@ -6,24 +6,22 @@ import json
 import random
 import requests
 import os
-import threading
-import time
-from threading import Thread
 
-router = APIRouter(prefix="/api/campaign-generator", tags=["campaign-generator"])
-
-class ReturnThread(Thread):
-    def __init__(self, group=None, target=None, name=None, args=(), kwargs={}, verbose=None):
-        super().__init__(group, target, name, args, kwargs)
-        self._return = None
+# Submit through the backend's shared worker pools when running inside it
+try:
+    from core.executors import worker_pools
+    WORKER_POOLS_AVAILABLE = True
+except ImportError:
+    from concurrent.futures import ThreadPoolExecutor
+    WORKER_POOLS_AVAILABLE = False
+    _io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="io-worker")
 
-    def run(self):
-        if self._target is not None:
-            self._return = self._target(*self._args, **self._kwargs)
+def submit_io(fn, *args):
+    """Run a blocking call on the shared IO pool, returning a Future"""
+    pool = worker_pools.io if WORKER_POOLS_AVAILABLE else _io_pool
+    return pool.submit(fn, *args)
 
-    def join(self):
-        super().join()
-        return self._return
+router = APIRouter(prefix="/api/campaign-generator", tags=["campaign-generator"])
 
 
 class Product(BaseModel):
@@ -93,22 +91,16 @@ class CampaignCardGenerator:
         # Split into smaller batches for concurrent processing
         batch_size = min(2, len(weekly_schedule))  # Process 2 at a time for faster responses
 
-        # Create threads for parallel generation
-        threads = []
-        results = []
+        # Submit batches to the shared IO pool for parallel generation
+        futures = [
+            submit_io(self._generate_with_openai, product, strategy, weekly_schedule[i:i + batch_size])
+            for i in range(0, len(weekly_schedule), batch_size)
+        ]
 
-        for i in range(0, len(weekly_schedule), batch_size):
-            batch = weekly_schedule[i:i + batch_size]
-            thread = ReturnThread(
-                target=self._generate_with_openai,
-                args=(product, strategy, batch)
-            )
-            threads.append(thread)
-            thread.start()
-
-        # Collect results from all threads
-        for thread in threads:
-            batch_result = thread.join()
+        # Collect results in schedule order
+        results = []
+        for future in futures:
+            batch_result = future.result()
             if batch_result:
                 results.extend(batch_result)
 
@@ -256,23 +248,11 @@ Focus on insights and recommendations, not full campaign content.""" if is_strat
         """Generate campaign cards using predefined templates."""
 
         # TEMP VARIABLE: Initialize list to collect campaign cards
-
-        # for index, schedule in enumerate(weekly_schedule):
-
         campaign_cards = []
+        product_name = product.get('name', 'Product')
 
+        # Template lookups take microseconds, so they run inline rather than on worker threads
         for index, schedule in enumerate(weekly_schedule):
-
-            theme_thread = ReturnThread(target=self._get_theme_for_campaign, args=(schedule['type'],))
-            subject_thread = ReturnThread(target=self._generate_subject, args=(product.get('name', 'Product'), schedule['type'], schedule['audience']))
-            email_thread = ReturnThread(target=self._generate_email_content, args=(product.get('name', 'Product'), schedule['type'], schedule['audience']))
-            image_thread = ReturnThread(target=self._generate_image_prompt, args=(product.get('name', 'Product'), schedule['type']))
-
-            theme_thread.start()
-            subject_thread.start()
-            email_thread.start()
-            image_thread.start()
-
             # TEMP VARIABLE: Build individual campaign card
             card = {
                 'id': f"card_{int(datetime.now().timestamp())}_{index}",
@@ -280,12 +260,12 @@ Focus on insights and recommendations, not full campaign content.""" if is_strat
                 'time': schedule['time'],
                 'type': schedule['type'],
                 'audience': schedule['audience'],
-                'theme': theme_thread.join(),
-                'subject': subject_thread.join(),
+                'theme': self._get_theme_for_campaign(schedule['type']),
+                'subject': self._generate_subject(product_name, schedule['type'], schedule['audience']),
                 'preview': f"{schedule['day']} {schedule['time']}: {schedule['type']}",
-                'prompt': f"{schedule['type']} email for {schedule['audience']} promoting {product.get('name', 'Product')}",
-                'emailContent': email_thread.join(),
-                'imagePrompt': image_thread.join(),
+                'prompt': f"{schedule['type']} email for {schedule['audience']} promoting {product_name}",
+                'emailContent': self._generate_email_content(product_name, schedule['type'], schedule['audience']),
+                'imagePrompt': self._generate_image_prompt(product_name, schedule['type']),
                 'status': 'pending'
             }
             campaign_cards.append(card)
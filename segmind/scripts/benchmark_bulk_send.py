@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark POST /api/messaging/send against POST /api/messaging/send/bulk
+
+By default the backend app runs in-process (ASGI transport, temporary
+database) so only the API and enqueue cost is measured; pass --url to
+benchmark a running backend over HTTP instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+CHANNELS = ["sms", "email", "whatsapp", "push"]
+
+def sample_messages(count):
+    """Synthetic SendMessageRequest payloads"""
+    return [
+        {
+            "customer_id": f"cust_{random.randint(1, 100000)}",
+            "channel": random.choice(CHANNELS),
+            "content": f"Hi! Your offer code is SAVE{i % 50}. Shop now before it expires.",
+            "subject": "Your exclusive offer" if i % 2 else None
+        }
+        for i in range(count)
+    ]
+
+def in_process_client():
+    """httpx client bound to the backend app, with a throwaway message database"""
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+    db_path = os.path.join(tempfile.mkdtemp(prefix="segmind-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, backend)
+
+    from fastapi import FastAPI
+    from routes.messaging import router
+
+    app = FastAPI()
+    app.include_router(router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+async def bench_single(client, base, messages, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(message):
+        async with semaphore:
+            response = await client.post(f"{base}/send", json=message)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(m) for m in messages))
+    return time.perf_counter() - start
+
+async def bench_bulk(client, base, messages, batch_size, ndjson=False):
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        batch = messages[i:i + batch_size]
+        if ndjson:
+            body = "\n".join(json.dumps(m) for m in batch)
+            response = await client.post(f"{base}/send/bulk", content=body,
+                                         headers={"content-type": "application/x-ndjson"})
+        else:
+            response = await client.post(f"{base}/send/bulk", json=batch)
+        response.raise_for_status()
+        assert response.json()["queued"] == len(batch)
+    return time.perf_counter() - start
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(timeout=60)
+        base = args.url.rstrip("/")
+    else:
+        client = in_process_client()
+        base = "/api/messaging"
+
+    messages = sample_messages(args.messages)
+    async with client:
+        results = [
+            ("single POST /send", await bench_single(client, base, messages, args.concurrency)),
+            (f"bulk JSON (batches of {args.batch_size})", await bench_bulk(client, base, messages, args.batch_size)),
+            (f"bulk NDJSON (batches of {args.batch_size})",
+             await bench_bulk(client, base, messages, args.batch_size, ndjson=True)),
+        ]
+
+    baseline = results[0][1]
+    print(f"\n📨 Enqueue throughput for {args.messages:,} messages")
+    print("=" * 64)
+    for name, seconds in results:
+        print(f"{name:<34} {args.messages / seconds:>10,.0f} msg/s   {baseline / seconds:>6.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single and bulk send throughput")
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16, help="parallel single-send requests")
+    parser.add_argument('--url', help="messaging API of a running backend, e.g. http://localhost:8000/api/messaging")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
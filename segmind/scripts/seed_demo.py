@@ -9,7 +9,6 @@ import json
 import random
 from datetime import datetime, timedelta
 from faker import Faker
-import time
 
 fake = Faker()
 BASE_URL = "http://localhost:8000/api"
@@ -128,24 +127,27 @@ def send_sample_messages():
     channels = ["sms", "email", "whatsapp", "push"]
     customers = [f"cust_{i}" for i in range(1, 11)]
 
-    for i in range(20):
-        message = {
+    messages = [
+        {
             "customer_id": random.choice(customers),
             "channel": random.choice(channels),
             "content": fake.text(max_nb_chars=160),
             "subject": fake.sentence() if random.choice([True, False]) else None
         }
+        for _ in range(20)
+    ]
 
-        try:
-            response = requests.post(f"{BASE_URL}/messaging/send", json=message)
-            if response.status_code == 200:
-                print(f"  ✅ Sent message {i+1}/20")
-            else:
-                print(f"  ❌ Failed to send message {i+1}")
-        except Exception as e:
-            print(f"  ❌ Error sending message: {e}")
-
-        time.sleep(0.1)  # Small delay to avoid overwhelming
+    try:
+        response = requests.post(f"{BASE_URL}/messaging/send/bulk", json=messages)
+        if response.status_code == 200:
+            result = response.json()
+            print(f"  ✅ Queued {result['queued']}/{len(messages)} messages")
+            if result["rejected"]:
+                print(f"  ❌ Rejected {result['rejected']} messages")
+        else:
+            print(f"  ❌ Failed to send messages - Status: {response.status_code}")
+    except Exception as e:
+        print(f"  ❌ Error sending messages: {e}")
 
 def generate_sample_data():
     """Generate additional sample data files"""
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenAI chat completions API for exercising card generation
+
+Answers POST /v1/chat/completions with a JSON array of campaign cards, one
+per "Day Time: Type for Audience" line in the prompt's weekly schedule. Run
+it, then start the backend with OPENAI_BASE_URL=http://localhost:9100/v1
+and any OPENAI_API_KEY.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import uuid
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Stub chat completions")
+stats = Counter()
+# Client (host, port) pairs seen, to tell connection reuse from a connection per call
+peers = set()
+config = {"latency_ms": 0.0, "per_card_ms": 0.0, "failure_rate": 0.0, "rate_limit_rate": 0.0, "max_concurrent": 0}
+
+SCHEDULE_LINE = re.compile(r"^(\w+) ([^:]+:\d\d(?: [AP]M)?): (.+) for (.+)$", re.MULTILINE)
+
+def cards_for(prompt):
+    cards = []
+    for day, time, campaign_type, audience in SCHEDULE_LINE.findall(prompt):
+        cards.append({
+            "id": f"card_{uuid.uuid4().hex[:8]}",
+            "day": day,
+            "time": time,
+            "type": campaign_type,
+            "audience": audience,
+            "theme": "Stub Theme",
+            "subject": f"{campaign_type} for {audience}",
+            "preview": f"{day} {time}: {campaign_type}",
+            "prompt": prompt[:80],
+            "emailContent": "Hi {{first_name}},\n\nThis card came from the stub completion server.",
+            "imagePrompt": f"Product shot for {audience}",
+            "status": "pending"
+        })
+    return cards
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """One completion after the configured latency, failing or rate limiting a fraction of calls"""
+    body = await request.json()
+    if request.client:
+        peers.add((request.client.host, request.client.port))
+        stats["connections"] = len(peers)
+    prompt = body["messages"][-1]["content"]
+    cards = cards_for(prompt)
+    if config["max_concurrent"] and stats["in_flight"] >= config["max_concurrent"]:
+        stats["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "too many concurrent requests"}}, status_code=429)
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        delay = config["latency_ms"] + config["per_card_ms"] * len(cards)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+    finally:
+        stats["in_flight"] -= 1
+    roll = random.random()
+    if roll < config["rate_limit_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "simulated rate limit"}}, status_code=429,
+                            headers={"Retry-After": "0.1"})
+    if roll < config["rate_limit_rate"] + config["failure_rate"]:
+        stats["failed"] += 1
+        return JSONResponse({"error": {"message": "simulated failure"}}, status_code=500)
+
+    stats["completed"] += 1
+    stats["cards"] += len(cards)
+    content = json.dumps(cards)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return dict(stats)
+
+@app.delete("/stats")
+async def reset_stats():
+    stats.clear()
+    peers.clear()
+    return {"status": "reset"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub chat completions server")
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="delay before answering each completion")
+    parser.add_argument('--per-card-ms', type=float, default=0.0, help="extra delay per generated card")
+    parser.add_argument('--max-concurrent', type=int, default=0, help="answer 429 above this many in-flight calls")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction answered with 429")
+    args = parser.parse_args()
+
+    config["latency_ms"] = args.latency_ms
+    config["per_card_ms"] = args.per_card_ms
+    config["max_concurrent"] = args.max_concurrent
+    config["failure_rate"] = args.failure_rate
+    config["rate_limit_rate"] = args.rate_limit_rate
+    print(f"🤖 Stub completions on http://localhost:{args.port}/v1 (latency {args.latency_ms}ms, "
+          f"failure rate {args.failure_rate:.0%}, rate limited {args.rate_limit_rate:.0%})")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Local stub SMS/email/push/WhatsApp provider for exercising campaign fan-out
+
+Run it, then start the backend with PROVIDER_BASE_URL=http://localhost:9000
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+from collections import Counter, deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Stub message provider")
+received = Counter()
+# The most recent accepted messages, for checking what was rendered and sent
+accepted = deque(maxlen=10000)
+config = {"latency_ms": 0.0, "failure_rate": 0.0}
+
+@app.post("/{channel}")
+async def accept_message(channel: str, request: Request):
+    """Accept one message after the configured latency, failing a fraction of them"""
+    message = await request.json()
+    if config["latency_ms"]:
+        await asyncio.sleep(config["latency_ms"] / 1000)
+    if random.random() < config["failure_rate"]:
+        received[f"{channel}_failed"] += 1
+        return JSONResponse({"error": "simulated provider failure"}, status_code=503)
+    received[channel] += 1
+    accepted.append(message)
+    return {"id": f"stub_{uuid.uuid4().hex[:12]}", "status": "queued"}
+
+@app.get("/stats")
+async def stats():
+    """Messages received per channel"""
+    return dict(received)
+
+@app.get("/messages")
+async def messages():
+    """The most recently accepted messages, oldest first"""
+    return list(accepted)
+
+@app.delete("/stats")
+async def reset_stats():
+    received.clear()
+    accepted.clear()
+    return {"status": "reset"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub message provider")
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="delay before answering each send")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of sends answered with 503")
+    args = parser.parse_args()
+
+    config["latency_ms"] = args.latency_ms
+    config["failure_rate"] = args.failure_rate
+    print(f"📨 Stub provider on http://localhost:{args.port} (latency {args.latency_ms}ms, "
+          f"failure rate {args.failure_rate:.0%})")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()